@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Возобновляемая догрузка длинных диапазонов свечей ISS.
+
+Диапазон режется на сегменты, которые качаются одновременно на event loop
+candles_async (общий с остальными загрузчиками свечей). Каждая страница
+сразу фильтруется, отобранные строки дописываются в part-файл сегмента, а
+`end` последней свечи страницы фиксируется в JSON-чекпойнте. После сбоя
+повторный запуск продолжает каждый сегмент с сохранённого `end`. Когда все
+сегменты готовы, part-файлы склеиваются в итоговый CSV, чекпойнт удаляется.
+
+Строки, дописанные в part-файл перед сбоем, но не попавшие в чекпойнт,
+после повторной загрузки схлопываются при склейке (дедупликация по begin).
+"""
+import asyncio
+import json
+import os
+import shutil
+
+import pandas as pd
+
+import candles_async
+from data_store import DATA_DIR, write_table
+from moex_candles import CANDLE_COLUMNS, PAGE_SIZE
+
+STATE_DIR = os.path.join(DATA_DIR, ".backfill")
+SEGMENT_DAYS = int(os.getenv("BACKFILL_SEGMENT_DAYS", "90"))
+MAX_WORKERS = int(os.getenv("BACKFILL_MAX_WORKERS", "4"))
+
+_TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def split_range(date_from, date_till, segment_days=SEGMENT_DAYS):
+    """Режет [date_from, date_till] на непересекающиеся сегменты по segment_days дней."""
+    start, end = pd.Timestamp(date_from), pd.Timestamp(date_till)
+    step = pd.Timedelta(days=segment_days)
+    segments = []
+    while start <= end:
+        seg_end = min(start + step - pd.Timedelta(seconds=1), end)
+        segments.append((start.strftime(_TS_FORMAT), seg_end.strftime(_TS_FORMAT)))
+        start = seg_end + pd.Timedelta(seconds=1)
+    return segments
+
+
+def _load_state(state_path, job, segments):
+    """Чекпойнт того же задания с теми же сегментами или новое состояние."""
+    if os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("job") == job and [(s["from"], s["till"]) for s in state["segments"]] == segments:
+            return state
+    return {
+        "job": job,
+        "segments": [{"from": lo, "till": hi, "last_end": None, "done": False} for lo, hi in segments],
+    }
+
+
+def _save_state(state_path, state):
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, state_path)
+
+
+async def _run_segment(sched, ticker, interval, select, seg, part_path, save):
+    """Качает сегмент постранично от last_end, дописывая отобранные строки в part-файл."""
+    while not seg["done"]:
+        cursor = seg["last_end"] or seg["from"]
+        columns, rows = await candles_async.fetch_page(sched, ticker, cursor, seg["till"], interval)
+        df = pd.DataFrame(rows, columns=columns or CANDLE_COLUMNS)
+        df["begin"] = pd.to_datetime(df["begin"])
+        df["end"] = pd.to_datetime(df["end"])
+        if seg["last_end"]:
+            # from включает свечу, начавшуюся ровно в cursor
+            df = df[df["end"] > pd.Timestamp(seg["last_end"])].copy()
+        if df.empty:
+            seg["done"] = True
+            save()
+            break
+
+        kept = select(df)
+        if not kept.empty:
+            kept.to_csv(part_path, mode="a", header=not os.path.exists(part_path), index=False)
+
+        last_end = df["end"].max()
+        seg["last_end"] = last_end.strftime(_TS_FORMAT)
+        seg["done"] = len(rows) < PAGE_SIZE or last_end >= pd.Timestamp(seg["till"])
+        save()
+
+
+def backfill(ticker, date_from, date_till, out_path, select, interval=1,
+             segment_days=SEGMENT_DAYS, max_workers=MAX_WORKERS, state_dir=STATE_DIR):
+    """
+    Загружает свечи тикера за [date_from, date_till], оставляя строки select(df),
+    и сохраняет их в out_path. Возвращает итоговый DataFrame.
+    Если часть сегментов не догрузилась, поднимает RuntimeError — чекпойнт
+    остаётся, и повторный вызов с теми же параметрами продолжит с места сбоя.
+    """
+    job = f"{ticker.upper()}_{interval}_{os.path.basename(out_path)}"
+    work_dir = os.path.join(state_dir, job)
+    state_path = os.path.join(state_dir, f"{job}.json")
+    os.makedirs(work_dir, exist_ok=True)
+
+    state = _load_state(state_path, job, split_range(date_from, date_till, segment_days))
+    if not any(seg["last_end"] for seg in state["segments"]):
+        # Новое задание — part-файлы прошлых прогонов не нужны
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir, exist_ok=True)
+    pending = [i for i, seg in enumerate(state["segments"]) if not seg["done"]]
+    if len(pending) < len(state["segments"]):
+        print(f"  ↻ {ticker}: продолжаю с чекпойнта, осталось сегментов {len(pending)}/{len(state['segments'])}")
+
+    def save():
+        _save_state(state_path, state)
+
+    async def run(sched, i):
+        try:
+            await _run_segment(sched, ticker, interval, select, state["segments"][i],
+                               os.path.join(work_dir, f"{i:04d}.csv"), save)
+        except Exception as e:
+            print(f"  ⚠️ {ticker}: сегмент {state['segments'][i]['from']} — {e}")
+
+    async def run_all(sched):
+        await asyncio.gather(*(run(sched, i) for i in pending))
+
+    save()
+    candles_async.run(run_all, concurrency=max_workers)
+
+    failed = [seg["from"] for seg in state["segments"] if not seg["done"]]
+    if failed:
+        raise RuntimeError(f"не догружены сегменты с {', '.join(failed)}; перезапуск продолжит с чекпойнта")
+
+    parts = [os.path.join(work_dir, f"{i:04d}.csv") for i in range(len(state["segments"]))]
+    frames = [pd.read_csv(path, float_precision="round_trip") for path in parts if os.path.exists(path)]
+    if frames:
+        result = pd.concat(frames, ignore_index=True)
+        result["begin"] = pd.to_datetime(result["begin"])
+        result = result.drop_duplicates(subset="begin", keep="last").sort_values("begin", kind="stable")
+    else:
+        result = pd.DataFrame()
+    if not result.empty:
+        write_table(result, out_path)
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.remove(state_path)
+    return result
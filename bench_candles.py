@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк загрузки свечей через candles_async на локальном стабе ISS.
+
+Стаб отвечает с задержкой LATENCY (как сеть до ISS), кэш ответов отключён.
+Замеряются окна 09:59–10:59 всех тикеров по SESSIONS сессиям (как в
+fetch_moex_10_11) и полный диапазон M1 с пагинацией, при разной
+одновременности запросов (1 — последовательная загрузка).
+
+    python bench_candles.py [задержка_сек]
+"""
+import os
+import sys
+import time
+
+from iss_stub import StubISS
+
+LATENCY = float(sys.argv[1]) if len(sys.argv) > 1 else 0.05
+TICKERS = ["gold", "eqmx", "oblg"]
+SESSIONS = 20
+CONCURRENCY_LEVELS = [1, 4, 8]
+
+
+def main():
+    with StubISS(latency=LATENCY) as stub:
+        # Адрес стаба и настройки — до импорта iss_client
+        os.environ.update(ISS_BASE_URL=stub.base_url, ISS_CACHE="0", ISS_REQUESTS_PER_SECOND="0",
+                          ISS_ASYNC_RATE="0", ISS_POOL_SIZE=str(max(CONCURRENCY_LEVELS)))
+        import pandas as pd
+        import candles_async
+
+        sessions = [d.date() for d in pd.bdate_range("2025-10-01", periods=SESSIONS)]
+        print(f"⏱ Стаб ISS, задержка {LATENCY * 1000:.0f} мс; тикеров {len(TICKERS)}, сессий {SESSIONS}")
+
+        for concurrency in CONCURRENCY_LEVELS:
+            stub.reset()
+            started = time.perf_counter()
+            frames = candles_async.fetch_windows({t: sessions for t in TICKERS}, "09:59:00", "10:59:00",
+                                                 concurrency=concurrency, rate=0)
+            windows_time = time.perf_counter() - started
+            windows_requests = sum(stub.requests.values())
+
+            stub.reset()
+            started = time.perf_counter()
+            for ticker in TICKERS:
+                candles_async.fetch_range(ticker, sessions[0], sessions[-1], concurrency=concurrency, rate=0)
+            range_time = time.perf_counter() - started
+
+            rows = sum(len(df) for df in frames.values())
+            print(f"  одновременно {concurrency}: окна {windows_time:.2f} с ({windows_requests} запросов, {rows} свечей), "
+                  f"диапазон M1 {range_time:.2f} с ({sum(stub.requests.values())} запросов)")
+
+
+if __name__ == "__main__":
+    main()
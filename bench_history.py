@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк разбора страницы дневной истории: старый XML-путь против колоночного JSON.
+
+Страницы — те же, что отдаёт стаб ISS (HISTORY_PAGE_SIZE строк, блок
+history.cursor). Старый путь повторяет базовый fetch_moex_history_paginated:
+копия r.text.lower() для поиска <error>, ElementTree, словарь row.attrib на
+каждую строку и DataFrame из списка словарей. Новый путь — json.loads и
+parse_history_json сразу в колонки. Время — лучшее из REPEAT прогонов по PAGES
+страницам, память — пик tracemalloc на одну страницу.
+
+    python bench_history.py [страниц]
+"""
+import json
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+from fetch_and_update import parse_history_json, parse_history_xml
+from iss_stub import HISTORY_COLUMNS, HISTORY_PAGE_SIZE, _history_xml, history_rows
+
+PAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+REPEAT = 5
+
+
+def old_xml(body):
+    """Базовый путь: XML, ElementTree и словарь на строку."""
+    text = body.decode("utf-8")
+    if "<error>" in text.lower():
+        raise Exception(f"Ошибка в ответе: {text[:300]}")
+    root = ET.fromstring(text)
+    rows = [row.attrib for row in root.findall(".//row")]
+    return pd.DataFrame(rows)
+
+
+def new_xml(body):
+    columns, _, _ = parse_history_xml(body.decode("utf-8"))
+    return pd.DataFrame(columns)
+
+
+def new_json(body):
+    columns, _, _ = parse_history_json(json.loads(body))
+    return pd.DataFrame(columns)
+
+
+def make_pages():
+    """Страницы истории в обоих форматах, как их отдаёт стаб."""
+    rows = history_rows("GOLD", "2000-01-01", "2030-12-31")[:PAGES * HISTORY_PAGE_SIZE]
+    xml_pages, json_pages = [], []
+    for start in range(0, len(rows), HISTORY_PAGE_SIZE):
+        page, cursor = rows[start:start + HISTORY_PAGE_SIZE], (start, len(rows), HISTORY_PAGE_SIZE)
+        xml_pages.append(_history_xml(page, cursor).encode())
+        json_pages.append(json.dumps({
+            "history": {"columns": HISTORY_COLUMNS, "data": page},
+            "history.cursor": {"columns": ["INDEX", "TOTAL", "PAGESIZE"], "data": [list(cursor)]},
+        }).encode())
+    return xml_pages, json_pages
+
+
+def measure(parse, pages):
+    best = min(_timed(parse, pages) for _ in range(REPEAT))
+    tracemalloc.start()
+    parse(pages[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best / len(pages), peak
+
+
+def _timed(parse, pages):
+    started = time.perf_counter()
+    for body in pages:
+        parse(body)
+    return time.perf_counter() - started
+
+
+def main():
+    xml_pages, json_pages = make_pages()
+    print(f"⏱ Разбор {len(xml_pages)} страниц по {HISTORY_PAGE_SIZE} строк "
+          f"(XML {len(xml_pages[0]) / 1024:.1f} КБ, JSON {len(json_pages[0]) / 1024:.1f} КБ на страницу)")
+
+    base = None
+    for name, parse, pages in [("XML, словари (старый)", old_xml, xml_pages),
+                               ("XML, колонки", new_xml, xml_pages),
+                               ("JSON, колонки", new_json, json_pages)]:
+        per_page, peak = measure(parse, pages)
+        base = base or per_page
+        print(f"  {name:22s}: {per_page * 1000:7.3f} мс/стр (x{base / per_page:.1f}), пик памяти {peak / 1024:7.1f} КБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк индикаторов Dual Momentum: цикл по активам в колонки DataFrame против матриц.
+
+Синтетические закрытия и объёмы DAYS дней для 4, 50 и 500 активов. Старый
+путь — базовый get_and_send_signal: на каждый актив MA, RSI, MA объёма и
+20-дневная волатильность новыми колонками DataFrame. Новый — по одному
+вызову rolling_mean_matrix / rsi_matrix / volatility_matrix на все активы.
+Результаты сверяются по всем датам.
+
+    python bench_matrix.py [дней]
+"""
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from indicators import rolling_mean_matrix, rsi_matrix, volatility_matrix
+
+DAYS = int(sys.argv[1]) if len(sys.argv) > 1 else 2500
+ASSET_COUNTS = [4, 50, 500]
+MA_PERIOD, RSI_PERIOD = 20, 9
+
+
+def compute_rsi(series, window=14):
+    delta = series.diff()
+    gain = (delta.where(delta > 0, 0)).fillna(0)
+    loss = (-delta.where(delta < 0, 0)).fillna(0)
+    avg_gain = gain.rolling(window=window, min_periods=1).mean()
+    avg_loss = loss.rolling(window=window, min_periods=1).mean()
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def column_loop(df, assets):
+    """Базовый путь: индикаторы по активам новыми колонками."""
+    for asset in assets:
+        df[f'MA_{asset}'] = df[f'CLOSE_{asset}'].rolling(MA_PERIOD).mean()
+        df[f'RSI_{asset}'] = compute_rsi(df[f'CLOSE_{asset}'], RSI_PERIOD)
+        df[f'VOL_MA10_{asset}'] = df[f'VOLUME_{asset}'].rolling(10).mean()
+        returns = df[f'CLOSE_{asset}'].pct_change()
+        df[f'VOLATILITY_{asset}'] = returns.rolling(20).std() * np.sqrt(252)
+    return {name: df[[f'{name}_{a}' for a in assets]].to_numpy() for name in ("MA", "RSI", "VOL_MA10", "VOLATILITY")}
+
+
+def matrices(df, assets):
+    closes = df[[f'CLOSE_{a}' for a in assets]].to_numpy(dtype=float)
+    volumes = df[[f'VOLUME_{a}' for a in assets]].to_numpy(dtype=float)
+    return {
+        "MA": rolling_mean_matrix(closes, MA_PERIOD),
+        "RSI": rsi_matrix(closes, RSI_PERIOD, min_periods=1),
+        "VOL_MA10": rolling_mean_matrix(volumes, 10),
+        "VOLATILITY": volatility_matrix(closes, 20),
+    }
+
+
+def synthetic_frame(n_assets, seed=0):
+    rng = np.random.default_rng(seed)
+    assets = [f"A{i:03d}" for i in range(n_assets)]
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (DAYS, n_assets)), axis=0))
+    volumes = rng.integers(1_000, 100_000, (DAYS, n_assets)).astype(float)
+    df = pd.concat([pd.DataFrame(closes, columns=[f'CLOSE_{a}' for a in assets]),
+                    pd.DataFrame(volumes, columns=[f'VOLUME_{a}' for a in assets])], axis=1)
+    return df, assets
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    print(f"⏱ {DAYS} дней; MA{MA_PERIOD}, RSI{RSI_PERIOD}, MA объёма 10, волатильность 20")
+    for n_assets in ASSET_COUNTS:
+        df, assets = synthetic_frame(n_assets)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", pd.errors.PerformanceWarning)  # фрагментация кадра — часть старого пути
+            expected, loop_time = timed(lambda: column_loop(df.copy(), assets))
+        actual, matrix_time = timed(lambda: matrices(df, assets))
+        for name in expected:
+            np.testing.assert_allclose(actual[name], expected[name], rtol=1e-9, atol=1e-12, equal_nan=True)
+        print(f"  активов {n_assets:3d}: колонки {loop_time * 1000:8.1f} мс, матрицы {matrix_time * 1000:7.1f} мс "
+              f"(x{loop_time / matrix_time:.1f})")
+
+
+if __name__ == "__main__":
+    main()
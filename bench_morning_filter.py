@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк бэктеста утреннего фильтра: цикл по дням против сетки на сгруппированных сессиях.
+
+Данные — как у optimize_morning_filter.load_data() (data/, только чтение).
+Старый путь — базовый simulate_strategy: цикл по дням, на каждый рисковый
+день скан всего M1 (m1.index.date == day) и скалярные .loc, по прогону на
+комбинацию. Новый — prepare_backtest один раз и simulate_grid на всю сетку.
+Цикл медленный, поэтому он идёт по LOOP_SAMPLE комбинациям сетки, а время
+на всю сетку пересчитывается по среднему; кривые этих комбинаций сверяются
+с сеткой бит в бит.
+
+    python bench_morning_filter.py [комбинаций_для_цикла]
+"""
+import sys
+import time
+
+import numpy as np
+
+from optimize_morning_filter import (MIN_RETURNS, RISK_FREE, WINDOW_SIZES, load_data, prepare_backtest,
+                                     simulate_grid)
+
+LOOP_SAMPLE = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+
+
+def loop_strategy(signals, d1_full, m1, min_return, window_minutes, fee=0.0004):
+    """Базовый цикл по дням."""
+    portfolio = 1.0
+    portfolio_values = []
+    trading_days = d1_full.index.tolist()
+    for i in range(len(trading_days) - 1):
+        date, next_date = trading_days[i], trading_days[i + 1]
+        asset = signals.loc[date] if date in signals.index else RISK_FREE
+        rf_ret = d1_full.loc[next_date, RISK_FREE] / d1_full.loc[date, RISK_FREE] - 1
+        if asset == RISK_FREE:
+            portfolio *= 1 + (rf_ret - fee)
+        else:
+            m1_df = m1[asset]
+            m1_day = m1_df[m1_df.index.date == next_date.date()]
+            if len(m1_day) < window_minutes:
+                portfolio *= 1 + rf_ret
+            else:
+                close_at_window = m1_day.iloc[window_minutes - 1]["close"]
+                gain = close_at_window / m1_day.iloc[0]["open"] - 1
+                if gain >= min_return:
+                    portfolio *= 1 + (d1_full.loc[next_date, asset] / close_at_window - 1 - 2 * fee)
+                else:
+                    portfolio *= 1 + rf_ret
+        portfolio_values.append(portfolio)
+    return np.array(portfolio_values)
+
+
+def main():
+    signals, d1_full, m1 = load_data()
+    combos = [(r, w) for r in MIN_RETURNS for w in WINDOW_SIZES]
+    print(f"\n⏱ {len(d1_full)} дней, сетка {len(MIN_RETURNS)}×{len(WINDOW_SIZES)} = {len(combos)} комбинаций")
+
+    sample = np.unique(np.linspace(0, len(combos) - 1, min(LOOP_SAMPLE, len(combos))).astype(int))
+    started = time.perf_counter()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        loops = [loop_strategy(signals, d1_full, m1, *combos[i]) for i in sample]
+    loop_time = (time.perf_counter() - started) / len(sample) * len(combos)
+
+    started = time.perf_counter()
+    prepared = prepare_backtest(signals, d1_full, m1)
+    _, equity = simulate_grid(prepared, MIN_RETURNS, WINDOW_SIZES)
+    grid_time = time.perf_counter() - started
+
+    curves = equity.reshape(len(combos), -1)[sample]
+    mismatched = sum(not np.array_equal(curve, loop, equal_nan=True) for curve, loop in zip(curves, loops))
+    print(f"  цикл по дням: ~{loop_time:.1f} с на сетку ({loop_time / len(combos) * 1000:.0f} мс на комбинацию, "
+          f"замер по {len(sample)})")
+    print(f"  сетка:        {grid_time * 1000:.1f} мс (x{loop_time / grid_time:.0f})")
+    print(f"  кривые {len(sample)} комбинаций: " + ("совпадают бит в бит" if not mismatched else f"расходятся у {mismatched}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк генерации сигналов Dual Momentum: цикл по датам против generate_signals_grid.
+
+Синтетические цены YEARS лет по будням для ASSETS и RISK_FREE. Старый путь —
+базовый цикл generate_signals (скалярные .iloc и список словарей), он же
+служит эталоном: результаты сверяются на каждом lookback. Замеряются один
+lookback и сетка LOOKBACKS (циклом — по прогону на lookback, векторно — одним
+вызовом).
+
+    python bench_signals.py [лет]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from generate_signals import ASSETS, LOOKBACK, RISK_FREE, generate_signals, generate_signals_grid
+
+YEARS = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+LOOKBACKS = [1, 2, 3, 5, 10, 20, 40, 60]
+
+
+def loop_signals(df, lookback):
+    """Базовый цикл по датам."""
+    signals = []
+    dates = df.index.tolist()
+    for i in range(lookback, len(df)):
+        best_asset = RISK_FREE
+        best_mom = -float("inf")
+        rf_mom = df[RISK_FREE].iloc[i] / df[RISK_FREE].iloc[i - lookback] - 1
+        for asset in ASSETS:
+            mom = df[asset].iloc[i] / df[asset].iloc[i - lookback] - 1
+            if mom > best_mom:
+                best_mom = mom
+                best_asset = asset
+        signals.append({"date": dates[i], "signal": best_asset if best_mom > rf_mom else RISK_FREE})
+    return pd.DataFrame(signals)
+
+
+def synthetic_prices(years, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2010-01-01", periods=years * 252, name="TRADEDATE")
+    columns = ASSETS + [RISK_FREE]
+    returns = rng.normal(0.0003, 0.01, (len(dates), len(columns)))
+    return pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)), index=dates, columns=columns)
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    df = synthetic_prices(YEARS)
+    print(f"⏱ {len(df)} дней × {len(ASSETS) + 1} активов; сетка lookback {LOOKBACKS}")
+
+    expected, loop_time = timed(lambda: loop_signals(df, LOOKBACK))
+    actual, vector_time = timed(lambda: generate_signals(df, LOOKBACK))
+    pd.testing.assert_frame_equal(actual, expected)
+    print(f"  lookback={LOOKBACK}: цикл {loop_time * 1000:.1f} мс, вектор {vector_time * 1000:.2f} мс "
+          f"(x{loop_time / vector_time:.0f})")
+
+    loops, loop_time = timed(lambda: {lb: loop_signals(df, lb) for lb in LOOKBACKS})
+    grid, vector_time = timed(lambda: generate_signals_grid(df, LOOKBACKS))
+    for lb in LOOKBACKS:
+        pd.testing.assert_frame_equal(grid[lb], loops[lb])
+    print(f"  сетка из {len(LOOKBACKS)}: цикл {loop_time:.2f} с, вектор {vector_time * 1000:.1f} мс "
+          f"(x{loop_time / vector_time:.0f}); сигналы совпадают")
+
+
+if __name__ == "__main__":
+    main()
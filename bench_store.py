@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк загрузки всего набора рядов: разбор CSV против колоночных копий data_store.
+
+Все CSV из data/ копируются во временный каталог (data/columnar не трогается),
+рядом пишутся колоночные копии. Старый путь — pd.read_csv и pd.to_datetime по
+колонкам дат, как делали скрипты до data_store; новый — read_table(), который
+читает свежую Parquet-копию. Время — лучшее из REPEAT загрузок всего набора.
+Без pyarrow замеряется только CSV.
+
+    python bench_store.py [повторов]
+"""
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import data_store
+
+REPEAT = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+
+def load_csv_text(paths):
+    for path in paths:
+        df = pd.read_csv(path)
+        for col in data_store.DATE_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col])
+
+
+def load_store(paths):
+    for path in paths:
+        data_store.read_table(path)
+
+
+def best_of(load, paths):
+    times = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        load(paths)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main():
+    sources = sorted(glob.glob(os.path.join(data_store.DATA_DIR, "*.csv")) +
+                     glob.glob(os.path.join(data_store.DATA_DIR, "*.CSV")))
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for source in sources:
+            path = os.path.join(tmp, os.path.basename(source))
+            shutil.copy2(source, path)
+            data_store.write_columnar(data_store._parse_dates(pd.read_csv(path)), path)
+            paths.append(path)
+
+        rows = sum(len(pd.read_csv(path)) for path in paths)
+        print(f"⏱ Набор {len(paths)} файлов, {rows} строк; лучшее из {REPEAT}")
+        csv_time = best_of(load_csv_text, paths)
+        print(f"  CSV + pd.to_datetime: {csv_time * 1000:8.1f} мс")
+        if data_store.pq is None:
+            print("  pyarrow не установлен — колоночные копии не замеряются")
+            return
+        store_time = best_of(load_store, paths)
+        print(f"  read_table (Parquet): {store_time * 1000:8.1f} мс (x{csv_time / store_time:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк отбора по времени суток: строки и datetime.time против int64 из time_of_day.
+
+Синтетический минутный ряд из ROWS меток. Старые пути — базовые
+filter_12h_candles (dt.time → строки → pd.to_datetime → abs) и
+filter_0959_to_1059 (сравнение объектов dt.time); для «ближайшей к 12:00
+свечи за день» — groupby по дате и idxmin. Новые — near_mask, window_mask и
+nearest_per_day. Результаты сверяются. Строковый путь без явного формата
+разбирает каждую строку через dateutil, поэтому на миллионах строк он идёт
+минутами.
+
+    python bench_time_of_day.py [строк]
+"""
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from time_of_day import near_mask, nearest_per_day, window_mask
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+
+
+def old_near_12(end):
+    end_time = end.dt.time
+    time_diff = (pd.to_datetime(end_time.astype(str)) - pd.to_datetime('12:00:00')).abs()
+    return (time_diff <= pd.Timedelta(minutes=1)).to_numpy()
+
+
+def old_window(begin):
+    times = begin.dt.time
+    return ((times >= pd.Timestamp("09:59").time()) & (times <= pd.Timestamp("10:59").time())).to_numpy()
+
+
+def old_nearest_per_day(end):
+    dist = (end - end.dt.normalize() - pd.Timedelta(hours=12)).abs()
+    return np.sort(dist.groupby(end.dt.date).idxmin().to_numpy())
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    # Минуты сессии 07:00–23:49 (как у ISS), поэтому в каждом дне есть метки до и после 12:00
+    days = pd.bdate_range("2015-01-01", periods=ROWS // 1010 + 1)
+    minutes = pd.to_timedelta(np.arange(7 * 60, 7 * 60 + 1010), unit="min")
+    stamps = pd.Series((days.to_numpy()[:, None] + minutes.to_numpy()[None, :]).ravel()[:ROWS])
+    print(f"⏱ {len(stamps):,} минутных меток, {stamps.dt.normalize().nunique()} дней")
+
+    for name, old, new in [
+        ("около 12:00 ±1 мин", lambda: old_near_12(stamps), lambda: near_mask(stamps, "12:00:00", "1min")),
+        ("окно 09:59–10:59", lambda: old_window(stamps), lambda: window_mask(stamps, "09:59:00", "10:59:00")),
+        ("ближайшая к 12:00 за день", lambda: old_nearest_per_day(stamps), lambda: nearest_per_day(stamps, "12:00")),
+    ]:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # «Could not infer format» — часть старого пути
+            expected, old_time = timed(old)
+        actual, new_time = timed(new)
+        np.testing.assert_array_equal(actual, expected)
+        print(f"  {name:26s}: строки/time {old_time:7.2f} с, int64 {new_time * 1000:7.1f} мс (x{old_time / new_time:.0f})")
+
+
+if __name__ == "__main__":
+    main()
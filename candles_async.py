@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Единственный backend загрузки семейства candles.json (M1, H1, любой interval).
+
+Все запросы «тикер × диапазон» (или «тикер × окно сессии», или сегменты
+backfill) планируются на одном event loop. Одновременность ограничивает asyncio.Semaphore, частоту —
+асинхронный token bucket; сами HTTP-запросы выполняются в пуле потоков через
+общий iss_client, поэтому дисковый кэш, пул соединений и повторы остаются
+теми же, что у синхронных скриптов. Ответы из кэша не тратят ни слот, ни токен.
+
+Для обычных скриптов есть синхронные обёртки fetch_range / fetch_windows;
+backfill запускает свои корутины через run() и fetch_page().
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+
+import iss_client
+from moex_candles import MAX_RETRIES, PAGE_SIZE, page_request, parse_page, retry_delay, to_frame, window_ranges
+
+CONCURRENCY = int(os.getenv("ISS_ASYNC_CONCURRENCY", str(iss_client.POOL_SIZE)))
+RATE = float(os.getenv("ISS_ASYNC_RATE", str(iss_client.REQUESTS_PER_SECOND)))
+SEGMENT_DAYS = int(os.getenv("ISS_ASYNC_SEGMENT_DAYS", "30"))
+
+
+class AsyncTokenBucket:
+    """Token bucket для корутин: rate токенов в секунду, запас до burst."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate or self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Scheduler:
+    def __init__(self, concurrency, rate):
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.bucket = AsyncTokenBucket(rate)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def get(self, url, params):
+        resp = await self.run(iss_client.cached, url, params)
+        if resp is not None:
+            return resp
+        async with self.semaphore:
+            await self.bucket.acquire()
+            return await self.run(lambda: iss_client.get(url, params=params, rate_limit=False))
+
+
+async def fetch_page(sched, ticker, date_from, date_till, interval=1, start=0):
+    """
+    Одна страница candles.json с повторными попытками (экспоненциальная пауза).
+    Возвращает (колонки или None, строки). После MAX_RETRIES неудач поднимает
+    последнее исключение.
+    """
+    url, params = page_request(ticker, date_from, date_till, interval, start)
+    for attempt in range(1, MAX_RETRIES + 1):
+        if attempt > 1:
+            await asyncio.sleep(retry_delay(attempt))
+        try:
+            resp = await sched.get(url, params)
+            resp.raise_for_status()
+            # Разбор внутри попытки: ответ без блока candles повторяется, как сетевой сбой
+            return parse_page(resp.json(), ticker, start)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"⚠ {ticker}: ошибка запроса свечей (попытка {attempt}/{MAX_RETRIES}): {e}")
+            if isinstance(e, ValueError):
+                iss_client.invalidate(url, params)  # ответ не разобрался — следующая попытка идёт в сеть
+            if attempt == MAX_RETRIES:
+                raise
+
+
+async def _fetch_range(sched, ticker, date_from, date_till, interval):
+    """
+    Страницы одного диапазона идут подряд (следующий start зависит от предыдущей).
+    Сбой страницы поднимается дальше: неполный диапазон не выдаётся за успешный.
+    """
+    columns, all_rows, start = None, [], 0
+    while True:
+        try:
+            page_columns, rows = await fetch_page(sched, ticker, date_from, date_till, interval, start)
+        except Exception as e:
+            print(f"⚠️ Ошибка при загрузке {ticker} ({date_from}–{date_till}, start={start}): {e}")
+            raise
+        columns = columns or page_columns
+        if not rows:
+            break
+        all_rows.extend(rows)
+        start += len(rows)
+        if len(rows) < PAGE_SIZE:
+            break
+    return columns, all_rows
+
+
+def run(main, concurrency=CONCURRENCY, rate=RATE):
+    """Выполняет корутину main(sched) на новом event loop с общим планировщиком запросов."""
+    async def runner():
+        sched = Scheduler(concurrency, rate)
+        try:
+            return await main(sched)
+        finally:
+            sched.executor.shutdown(wait=False)
+    return asyncio.run(runner())
+
+
+def _fetch_all(jobs, interval, concurrency, rate):
+    async def main(sched):
+        return await asyncio.gather(*(
+            _fetch_range(sched, ticker, lo, hi, interval) for ticker, lo, hi in jobs
+        ), return_exceptions=True)
+    return run(main, concurrency, rate)
+
+
+def _collect(jobs, results):
+    """
+    ({тикер: DataFrame}, {тикер: ошибка}) из результатов по заданиям (в порядке
+    заданий). После первого неудачного задания тикера его следующие задания
+    отбрасываются, чтобы в данных не было дыры перед последней свечой.
+    """
+    rows_by_ticker, columns_by_ticker, errors = {}, {}, {}
+    for (ticker, lo, _), result in zip(jobs, results):
+        rows_by_ticker.setdefault(ticker, [])
+        if ticker in errors:
+            continue
+        if isinstance(result, BaseException):
+            errors[ticker] = f"{lo}: {result}"
+            continue
+        columns, rows = result
+        rows_by_ticker[ticker].extend(rows)
+        columns_by_ticker[ticker] = columns_by_ticker.get(ticker) or columns
+    frames = {
+        ticker: to_frame(rows, columns_by_ticker[ticker]) if rows else pd.DataFrame()
+        for ticker, rows in rows_by_ticker.items()
+    }
+    return frames, errors
+
+
+def fetch_range(ticker, date_from, date_till, interval=1, concurrency=CONCURRENCY, rate=RATE):
+    """
+    Синхронная обёртка: свечи тикера за [date_from, date_till] с пагинацией по start.
+    Возвращает DataFrame с колонками ISS (begin приведён к datetime) или пустой DataFrame.
+    Если страница не загрузилась после всех повторов, поднимает RuntimeError.
+    """
+    jobs = [(ticker, date_from, date_till)]
+    frames, errors = _collect(jobs, _fetch_all(jobs, interval, concurrency, rate))
+    if errors:
+        raise RuntimeError(f"{ticker}: не загружен диапазон с {errors[ticker]}")
+    return frames[ticker]
+
+
+def fetch_windows(sessions_by_ticker, time_from, time_till, interval=1, since_by_ticker=None,
+                  concurrency=CONCURRENCY, rate=RATE, errors=None):
+    """
+    Синхронная обёртка для внутридневных окон: {тикер: [сессии]} -> {тикер: DataFrame}.
+    Все окна всех тикеров — на одном event loop.
+
+    Если окно тикера не загрузилось, его DataFrame содержит только сессии до
+    этого окна (следующий запуск продолжит с последней сохранённой свечи),
+    а ошибка попадает в словарь errors ({тикер: текст}), если он передан.
+    """
+    since_by_ticker = since_by_ticker or {}
+    jobs = [
+        (ticker, lo, hi)
+        for ticker, sessions in sessions_by_ticker.items()
+        for lo, hi in window_ranges(sessions, time_from, time_till, since_by_ticker.get(ticker))
+    ]
+    results = _fetch_all(jobs, interval, concurrency, rate) if jobs else []
+    frames, failed = _collect(jobs, results)
+    if errors is not None:
+        errors.update(failed)
+    return {t: frames.get(t, pd.DataFrame()) for t in sessions_by_ticker}
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+Общий слой хранения рядов.
+
+CSV в data/ остаются основным форматом репозитория, рядом с ними хранятся
+типизированные колоночные копии (Parquet) в data/columnar/. Копию пишут
+только write_table()/append_table(); в её метаданных — размер и mtime CSV
+на момент записи. append_table() не переписывает копию, а кладёт рядом
+только новые строки (columnar/{name}.part{k}.parquet); в каждой части —
+отметки CSV до и после дописывания, так что части выстраиваются в цепочку.
+read_table() ничего не пишет: если цепочка доходит до текущих размера и
+mtime CSV, читается копия (без разбора текста и pd.to_datetime), иначе —
+сам CSV. Копии — локальный кэш, в git не хранятся
+(после checkout mtime меняется, и они всё равно считаются устаревшими).
+Без pyarrow слой прозрачно работает только с CSV.
+"""
+import io
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # колоночное хранилище необязательно
+    pa = None
+    pq = None
+
+DATA_DIR = "data"
+
+# Колонки с датами во всех наших файлах
+DATE_COLUMNS = ("TRADEDATE", "begin", "end", "date")
+
+_STAMP_KEY = b"source_stamp"
+_PREV_STAMP_KEY = b"prev_source_stamp"
+
+# После стольких частей append_table собирает копию в один файл заново
+COLUMNAR_MAX_PARTS = 30
+
+# Счётчик реальных чтений с диска (путь -> число разборов) и хуки трассировки
+read_counts = Counter()
+_read_hooks = []
+
+# Кэш load_csv: путь -> (mtime_ns, размер, нормализованный DataFrame)
+_frame_cache = {}
+_cache_lock = threading.Lock()
+
+
+def columnar_path(csv_path):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(os.path.dirname(csv_path) or ".", "columnar", f"{name}.parquet")
+
+
+def _source_stamp(path):
+    """Размер и mtime файла — дешёвая проверка, что CSV не менялся после записи копии."""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}".encode()
+
+
+def _parse_dates(df):
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    return df
+
+
+def _part_path(csv_path, k):
+    return f"{os.path.splitext(columnar_path(csv_path))[0]}.part{k}.parquet"
+
+
+def _write_parquet(df, path, metadata):
+    table = pa.Table.from_pandas(_parse_dates(df.copy()), preserve_index=False)
+    merged = dict(table.schema.metadata or {})
+    merged.update(metadata)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table.replace_schema_metadata(merged), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def write_columnar(df, csv_path):
+    """Пишет колоночную копию CSV одним файлом. Возвращает False, если pyarrow недоступен."""
+    if pq is None or not os.path.exists(csv_path):
+        return False
+    path = columnar_path(csv_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_parquet(df, path, {_STAMP_KEY: _source_stamp(csv_path)})
+    k = 1
+    while os.path.exists(_part_path(csv_path, k)):
+        os.remove(_part_path(csv_path, k))
+        k += 1
+    return True
+
+
+def write_table(df, csv_path, **csv_kwargs):
+    """Атомарно сохраняет CSV (для репозитория) и его колоночную копию."""
+    tmp_path = f"{csv_path}.tmp"
+    df.to_csv(tmp_path, index=False, **csv_kwargs)
+    os.replace(tmp_path, csv_path)
+    write_columnar(df, csv_path)
+
+
+def _columnar_files(csv_path):
+    """Файлы копии (основной и части) по порядку, если цепочка доходит до текущего CSV."""
+    if pq is None:
+        return None
+    path = columnar_path(csv_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        stamp = (pq.read_schema(path).metadata or {}).get(_STAMP_KEY)
+        files = [path]
+        while os.path.exists(_part_path(csv_path, len(files))):
+            part = _part_path(csv_path, len(files))
+            metadata = pq.read_schema(part).metadata or {}
+            if metadata.get(_PREV_STAMP_KEY) != stamp:
+                break
+            stamp = metadata.get(_STAMP_KEY)
+            files.append(part)
+    except Exception:
+        return None
+    return files if stamp == _source_stamp(csv_path) else None
+
+
+def _read_columnar(files):
+    frames = [pq.read_table(path).to_pandas() for path in files]
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def _read_fresh_columnar(csv_path):
+    files = _columnar_files(csv_path)
+    if files is None:
+        return None
+    try:
+        return _read_columnar(files)
+    except Exception:
+        return None
+
+
+def _append_columnar(fresh, csv_path, files, prev_stamp):
+    """Кладёт дописанные строки отдельной частью (или собирает копию заново, если частей много)."""
+    if len(files) > COLUMNAR_MAX_PARTS:
+        write_columnar(pd.concat([_read_columnar(files), _parse_dates(fresh.copy())], ignore_index=True), csv_path)
+    else:
+        _write_parquet(fresh, _part_path(csv_path, len(files)),
+                       {_PREV_STAMP_KEY: prev_stamp, _STAMP_KEY: _source_stamp(csv_path)})
+
+
+def add_read_hook(hook):
+    """Регистрирует hook(path), вызываемый при каждом чтении файла с диска."""
+    _read_hooks.append(hook)
+
+
+def remove_read_hook(hook):
+    if hook in _read_hooks:
+        _read_hooks.remove(hook)
+
+
+def _record_read(path):
+    read_counts[os.path.normpath(path)] += 1
+    for hook in list(_read_hooks):
+        hook(path)
+
+
+def read_table(csv_path):
+    """
+    Читает ряд: из свежей колоночной копии, иначе из CSV. Ничего не пишет.
+    Колонки дат (TRADEDATE/begin/end/date) уже приведены к datetime.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Файл не найден: {csv_path}")
+    _record_read(csv_path)
+    df = _read_fresh_columnar(csv_path)
+    if df is not None:
+        return df
+    return _parse_dates(pd.read_csv(csv_path))
+
+
+def _normalize(df):
+    """Нижний регистр колонок, индекс по дате, без NaN/NaT, по возрастанию даты."""
+    df.columns = df.columns.str.lower()
+    date_col = None
+    for col in ['tradedate', 'begin']:
+        if col in df.columns:
+            date_col = col
+            break
+    if date_col:
+        df[date_col] = pd.to_datetime(df[date_col])
+        df.set_index(date_col, inplace=True)
+    else:
+        df.index = pd.to_datetime(df.index)
+    df = df.dropna()
+    df = df[df.index.notna()]
+    df.sort_index(inplace=True)
+    return df
+
+
+def load_csv(filepath):
+    """
+    Загрузка ряда для сигнальных скриптов с кэшем в памяти процесса.
+    Файл разбирается один раз, пока не изменились его mtime/размер;
+    каждому вызову возвращается копия, которую можно свободно изменять.
+    """
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(f"Файл не найден: {filepath}")
+    key = os.path.abspath(filepath)
+    stat = os.stat(filepath)
+    with _cache_lock:
+        cached = _frame_cache.get(key)
+        if cached is None or cached[0] != stat.st_mtime_ns or cached[1] != stat.st_size:
+            cached = (stat.st_mtime_ns, stat.st_size, _normalize(read_table(filepath)))
+            _frame_cache[key] = cached
+    return cached[2].copy()
+
+
+def invalidate(filepath=None):
+    """Сбрасывает кэш load_csv для файла (или целиком, если путь не указан)."""
+    with _cache_lock:
+        if filepath is None:
+            _frame_cache.clear()
+        else:
+            _frame_cache.pop(os.path.abspath(filepath), None)
+
+
+def load_daily(ticker, data_dir=DATA_DIR):
+    """Дневной ряд тикера (TRADEDATE, OPEN, HIGH, LOW, CLOSE, VOLUME)."""
+    return read_table(os.path.join(data_dir, f"{ticker}.csv"))
+
+
+def read_tail(csv_path, n_rows=5, block_size=4096):
+    """Читает только последние n_rows строк CSV (с заголовком), не разбирая весь файл."""
+    with open(csv_path, "rb") as f:
+        header = f.readline()
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        chunk = b""
+        while pos > len(header) and chunk.count(b"\n") <= n_rows:
+            step = min(block_size, pos - len(header))
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step) + chunk
+    lines = chunk.splitlines()
+    if pos > len(header) and lines:
+        lines = lines[1:]  # первая строка блока может быть обрезана
+    lines = [line for line in lines if line.strip()][-n_rows:]
+    return _parse_dates(pd.read_csv(io.BytesIO(header + b"\n".join(lines) + b"\n")))
+
+
+def _rows_match(stored, fresh, key):
+    merged = stored.merge(fresh, on=key, how="inner", suffixes=("_old", "_new"))
+    for col in stored.columns:
+        if col == key or f"{col}_new" not in merged.columns:
+            continue
+        old = pd.to_numeric(merged[f"{col}_old"], errors="coerce").to_numpy(dtype=float)
+        new = pd.to_numeric(merged[f"{col}_new"], errors="coerce").to_numpy(dtype=float)
+        if not np.allclose(old, new, rtol=1e-9, atol=0.0, equal_nan=True):
+            return False
+    return True
+
+
+def append_table(df_new, csv_path, key="TRADEDATE", tail_rows=5):
+    """
+    Дописывает в CSV только строки новее последнего ключа — O(новых строк).
+
+    Перекрытие df_new с хвостом файла сверяется; если найдены исправления
+    (значения в перекрытии отличаются, перекрытие уходит глубже хвоста или
+    в хвосте есть строки без ключа), файл атомарно перезаписывается целиком.
+    Возвращает (число добавленных строк, была ли полная перезапись).
+    """
+    df_new = df_new.dropna(subset=[key]).sort_values(key)
+    if not os.path.exists(csv_path):
+        write_table(df_new, csv_path)
+        return len(df_new), True
+
+    tail = read_tail(csv_path, tail_rows)
+    if tail.empty:
+        write_table(df_new, csv_path)
+        return len(df_new), True
+
+    last_key = tail[key].max()
+    overlap = df_new[df_new[key] <= last_key]
+    fresh = df_new[df_new[key] > last_key]
+    consistent = (
+        tail[key].notna().all()
+        and (overlap.empty or overlap[key].min() >= tail[key].min())
+        and _rows_match(tail, overlap, key)
+    )
+
+    if not consistent:
+        df_old = _parse_dates(pd.read_csv(csv_path))
+        df_full = (
+            pd.concat([df_old, df_new])
+            .dropna(subset=[key])
+            .drop_duplicates(subset=key, keep="last")
+            .sort_values(key)
+        )
+        write_table(df_full[list(df_old.columns)], csv_path)
+        return len(fresh), True
+
+    if fresh.empty:
+        return 0, False
+
+    # Приводим новые строки к колонкам и типам файла, чтобы формат не «поплыл»
+    fresh = fresh.reindex(columns=tail.columns)
+    fresh = fresh.astype({col: tail[col].dtype for col in tail.columns if col != key})
+    columnar_files = _columnar_files(csv_path)
+    prev_stamp = _source_stamp(csv_path)
+    with open(csv_path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    fresh.to_csv(csv_path, mode="a", header=False, index=False)
+
+    # Копию продолжаем новой частью, только если она была актуальной
+    if columnar_files is not None:
+        try:
+            _append_columnar(fresh, csv_path, columnar_files, prev_stamp)
+        except OSError:
+            pass
+    return len(fresh), False
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Снимок признаков по тикерам для сигнальных скриптов (data/features.json).
+
+Запускается один раз после загрузки данных (auto_update, обновление H1) и
+сохраняет для каждого тикера готовые признаки: изменения цены и отношения
+объёма за PRICE_DYNAMICS, моментум, EMA для всех адаптивных периодов, RSI,
+уровни поддержки/сопротивления и подтверждение по H1. Файл не хранится в
+git: workflow загрузки сохраняют его в actions/cache, сигнальные workflow
+восстанавливают последний сохранённый.
+
+Каждая запись помечена версией данных — sha1 содержимого дневного и часового
+файлов тикера и параметров расчёта — и отметкой (размер и mtime файлов).
+features(ticker) отдаёт запись из снимка, если совпадает отметка, а если нет
+(после checkout mtime другие) — если совпадает версия; иначе считает признаки
+на месте (результат тот же), поэтому устаревший снимок не меняет сигналов.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+from data_store import DATA_DIR, load_csv
+from indicators import EMA, RSI, Tail, stream_last, volume_ratios
+from levels import LEVEL_TOLERANCE, ORDER, ticker_levels
+
+SNAPSHOT_PATH = os.path.join(DATA_DIR, "features.json")
+SCHEMA_VERSION = 2
+
+TICKERS = ["OBLG", "EQMX", "GOLD", "LQDT"]
+
+DAILY_PATHS = {ticker: f"data/{ticker}.csv" for ticker in TICKERS}
+
+HOURLY_PATHS = {
+    "OBLG": "data/OBLG_H1_35.CSV",
+    "EQMX": "data/EQMX_H1_35.CSV",
+    "GOLD": "data/GOLD_H1_35.CSV",
+}
+
+PRICE_DYNAMICS = [1, 5, 10]
+MOMENTUM_PERIODS = [2, 5, 10, 20]
+EMA_SPANS = [20, 35, 50]  # все периоды calculate_adaptive_ema_span
+EMA_TREND_WINDOW = 5
+
+# Поля с целыми ключами (в JSON ключи становятся строками)
+_INT_KEYED = ("price_changes", "volume_ratios", "momentum", "ema")
+
+_snapshot_cache = {}
+_digest_cache = {}
+
+
+# ——— Расчёт признаков ———
+
+def _price_changes(close, periods):
+    current = close.iloc[-1]
+    changes = {}
+    for days in periods:
+        if len(close) > days:
+            past = close.iloc[-(days + 1)]
+            changes[days] = (current - past) / past * 100
+        else:
+            changes[days] = None
+    return changes
+
+
+def _ema(ticker, close, span):
+    """EMA(span) на последнем баре и EMA_TREND_WINDOW баров назад (потоково, с сохранённым состоянием)."""
+    recent = stream_last(f"ema{span}_{ticker}", close, lambda: Tail(EMA(span), EMA_TREND_WINDOW))
+    prev = recent[0] if len(close) >= EMA_TREND_WINDOW + 1 else None
+    return {"value": recent[-1], "prev": prev}
+
+
+def h1_confirmation(ticker):
+    """RSI(14) по H1 в коридоре 30–70 (нет файла или колонки — подтверждение есть)."""
+    filepath = HOURLY_PATHS.get(ticker)
+    if not filepath or not os.path.exists(filepath):
+        return True
+    df_h1 = load_csv(filepath)
+    if 'close' not in df_h1.columns:
+        return True
+    df_h1.sort_index(inplace=True)
+    current_rsi = stream_last(f"rsi14_h1_{ticker}", df_h1['close'], lambda: RSI(14))
+    return bool(30 < current_rsi < 70)
+
+
+def compute_features(ticker):
+    """Признаки тикера по текущим файлам (None, если в дневном ряду нет close/volume)."""
+    df = load_csv(DAILY_PATHS[ticker])
+    if 'close' not in df.columns or 'volume' not in df.columns:
+        return None
+    close, volume = df['close'], df['volume']
+    levels = ticker_levels(ticker, df)
+    return {
+        "date": str(df.index[-1].date()),
+        "rows": len(df),
+        "price": close.iloc[-1],
+        "volume": volume.iloc[-1],
+        "volume_q70": volume.quantile(0.7),
+        "price_changes": _price_changes(close, PRICE_DYNAMICS),
+        "momentum": _price_changes(close, MOMENTUM_PERIODS),
+        "volume_ratios": {days: volume_ratios(volume.to_numpy()[-(days + 1):], days)[-1]
+                          for days in PRICE_DYNAMICS},
+        "ema": {span: _ema(ticker, close, span) for span in EMA_SPANS},
+        "rsi": stream_last(f"rsi14_{ticker}", close, RSI) if len(df) > 0 else 50,
+        "supports": levels.supports.tolist(),
+        "resistances": levels.resistances.tolist(),
+        "h1_confirmed": h1_confirmation(ticker),
+    }
+
+
+# ——— Версия данных и снимок ———
+
+def _params():
+    return f"{SCHEMA_VERSION}|{ORDER}|{LEVEL_TOLERANCE}|{EMA_SPANS}"
+
+
+def _data_paths(ticker):
+    return [path for path in (DAILY_PATHS[ticker], HOURLY_PATHS.get(ticker)) if path and os.path.exists(path)]
+
+
+def data_stamp(ticker):
+    """Параметры расчёта и размер/mtime файлов тикера — дешёвая проверка без чтения файлов."""
+    parts = [_params()]
+    for path in _data_paths(ticker):
+        stat = os.stat(path)
+        parts.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(parts)
+
+
+def _file_digest(path):
+    """sha1 содержимого файла (кэшируется в процессе до изменения файла)."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _digest_cache:
+        with open(path, "rb") as f:
+            _digest_cache[key] = hashlib.sha1(f.read()).hexdigest()
+    return _digest_cache[key]
+
+
+def data_version(ticker):
+    """sha1 параметров расчёта и содержимого дневного и часового файлов тикера."""
+    digest = hashlib.sha1(_params().encode())
+    for path in _data_paths(ticker):
+        digest.update(_file_digest(path).encode())
+    return digest.hexdigest()
+
+
+def _to_json(value):
+    if isinstance(value, dict):
+        return {str(k): _to_json(v) for k, v in value.items()}
+    if hasattr(value, "item"):  # скаляры numpy
+        return value.item()
+    return value
+
+
+def _from_json(features):
+    if features is None:
+        return None
+    features = dict(features)
+    for field in _INT_KEYED:
+        features[field] = {int(k): v for k, v in features[field].items()}
+    return features
+
+
+def build_snapshot(tickers=TICKERS, path=SNAPSHOT_PATH):
+    """Считает признаки всех тикеров и атомарно записывает снимок."""
+    snapshot = {
+        "schema": SCHEMA_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "tickers": {},
+    }
+    for ticker in tickers:
+        if not os.path.exists(DAILY_PATHS[ticker]):
+            print(f"⚠️ {ticker}: нет дневного файла, пропуск")
+            continue
+        snapshot["tickers"][ticker] = {
+            "stamp": data_stamp(ticker),
+            "version": data_version(ticker),
+            "features": _to_json(compute_features(ticker)),
+        }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+    _snapshot_cache.clear()
+    return snapshot
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """Снимок из файла (кэшируется в процессе до изменения файла); None, если его нет."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _snapshot_cache:
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        _snapshot_cache.clear()
+        _snapshot_cache[key] = snapshot if snapshot.get("schema") == SCHEMA_VERSION else None
+    return _snapshot_cache[key]
+
+
+def features(ticker, path=SNAPSHOT_PATH):
+    """
+    Признаки тикера: из снимка, если он соответствует данным, иначе расчёт на месте.
+    Сначала сверяются размер и mtime файлов; содержимое хэшируется, только если
+    они изменились (например, после checkout или восстановления кэша).
+    """
+    snapshot = load_snapshot(path)
+    record = (snapshot or {}).get("tickers", {}).get(ticker)
+    if record is not None and (record.get("stamp") == data_stamp(ticker) or record["version"] == data_version(ticker)):
+        return _from_json(record["features"])
+    return _from_json(_to_json(compute_features(ticker)))
+
+
+def main():
+    snapshot = build_snapshot()
+    for ticker, record in snapshot["tickers"].items():
+        feats = record["features"]
+        if feats is None:
+            print(f"⚠️ {ticker}: нет колонок close/volume")
+            continue
+        print(f"✅ {ticker}: {feats['date']}, цена {feats['price']}, уровней "
+              f"{len(feats['supports'])}/{len(feats['resistances'])}, H1 {'✓' if feats['h1_confirmed'] else '✗'}")
+    print(f"💾 Снимок признаков: {SNAPSHOT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
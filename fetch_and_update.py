@@ -2,9 +2,15 @@ import requests
 import pandas as pd
 import xml.etree.ElementTree as ET
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 import time
 import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import iss_client
+from data_store import append_table, read_tail
+from iss_client import ISS_BASE_URL, MAX_IN_FLIGHT, REQUESTS_PER_SECOND
+from trading_calendar import TradingCalendar
 
 # Словарь тикеров: тикер -> (дата_начала, тип_актива, борд)
 TICKERS = {
@@ -21,95 +27,154 @@ os.makedirs(DATA_DIR, exist_ok=True)
 
 MAX_RETRIES = 5
 
-# ============================================
-# Настройка сессии для обхода защиты Мосбиржи
-# ============================================
-session = requests.Session()
-session.headers.update({
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-    'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8',
-    'Accept-Encoding': 'gzip, deflate',
-    'Connection': 'keep-alive',
-    'Cache-Control': 'max-age=0',
-})
+MAX_WORKERS = int(os.getenv("ISS_MAX_WORKERS", str(len(TICKERS))))
+PAGE_WORKERS = int(os.getenv("ISS_PAGE_WORKERS", "4"))  # параллельных страниц на один тикер
 
+# Формат ответа истории: "json" (колоночный разбор) или "xml" (старый путь через ElementTree)
+HISTORY_FORMAT = os.getenv("ISS_HISTORY_FORMAT", "json")
+HISTORY_COLUMNS = ["TRADEDATE", "OPEN", "HIGH", "LOW", "CLOSE", "VOLUME"]
 
-def fetch_moex_history_paginated(ticker, date_from, date_till, asset_type="fund", board="TQTF"):
-    all_rows = []
-    start = 0
 
+def _history_base_url(ticker, asset_type, board, fmt=None):
+    fmt = fmt or HISTORY_FORMAT
     # Формируем правильный URL БЕЗ лишних пробелов
     if asset_type == "index":
-        base_url = f"https://iss.moex.com/iss/history/engines/stock/markets/index/boards/{board}/securities/{ticker}.xml"
-    else:
-        base_url = f"https://iss.moex.com/iss/history/engines/stock/markets/shares/boards/{board}/securities/{ticker}.xml"
+        return f"{ISS_BASE_URL}/history/engines/stock/markets/index/boards/{board}/securities/{ticker}.{fmt}"
+    return f"{ISS_BASE_URL}/history/engines/stock/markets/shares/boards/{board}/securities/{ticker}.{fmt}"
 
-    while True:
-        url = f"{base_url}?from={date_from}&till={date_till}&start={start}"
-        print(f"🔹 Запрос: {url}")
 
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                # Экспоненциальная задержка перед повторной попыткой
-                if attempt > 1:
-                    delay = min(2 ** (attempt - 1) + random.uniform(0, 1), 10)
-                    print(f"  ⏳ Пауза {delay:.1f} сек перед попыткой {attempt}")
-                    time.sleep(delay)
-
-                # Используем сессию вместо requests.get()
-                r = session.get(url, timeout=(30, 60))  # connect=30s, read=60s
-                r.raise_for_status()
-                
-                # Проверка на пустой ответ или ошибку в XML
-                if not r.text.strip():
-                    raise Exception("Пустой ответ от сервера")
-                if "<error>" in r.text.lower():
-                    raise Exception(f"Ошибка в ответе: {r.text[:300]}")
-                
-                root = ET.fromstring(r.text)
-                break
-                
-            except requests.exceptions.Timeout as e:
-                print(f"⚠ Таймаут (попытка {attempt}/{MAX_RETRIES}): {e}")
-                if attempt == MAX_RETRIES:
-                    print(f"❌ Пропускаем {ticker} (start={start}) после {MAX_RETRIES} попыток")
-                    return pd.DataFrame()
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"⚠ Ошибка запроса (попытка {attempt}/{MAX_RETRIES}): {e}")
-                if attempt == MAX_RETRIES:
-                    print(f"❌ Пропускаем {ticker} (start={start}) после {MAX_RETRIES} попыток")
-                    return pd.DataFrame()
-                    
-            except Exception as e:
-                print(f"⚠ Неизвестная ошибка (попытка {attempt}/{MAX_RETRIES}): {e}")
-                if attempt == MAX_RETRIES:
-                    print(f"❌ Пропускаем {ticker} (start={start}) после {MAX_RETRIES} попыток")
-                    return pd.DataFrame()
+def parse_history_json(payload):
+    """
+    Разбирает JSON-ответ ISS сразу в колонки: {колонка: [значения]}.
+    Возвращает (колонки, число строк, курсор).
+    """
+    if "history" not in payload:
+        raise Exception(f"Нет блока history в ответе: {str(payload)[:300]}")
+    block = payload["history"]
+    names = block.get("columns") or []
+    data = block.get("data") or []
+    columns = dict(zip(names, map(list, zip(*data)))) if data else {name: [] for name in names}
 
-        rows = root.findall(".//row")
-        row_count = len(rows)
+    cursor = None
+    cursor_block = payload.get("history.cursor") or {}
+    if cursor_block.get("data"):
+        cursor_row = dict(zip(cursor_block.get("columns", []), cursor_block["data"][0]))
+        try:
+            cursor = {key: int(cursor_row[key]) for key in ("INDEX", "TOTAL", "PAGESIZE")}
+        except (KeyError, TypeError, ValueError):
+            cursor = None
+    return columns, len(data), cursor
 
-        if row_count == 0:
-            break
 
-        for row in rows:
-            all_rows.append(row.attrib)
+def parse_history_xml(text):
+    """Старый путь: XML + ElementTree. Возвращает то же, что parse_history_json."""
+    if "<error>" in text.lower():
+        raise Exception(f"Ошибка в ответе: {text[:300]}")
+    root = ET.fromstring(text)
+
+    # Строки берём только из блока history: блок history.cursor тоже содержит <row>
+    rows = root.findall("./data[@id='history']/rows/row")
+    columns = {name: [row.attrib.get(name) for row in rows] for name in HISTORY_COLUMNS}
+
+    cursor = None
+    cursor_row = root.find("./data[@id='history.cursor']/rows/row")
+    if cursor_row is not None:
+        try:
+            cursor = {key: int(cursor_row.attrib[key]) for key in ("INDEX", "TOTAL", "PAGESIZE")}
+        except (KeyError, ValueError):
+            cursor = None
+    return columns, len(rows), cursor
+
 
-        print(f"  Получено {row_count} строк (start={start})")
+def fetch_history_page(ticker, base_url, date_from, date_till, start):
+    """
+    Загружает одну страницу истории с повторными попытками.
+    Возвращает (колонки, число строк, курсор) или None, если все попытки исчерпаны.
+    Курсор — словарь INDEX/TOTAL/PAGESIZE из блока history.cursor (или None).
+    """
+    url = f"{base_url}?from={date_from}&till={date_till}&start={start}"
+    if base_url.endswith(".json"):
+        # Только нужные блоки и колонки, без метаданных
+        url += f"&iss.meta=off&iss.only=history,history.cursor&history.columns={','.join(HISTORY_COLUMNS)}"
+    print(f"🔹 Запрос: {url}")
 
-        if row_count < 100:
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            # Экспоненциальная задержка перед повторной попыткой
+            if attempt > 1:
+                delay = min(2 ** (attempt - 1) + random.uniform(0, 1), 10)
+                print(f"  ⏳ Пауза {delay:.1f} сек перед попыткой {attempt}")
+                time.sleep(delay)
+
+            # Общий клиент: кэш ответов, сессия и лимит частоты
+            r = iss_client.get(url)  # таймауты и пул соединений — в iss_client
+            r.raise_for_status()
+
+            # Проверка на пустой ответ
+            if not r.content.strip():
+                raise Exception("Пустой ответ от сервера")
+
+            if base_url.endswith(".json"):
+                columns, row_count, cursor = parse_history_json(r.json())
+            else:
+                columns, row_count, cursor = parse_history_xml(r.text)
             break
 
-        start += 100
-        # Небольшая пауза между страницами для соблюдения рейт-лимитов
-        time.sleep(0.5 + random.uniform(0, 0.5))
+        except requests.exceptions.Timeout as e:
+            print(f"⚠ Таймаут (попытка {attempt}/{MAX_RETRIES}): {e}")
+        except requests.exceptions.RequestException as e:
+            print(f"⚠ Ошибка запроса (попытка {attempt}/{MAX_RETRIES}): {e}")
+        except Exception as e:
+            print(f"⚠ Неизвестная ошибка (попытка {attempt}/{MAX_RETRIES}): {e}")
+            iss_client.invalidate(url)  # ответ не разобрался — следующая попытка идёт в сеть
+
+        if attempt == MAX_RETRIES:
+            print(f"❌ Пропускаем {ticker} (start={start}) после {MAX_RETRIES} попыток")
+            return None
+
+    print(f"  {ticker}: получено {row_count} строк (start={start})")
+    return columns, row_count, cursor
+
+
+def fetch_moex_history_paginated(ticker, date_from, date_till, asset_type="fund", board="TQTF"):
+    base_url = _history_base_url(ticker, asset_type, board)
+
+    first = fetch_history_page(ticker, base_url, date_from, date_till, 0)
+    if first is None:
+        return pd.DataFrame()
+    pages = [first]
+    _, row_count, cursor = first
 
-    if not all_rows:
+    if cursor and cursor["PAGESIZE"] > 0:
+        # Курсор известен: остальные страницы запрашиваем параллельно,
+        # executor.map сохраняет порядок страниц
+        starts = list(range(cursor["PAGESIZE"], cursor["TOTAL"], cursor["PAGESIZE"]))
+        if starts:
+            with ThreadPoolExecutor(max_workers=max(1, min(PAGE_WORKERS, len(starts)))) as executor:
+                rest = list(executor.map(
+                    lambda start: fetch_history_page(ticker, base_url, date_from, date_till, start),
+                    starts,
+                ))
+            if any(page is None for page in rest):
+                return pd.DataFrame()
+            pages.extend(rest)
+    else:
+        # Курсора нет — последовательно, пока страница не окажется неполной
+        start = 0
+        while row_count == 100:
+            start += 100
+            page = fetch_history_page(ticker, base_url, date_from, date_till, start)
+            if page is None:
+                return pd.DataFrame()
+            pages.append(page)
+            _, row_count, _ = page
+
+    if sum(page[1] for page in pages) == 0:
         return pd.DataFrame()
-    
-    df = pd.DataFrame(all_rows)
+
+    # Склеиваем страницы поколоночно, без промежуточных словарей на строку
+    names = [name for name in pages[0][0] if all(name in page[0] for page in pages)]
+    df = pd.DataFrame({name: [v for page in pages for v in page[0][name]] for name in names})
     required_cols = ["TRADEDATE", "OPEN", "HIGH", "LOW", "CLOSE"]
     
     # Добавляем VOLUME если есть, иначе заполняем нулями
@@ -127,49 +192,75 @@ def fetch_moex_history_paginated(ticker, date_from, date_till, asset_type="fund"
     return df.sort_values("TRADEDATE").reset_index(drop=True)
 
 
-def update_ticker(ticker, start_date, asset_type, board):
+def update_ticker(ticker, start_date, asset_type, board, calendar=None):
     file_path = os.path.join(DATA_DIR, f"{ticker}.csv")
 
     if os.path.exists(file_path):
-        df_old = pd.read_csv(file_path)
-        df_old['TRADEDATE'] = pd.to_datetime(df_old['TRADEDATE'])
-        last_date = (df_old['TRADEDATE'].max() + timedelta(days=1)).strftime("%Y-%m-%d")
+        # Читаем только хвост файла; последний день запрашиваем повторно для сверки перекрытия
+        tail = read_tail(file_path)
+        last_stored = tail['TRADEDATE'].max()
+    else:
+        last_stored = pd.NaT
+
+    if pd.notna(last_stored):
+        last_date = last_stored.strftime("%Y-%m-%d")
         print(f"📅 Последняя дата в {file_path}: {last_date} (запрашиваем с этой даты)")
     else:
-        df_old = pd.DataFrame()
         last_date = start_date
         print(f"🆕 Файл не существует, начинаем с {start_date}")
 
     today = datetime.today().strftime("%Y-%m-%d")
+    if calendar is not None and pd.notna(last_stored):
+        # Выходные и дни без ожидаемых сессий не стоят ни одного запроса
+        if not len(calendar.expected_sessions(last_stored + pd.Timedelta(days=1), today)):
+            print(f"💤 {ticker}: после {last_date} торговых сессий не ожидается — запрос пропущен")
+            return
+
     df_new = fetch_moex_history_paginated(ticker, last_date, today, asset_type, board)
 
     if df_new.empty:
         print(f"⚠ Нет новых данных для {ticker}")
         return
 
-    if not df_old.empty:
-        df_full = pd.concat([df_old, df_new]).drop_duplicates(subset="TRADEDATE").sort_values("TRADEDATE")
+    added, rewritten = append_table(df_new, file_path, key="TRADEDATE")
+    if rewritten:
+        print(f"✅ Перезаписано: {file_path} — {added} новых строк (найдены исправления или новый файл)")
+    elif added:
+        print(f"✅ Дописано: {file_path} — {added} новых строк")
     else:
-        df_full = df_new
+        print(f"⚠ Нет новых данных для {ticker}")
+
 
-    df_full.to_csv(file_path, index=False)
-    print(f"✅ Обновлено: {file_path} — {len(df_new)} новых строк (всего {len(df_full)})")
+def update_all(tickers=TICKERS, max_workers=MAX_WORKERS):
+    """
+    Параллельно обновляет все тикеры. Частоту обращений к ISS ограничивает
+    общий ограничитель частоты iss_client, поэтому время работы определяется рейт-лимитом,
+    а не суммой пауз. max_workers=1 — последовательный режим.
+    """
+    failed = []
+    calendar = TradingCalendar.from_daily(tickers, DATA_DIR)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(update_ticker, ticker, start_date, asset_type, board, calendar): ticker
+            for ticker, (start_date, asset_type, board) in tickers.items()
+        }
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ Ошибка обновления {ticker}: {e}")
+                failed.append(ticker)
+    return failed
 
 
 if __name__ == "__main__":
     print(f"🚀 Запуск загрузки данных на {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"🌐 Используем сессию с браузерными заголовками для обхода защиты Мосбиржи\n")
-    
-    for ticker, (start_date, asset_type, board) in TICKERS.items():
-        print(f"\n{'='*60}")
-        print(f"=== Обрабатываем {ticker} ({asset_type}, board={board}) ===")
-        print(f"{'='*60}")
-        update_ticker(ticker, start_date, asset_type, board)
-        # Пауза между тикерами для соблюдения рейт-лимитов
-        if ticker != list(TICKERS.keys())[-1]:
-            delay = 1.5 + random.uniform(0, 0.5)
-            print(f"⏳ Пауза {delay:.1f} сек между тикерами...")
-            time.sleep(delay)
-    
+    print(f"🌐 Используем сессию с браузерными заголовками для обхода защиты Мосбиржи")
+    print(f"⚙️ Потоков: {MAX_WORKERS}, лимит: {REQUESTS_PER_SECOND} запр/сек, одновременно: {MAX_IN_FLIGHT}\n")
+
+    update_all(TICKERS)
+
+    print(f"📦 {iss_client.summary()}")
     print(f"\n🏁 Завершено в {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    session.close()  # Закрываем сессию
+    iss_client.session.close()  # Закрываем сессию
@@ -1,122 +1,71 @@
 import pandas as pd
-import requests
 import os
 from datetime import datetime, timedelta
 
+import iss_client
+import m1_store
+from candles_async import fetch_windows
+from moex_candles import candidate_sessions
+from time_of_day import window_mask
+
 # Создаём папку data, если её нет
 os.makedirs("data", exist_ok=True)
 
-def fetch_candles_for_date_range(ticker, start_date, end_date, interval=1):
-    """
-    Fetch minute candles from MOEX for a given ticker (lowercase) and date range.
-    MOEX returns: {"candles": {"columns": [...], "data": [...]}}
-    """
-    all_rows = []
-    current = start_date
-
-    while current <= end_date:
-        day_str = current.strftime("%Y-%m-%d")
-        start_offset = 0
-        while True:
-            url = f"https://iss.moex.com/iss/engines/stock/markets/shares/securities/{ticker}/candles.json"
-            params = {
-                "from": day_str,
-                "till": day_str,
-                "interval": interval,
-                "start": start_offset
-            }
-            try:
-                resp = requests.get(url, params=params, timeout=20)
-                resp.raise_for_status()
-                raw = resp.json()
-            except Exception as e:
-                print(f"⚠️ Ошибка при загрузке {ticker} на {day_str}: {e}")
-                break
-
-            # Обработка нового формата: {"candles": {"columns": ..., "data": ...}}
-            if "candles" not in raw:
-                print(f"  → Нет ключа 'candles' в ответе для {ticker} на {day_str}")
-                break
-
-            candles = raw["candles"]
-            columns = candles.get("columns")
-            rows = candles.get("data", [])
-
-            if not columns or not rows:
-                break
-
-            all_rows.extend(rows)
-            start_offset += len(rows)
-            if len(rows) < 500:
-                break
-
-        current += timedelta(days=1)
-
-    if not all_rows:
-        return pd.DataFrame()
+# Тикеры в НИЖНЕМ регистре — как в рабочих URL
+RAW_TICKERS = ["gold", "eqmx", "oblg"]
 
-    # Извлекаем колонки и создаём DataFrame
-    sample_resp = requests.get(
-        f"https://iss.moex.com/iss/engines/stock/markets/shares/securities/{ticker}/candles.json",
-        params={"from": start_date.strftime("%Y-%m-%d"), "till": start_date.strftime("%Y-%m-%d"), "interval": interval},
-        timeout=10
-    ).json()
-    columns = sample_resp["candles"]["columns"]
+# Окно, которое запрашивается у ISS по каждой сессии (begin свечи)
+WINDOW_FROM = "09:59:00"
+WINDOW_TILL = "10:59:00"
 
-    df = pd.DataFrame(all_rows, columns=columns)
-    df['begin'] = pd.to_datetime(df['begin'])
-    return df
+# Глубина первой загрузки, если хранилище тикера пусто
+INITIAL_DAYS = 60
 
 def filter_0959_to_1059(df):
     """Оставить только свечи с 09:59:00 до 10:59:59 включительно."""
-    return df[
-        (df['begin'].dt.time >= pd.Timestamp("09:59").time()) &
-        (df['begin'].dt.time <= pd.Timestamp("10:59").time())
-    ].copy()
+    return df[window_mask(df['begin'], WINDOW_FROM, WINDOW_TILL)].copy()
 
-def ensure_file_exists(filepath, columns):
-    """Создать пустой CSV с заголовками, если файл не существует."""
-    if not os.path.exists(filepath):
-        pd.DataFrame(columns=columns).to_csv(filepath, index=False)
+def resume_point(ticker, today):
+    """С какой свечи догружать тикер (последняя сохранённая или INITIAL_DAYS назад)."""
+    seeded = m1_store.seed_from_legacy(ticker)
+    if seeded:
+        print(f"📦 {ticker}: перенесено {seeded} строк из {m1_store.legacy_path(ticker)}")
 
-# === Основная логика ===
-TODAY = datetime.now().date()
-START_DATE = TODAY - timedelta(days=60)
-END_DATE = TODAY
-
-print(f"📅 Запрашиваю данные с {START_DATE} по {END_DATE}")
-
-# Тикеры в НИЖНЕМ регистре — как в рабочих URL
-RAW_TICKERS = ["gold", "eqmx", "oblg"]
-
-# Получим колонки, сделав один тестовый запрос (для структуры пустого файла)
-try:
-    test_resp = requests.get(
-        "https://iss.moex.com/iss/engines/stock/markets/shares/securities/eqmx/candles.json",
-        params={"from": "2025-11-01", "till": "2025-11-01", "interval": 1},
-        timeout=10
-    ).json()
-    COLUMNS = test_resp["candles"]["columns"]
-except:
-    # fallback
-    COLUMNS = ["open", "close", "high", "low", "value", "volume", "begin", "end"]
-
-for ticker in RAW_TICKERS:
-    filename = f"{ticker.upper()}_M1_0959_1059.CSV"
-    filepath = os.path.join("data", filename)
-
-    print(f"\n📥 Загружаю {ticker}...")
-    df = fetch_candles_for_date_range(ticker, START_DATE, END_DATE, interval=1)
+    last_begin = m1_store.last_stored_begin(ticker)
+    # С последней свечи включительно: незавершённое окно дозагрузится и сверится
+    return last_begin if last_begin is not None else pd.Timestamp(today - timedelta(days=INITIAL_DAYS))
 
+def store_ticker(ticker, df, n_sessions, date_from):
+    """Дописывает полученные свечи окна в хранилище. Возвращает число новых строк."""
     if df.empty:
-        print(f"  → Нет данных для {ticker}")
-        # Создаём пустой файл с правильными заголовками
-        pd.DataFrame(columns=COLUMNS).to_csv(filepath, index=False)
-    else:
-        df_filtered = filter_0959_to_1059(df)
-        print(f"  → Всего: {len(df)}, после фильтра 09:59–10:59: {len(df_filtered)}")
-        df_filtered.to_csv(filepath, index=False, date_format='%Y-%m-%d %H:%M:%S')
-
-    print(f"  → Сохранено: {filepath}")
-
-print("\n✅ Готово!")
+        print(f"  → {ticker}: новых данных нет (с {date_from})")
+        return 0
+
+    # Сервер уже отдал только окно; фильтр страхует от свечей на его границах
+    df_filtered = filter_0959_to_1059(df)
+    added = m1_store.append_bars(ticker, df_filtered)
+    print(f"  → {ticker}: сессий запрошено {n_sessions}, в окне 09:59–10:59: {len(df_filtered)}, добавлено: {added}")
+    return added
+
+def main():
+    today = datetime.now().date()
+    print(f"📅 Обновляю {m1_store.STORE_DIR} по {today}")
+
+    since = {ticker: resume_point(ticker, today) for ticker in RAW_TICKERS}
+    sessions = {ticker: candidate_sessions(ticker, since[ticker], today) for ticker in RAW_TICKERS}
+
+    # Окна всех тикеров и сессий — одним пакетом на общем event loop
+    # При сбое окна приходят только сессии до него — точка продолжения не уходит за дыру
+    errors = {}
+    frames = fetch_windows(sessions, WINDOW_FROM, WINDOW_TILL, interval=1, since_by_ticker=since, errors=errors)
+    added = [store_ticker(t, frames[t], len(sessions[t]), since[t]) for t in RAW_TICKERS]
+
+    print(f"📦 {iss_client.summary()}")
+    if errors:
+        for ticker, error in errors.items():
+            print(f"⚠️ {ticker}: окно не загружено ({error}), догрузится при следующем запуске")
+        raise SystemExit(f"❌ Не догружены тикеры: {', '.join(errors)}. Добавлено строк: {sum(added)}")
+    print(f"\n✅ Готово! Добавлено строк: {sum(added)}")
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,9 @@ import pandas as pd
 from datetime import datetime, timedelta
 import os
 
+import iss_client
+from candles_async import fetch_range
+
 # --- Настройки ---
 INSTRUMENTS = {
     'EQMX': 'EQMX',
@@ -17,7 +20,6 @@ INSTRUMENTS = {
 
 INTERVAL = 60  # Интервал данных (60 = 1 час)
 ROWS_TO_KEEP = 35  # Количество строк для сохранения
-BASE_URL = "https://iss.moex.com/iss/engines/stock/markets/shares/securities"
 DATA_DIR = "data"
 
 # --- Функции ---
@@ -30,29 +32,16 @@ def get_last_calendar_days(n):
     return from_str, till_str
 
 def fetch_candles(secid, interval, from_time, till_time):
-    """Получает данные по свечам для указанного инструмента."""
-    url = f"{BASE_URL}/{secid.lower()}/candles.json"
-    params = {'interval': interval, 'from': from_time, 'till': till_time}
-
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-
-    data = response.json()
-    if 'candles' not in data or 'data' not in data['candles']:
-        raise ValueError(f"Неожиданная структура данных для {secid}")
-
-    candles_data = data['candles']['data']
-    if not candles_data: # Исправлено: было candles_, должно быть candles_data
+    """
+    Получает данные по свечам для указанного инструмента (через candles_async).
+    Если какая-то страница не загрузилась, fetch_range поднимает RuntimeError.
+    """
+    df = fetch_range(secid, from_time, till_time, interval)
+    if df.empty:
         print(f"Предупреждение: Для инструмента {secid} не найдены данные за указанный период.")
-        return pd.DataFrame()
+        return df
 
-    # ИСПОЛЬЗУЕМ ТОЧНУЮ ПОСЛЕДОВАТЕЛЬНОСТЬ ПОЛЕЙ ИЗ ВАШЕГО ВЫВОДА
-    columns = ["open", "close", "high", "low", "value", "volume", "begin", "end"]
-    
-    df = pd.DataFrame(candles_data, columns=columns)
-    
     # Преобразуем столбцы begin и end в datetime
-    df['begin'] = pd.to_datetime(df['begin'])
     df['end'] = pd.to_datetime(df['end'])
     
     df.sort_values('begin', inplace=True)
@@ -90,6 +79,9 @@ if __name__ == "__main__":
                 print(f"Успешно обработан {moex_code}")
             else:
                 print(f"Для {moex_code} не было получено новых данных.")
+        except RuntimeError as e:
+            # Страница не загрузилась после повторов: неполную историю не сохраняем
+            print(f"Ошибка загрузки {moex_code}, файл не обновлён: {e}")
         except requests.exceptions.RequestException as e:
             print(f"Ошибка при запросе к API для {moex_code}: {e}")
         except ValueError as e:
@@ -97,4 +89,5 @@ if __name__ == "__main__":
         except Exception as e:
             print(f"Неизвестная ошибка при обработке {moex_code}: {e}")
 
+    print(f"\n{iss_client.summary()}")
     print("\nЗагрузка завершена.")
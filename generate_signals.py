@@ -1,7 +1,10 @@
 import os
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
+from data_store import read_table, write_table
+
 # === Настройки ===
 DATA_DIR = "data"
 ASSETS = ["GOLD", "EQMX", "OBLG"]
@@ -15,7 +18,7 @@ def load_d1_data():
         path = os.path.join(DATA_DIR, f"{asset}.csv")
         if not os.path.exists(path):
             raise FileNotFoundError(f"❌ Файл не найден: {path}")
-        df = pd.read_csv(path, parse_dates=["TRADEDATE"])
+        df = read_table(path)
         df = df.set_index("TRADEDATE")[["CLOSE"]].rename(columns={"CLOSE": asset})
         dfs[asset] = df
         print(f"✅ Загружен {asset}: {len(df)} строк")
@@ -30,33 +33,48 @@ def load_d1_data():
     return df
 
 # === Генерация сигналов Dual Momentum ===
-def generate_signals(df):
-    signals = []
-    dates = df.index.tolist()
-    
-    for i in range(LOOKBACK, len(df)):
-        date = dates[i]
-        # Расчёт momentum за последние 2 дня
-        best_asset = RISK_FREE
-        best_mom = -float("inf")
-        
-        rf_price_today = df[RISK_FREE].iloc[i]
-        rf_price_past = df[RISK_FREE].iloc[i - LOOKBACK]
-        rf_mom = rf_price_today / rf_price_past - 1
-        
-        for asset in ASSETS:
-            price_today = df[asset].iloc[i]
-            price_past = df[asset].iloc[i - LOOKBACK]
-            mom = price_today / price_past - 1
-            if mom > best_mom:
-                best_mom = mom
-                best_asset = asset
-        
-        # Выбираем рисковый актив, только если он лучше LQDT
-        final_signal = best_asset if best_mom > rf_mom else RISK_FREE
-        signals.append({"date": date, "signal": final_signal})
-    
-    return pd.DataFrame(signals)
+def generate_signals_grid(df, lookbacks):
+    """
+    Векторная генерация сигналов сразу для нескольких lookback.
+    Доходности всех активов за все lookback считаются одной операцией над
+    массивом (lookback × дата × актив), лучший актив — argmax по строке,
+    сравнение с LQDT — маской. Возвращает {lookback: DataFrame(date, signal)}.
+    """
+    lookbacks = [int(lb) for lb in lookbacks]
+    prices = df[ASSETS + [RISK_FREE]].to_numpy(dtype=float)
+    n = len(prices)
+
+    # Цена lookback дней назад для каждого lookback (NaN там, где истории не хватает)
+    past = np.full((len(lookbacks), n, prices.shape[1]), np.nan)
+    for k, lb in enumerate(lookbacks):
+        if 0 < lb < n:
+            past[k, lb:] = prices[:-lb]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mom = prices[np.newaxis] / past - 1
+    risky_mom = mom[:, :, :len(ASSETS)]
+    rf_mom = mom[:, :, len(ASSETS)]
+
+    # NaN никогда не выбирается; при равенстве берётся первый актив, как в цикле
+    risky_mom = np.where(np.isnan(risky_mom), -np.inf, risky_mom)
+    best_idx = risky_mom.argmax(axis=2)
+    best_mom = np.take_along_axis(risky_mom, best_idx[:, :, np.newaxis], axis=2)[:, :, 0]
+
+    # Рисковый актив — только если он лучше LQDT
+    names = np.array(ASSETS + [RISK_FREE], dtype=object)
+    choice = np.where(best_mom > rf_mom, best_idx, len(ASSETS))
+
+    result = {}
+    for k, lb in enumerate(lookbacks):
+        result[lb] = pd.DataFrame({
+            "date": df.index[lb:],
+            "signal": names[choice[k, lb:]],
+        })
+    return result
+
+
+def generate_signals(df, lookback=LOOKBACK):
+    return generate_signals_grid(df, [lookback])[lookback]
 
 # === Основной запуск ===
 if __name__ == "__main__":
@@ -67,7 +85,7 @@ if __name__ == "__main__":
     signals_df = generate_signals(df)
     
     output_path = os.path.join(DATA_DIR, "signals.csv")
-    signals_df.to_csv(output_path, index=False)
+    write_table(signals_df, output_path)
     print(f"\n✅ Сохранено: {output_path}")
     print(f"📊 Пример последних сигналов:")
     print(signals_df.tail(5))
@@ -0,0 +1,525 @@
+# -*- coding: utf-8 -*-
+"""
+Индикаторы в двух формах — у каждой свой потребитель.
+
+Потоковые (RollingMean, RollingStd, EMA, RSI, Volatility и
+stream_last/stream_values) — для одного ряда тикера в сигнальных скриптах:
+снимок признаков (EMA, RSI по D1 и H1), уровни (levels.ticker_levels) и
+прогон правил по истории. Индикатор хранит своё состояние (кольцевой буфер
+окна, суммы с компенсацией Кэхэна, текущее значение EMA) и обновляется за
+O(1) на новый бар. Арифметика повторяет pandas шаг в шаг (rolling().mean(),
+ewm(adjust=False).mean(), rolling().std() из pandas 2.x), поэтому значения
+совпадают с пакетным расчётом бит в бит. stream_last() продолжает расчёт с сохранённого
+в data/.indicators состояния: через индикатор проходят только бары,
+появившиеся после прошлого запуска.
+
+Матричные (*_matrix) — для Dual Momentum: каждый индикатор сразу по всем
+активам матрицы «даты × активы», без сохранённого состояния. Это
+единственный путь расчёта индикаторов strategy_dual_momentum.
+"""
+import hashlib
+import json
+import math
+import os
+import warnings
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+STATE_DIR = os.getenv("INDICATOR_STATE_DIR", os.path.join("data", ".indicators"))
+
+# Размер блока (элементов) для оконных вычислений матричных индикаторов
+WINDOW_BLOCK = 1 << 21
+
+NaN = float("nan")
+
+
+def _is_nan(value):
+    return value != value
+
+
+class RollingMean:
+    """Series.rolling(window, min_periods).mean()."""
+
+    def __init__(self, window, min_periods=None):
+        self.window = int(window)
+        self.min_periods = self.window if min_periods is None else int(min_periods)
+        self.buffer = deque()
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.same_count = 0
+        self.prev_value = None
+
+    def _reset(self):
+        self.nobs = self.neg_ct = self.same_count = 0
+        self.sum_x = self.compensation_add = self.compensation_remove = 0.0
+
+    def _add(self, value):
+        if _is_nan(value):
+            return
+        self.nobs += 1
+        y = value - self.compensation_add
+        t = self.sum_x + y
+        self.compensation_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct += 1
+        self.same_count = self.same_count + 1 if value == self.prev_value else 1
+        self.prev_value = value
+
+    def _remove(self, value):
+        if _is_nan(value):
+            return
+        self.nobs -= 1
+        y = -value - self.compensation_remove
+        t = self.sum_x + y
+        self.compensation_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct -= 1
+
+    def update(self, value):
+        value = float(value)
+        if math.isinf(value):  # rolling в pandas считает ±inf пропуском
+            value = NaN
+        self.buffer.append(value)
+        if len(self.buffer) > self.window:
+            self._remove(self.buffer.popleft())
+        if self.window == 1:  # pandas пересчитывает непересекающиеся окна с нуля
+            self._reset()
+            self.prev_value = value
+        self._add(value)
+        return self.value
+
+    @property
+    def value(self):
+        if self.nobs < self.min_periods or self.nobs == 0:
+            return NaN
+        result = self.sum_x / self.nobs
+        if self.same_count >= self.nobs:
+            return self.prev_value
+        if self.neg_ct == 0 and result < 0:
+            return 0.0
+        if self.neg_ct == self.nobs and result > 0:
+            return 0.0
+        return result
+
+    def get_state(self):
+        state = {k: v for k, v in vars(self).items() if k != "buffer"}
+        state["buffer"] = list(self.buffer)
+        return state
+
+    def set_state(self, state):
+        for key, value in state.items():
+            setattr(self, key, deque(value) if key == "buffer" else value)
+
+
+class RollingStd:
+    """
+    Series.rolling(window, min_periods).std(ddof) — онлайн-Уэлфорд с компенсацией,
+    шаг в шаг как roll_var в pandas 2.x (pandas 3 накапливает иначе, расхождение
+    — в последних знаках).
+    """
+
+    def __init__(self, window, min_periods=None, ddof=1):
+        self.window = int(window)
+        self.min_periods = self.window if min_periods is None else int(min_periods)
+        self.ddof = ddof
+        self.buffer = deque()
+        self.nobs = 0.0
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.same_count = 0
+        self.prev_value = None
+
+    def _reset(self, first):
+        self.nobs = self.mean_x = self.ssqdm_x = 0.0
+        self.compensation_add = self.compensation_remove = 0.0
+        self.same_count = 0
+        self.prev_value = first
+
+    def _add(self, value):
+        if _is_nan(value):
+            return
+        self.nobs += 1
+        self.same_count = self.same_count + 1 if value == self.prev_value else 1
+        self.prev_value = value
+        prev_mean = self.mean_x - self.compensation_add
+        y = value - self.compensation_add
+        t = y - self.mean_x
+        self.compensation_add = t + self.mean_x - y
+        self.mean_x = self.mean_x + t / self.nobs
+        self.ssqdm_x = self.ssqdm_x + (value - prev_mean) * (value - self.mean_x)
+
+    def _remove(self, value):
+        if _is_nan(value):
+            return
+        self.nobs -= 1
+        if self.nobs:
+            prev_mean = self.mean_x - self.compensation_remove
+            y = value - self.compensation_remove
+            t = y - self.mean_x
+            self.compensation_remove = t + self.mean_x - y
+            self.mean_x = self.mean_x - t / self.nobs
+            self.ssqdm_x = self.ssqdm_x - (value - prev_mean) * (value - self.mean_x)
+        else:
+            self.mean_x = self.ssqdm_x = 0.0
+
+    def update(self, value):
+        value = float(value)
+        if math.isinf(value):  # rolling в pandas считает ±inf пропуском
+            value = NaN
+        self.buffer.append(value)
+        if len(self.buffer) > self.window:
+            self._remove(self.buffer.popleft())
+        if self.window == 1 or len(self.buffer) == 1:
+            self._reset(value)
+        self._add(value)
+        return self.value
+
+    @property
+    def value(self):
+        if self.nobs < self.min_periods or self.nobs <= self.ddof:
+            return NaN
+        if self.nobs == 1 or self.same_count >= self.nobs:
+            return 0.0
+        var = self.ssqdm_x / (self.nobs - self.ddof)
+        return math.sqrt(var) if var > 0 else 0.0
+
+    get_state = RollingMean.get_state
+    set_state = RollingMean.set_state
+
+
+class EMA:
+    """Series.ewm(span, adjust=False).mean()."""
+
+    def __init__(self, span):
+        self.span = span
+        com = (span - 1) / 2.0
+        self.alpha = 1.0 / (1.0 + com)
+        self.old_wt_factor = 1.0 - self.alpha
+        self.weighted = None
+        self.old_wt = 1.0
+        self.nobs = 0
+
+    def update(self, value):
+        cur = float(value)
+        if self.weighted is None:
+            self.weighted = cur
+            self.nobs = int(not _is_nan(cur))
+            return self.value
+        is_observation = not _is_nan(cur)
+        self.nobs += is_observation
+        if not _is_nan(self.weighted):
+            self.old_wt *= self.old_wt_factor
+            if is_observation:
+                if self.weighted != cur:
+                    self.weighted = self.old_wt * self.weighted + self.alpha * cur
+                    self.weighted /= self.old_wt + self.alpha
+                self.old_wt = 1.0
+        elif is_observation:
+            self.weighted = cur
+        return self.value
+
+    @property
+    def value(self):
+        return self.weighted if self.nobs >= 1 else NaN
+
+    def get_state(self):
+        return dict(vars(self))
+
+    def set_state(self, state):
+        vars(self).update(state)
+
+
+class RSI:
+    """
+    RSI по простым скользящим средним роста и падения, как в скриптах:
+    delta = close.diff(); gain/loss = rolling(period).mean(); 100 - 100 / (1 + gain / loss).
+    """
+
+    def __init__(self, period=14, min_periods=None):
+        self.period = period
+        self.gain = RollingMean(period, min_periods)
+        self.loss = RollingMean(period, min_periods)
+        self.prev_close = None
+
+    def update(self, close):
+        close = float(close)
+        delta = NaN if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        self.gain.update(delta if delta > 0 else 0.0)
+        self.loss.update(-(delta if delta < 0 else 0.0))
+        return self.value
+
+    @property
+    def value(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = np.float64(self.gain.value) / np.float64(self.loss.value)
+            return float(100 - (100 / (1 + rs)))
+
+    def get_state(self):
+        return {"prev_close": self.prev_close, "gain": self.gain.get_state(), "loss": self.loss.get_state()}
+
+    def set_state(self, state):
+        self.prev_close = state["prev_close"]
+        self.gain.set_state(state["gain"])
+        self.loss.set_state(state["loss"])
+
+
+class Volatility:
+    """Годовая волатильность: close.pct_change().rolling(window).std() * sqrt(periods)."""
+
+    def __init__(self, window=20, periods=252):
+        self.std = RollingStd(window)
+        self.scale = np.sqrt(periods)
+        self.prev_close = None
+
+    def update(self, close):
+        close = float(close)
+        ret = NaN
+        if self.prev_close is not None:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ret = float(np.float64(close) / np.float64(self.prev_close) - 1)
+        self.prev_close = close
+        self.std.update(ret)
+        return self.value
+
+    @property
+    def value(self):
+        return float(self.std.value * self.scale)
+
+    def get_state(self):
+        return {"prev_close": self.prev_close, "std": self.std.get_state()}
+
+    def set_state(self, state):
+        self.prev_close = state["prev_close"]
+        self.std.set_state(state["std"])
+
+
+class Tail:
+    """Последние size значений другого индикатора (value — список, старые первыми)."""
+
+    def __init__(self, indicator, size):
+        self.indicator = indicator
+        self.values = deque(maxlen=size)
+
+    def update(self, value):
+        self.values.append(self.indicator.update(value))
+        return self.value
+
+    @property
+    def value(self):
+        return list(self.values)
+
+    def get_state(self):
+        return {"indicator": self.indicator.get_state(), "values": list(self.values)}
+
+    def set_state(self, state):
+        self.indicator.set_state(state["indicator"])
+        self.values.extend(state["values"])
+
+
+def run(indicator, values):
+    """Прогон индикатора по всему ряду; возвращает массив значений после каждого бара."""
+    return np.array([indicator.update(v) for v in values], dtype=float)
+
+
+def volume_ratios(volume, days):
+    """
+    Объём каждого бара к среднему за days предыдущих (1.0 в начале ряда и при
+    нулевом среднем). Совпадает с volume.iloc[-1] / volume.iloc[-(days+1):-1].mean()
+    на каждом префиксе бит в бит.
+    """
+    volume = np.asarray(volume, dtype=float)
+    ratios = np.ones(len(volume))
+    if len(volume) > days:
+        avg = sliding_window_view(volume[:-1], days).sum(axis=1) / days
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios[days:] = np.where(avg > 0, volume[days:] / avg, 1.0)
+    return ratios
+
+
+# ——— Сохранённое состояние ———
+
+def _state_path(key):
+    return os.path.join(STATE_DIR, f"{key}.json")
+
+
+def _digest(values, labels):
+    """sha1 значений и меток — отпечаток уже обработанной части ряда."""
+    digest = hashlib.sha1(np.ascontiguousarray(values, dtype=float).tobytes())
+    labels = np.asarray(labels)
+    if labels.dtype == object:
+        digest.update("\x00".join(map(str, labels)).encode())
+    else:
+        digest.update(np.ascontiguousarray(labels).tobytes())
+    return digest.hexdigest()
+
+
+def _load(key):
+    try:
+        with open(_state_path(key), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save(key, record):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    path = _state_path(key)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+    os.replace(tmp_path, path)
+
+
+def stream_last(key, series, make):
+    """
+    Последнее значение индикатора make() по ряду series (pandas Series с индексом-датой).
+
+    Состояние хранится в STATE_DIR/{key}.json вместе с числом обработанных баров
+    и sha1 их значений и меток. Если ряд — продолжение уже обработанного
+    (хранилище только дописывается), через индикатор проходят лишь новые бары;
+    иначе (ряд переписан, исправлен в любом месте или укорочен) расчёт идёт
+    с начала.
+    """
+    return stream_values(key, series.to_numpy(dtype=float), series.index, make)
+
+
+def stream_values(key, values, labels, make):
+    """
+    То же для массива values с метками labels; для двумерного массива в
+    update() передаётся строка значений.
+    """
+    indicator = make()
+    n = len(values)
+    start = 0
+
+    record = _load(key)
+    if record is not None:
+        done = record.get("count", 0)
+        if 0 < done <= n and record.get("digest") == _digest(values[:done], labels[:done]):
+            try:
+                indicator.set_state(record["state"])
+                start = done
+            except (KeyError, TypeError):
+                indicator, start = make(), 0
+
+    for value in values[start:]:
+        indicator.update(value)
+
+    if n and start < n:
+        try:
+            _save(key, {
+                "count": n,
+                "digest": _digest(values, labels),
+                "state": indicator.get_state(),
+            })
+        except OSError:
+            pass
+    return indicator.value
+
+
+# ——— Матричные индикаторы (строки — даты, столбцы — активы) ———
+#
+# Каждая функция считает индикатор сразу для всех столбцов через накопленные
+# суммы (O(даты × активы), без цикла по активам). Значения совпадают с
+# rolling()/pct_change() pandas с точностью до округления в последних знаках.
+
+def _as_matrix(values, inf_as_nan=True):
+    """Копия в виде матрицы float (одномерный ряд — один столбец)."""
+    x = np.array(values, dtype=float, copy=True)
+    if x.ndim == 1:
+        x = x[:, None]
+    if inf_as_nan:
+        x[np.isinf(x)] = np.nan  # как в rolling pandas: ±inf — пропуск
+    return x
+
+
+def _window_sums(z, valid, window):
+    """Суммы z и число наблюдений в окне, заканчивающемся на каждой строке."""
+    csum = np.zeros((z.shape[0] + 1, z.shape[1]))
+    np.cumsum(z, axis=0, out=csum[1:])
+    ccount = np.zeros(csum.shape, dtype=np.int64)
+    np.cumsum(valid, axis=0, out=ccount[1:])
+    hi = np.arange(1, z.shape[0] + 1)
+    lo = np.maximum(hi - window, 0)
+    return csum[hi] - csum[lo], ccount[hi] - ccount[lo]
+
+
+def _centered(x):
+    """Отклонения от среднего столбца (пропуски = 0) — меньше ошибка накопленных сумм."""
+    valid = ~np.isnan(x)
+    counts = valid.sum(axis=0)
+    offset = np.divide(np.where(valid, x, 0.0).sum(axis=0), counts,
+                       out=np.zeros(x.shape[1]), where=counts > 0)
+    return np.where(valid, x - offset, 0.0), valid, offset
+
+
+def rolling_mean_matrix(values, window, min_periods=None):
+    """rolling(window, min_periods).mean() для каждого столбца матрицы."""
+    x = _as_matrix(values)
+    min_periods = window if min_periods is None else min_periods
+    z, valid, offset = _centered(x)
+    sums, counts = _window_sums(z, valid, window)
+    _, nonzero = _window_sums(z, valid & (x != 0), window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(nonzero > 0, offset + sums / counts, 0.0)  # окно из нулей — ровно 0, как в pandas
+    return np.where(counts >= max(min_periods, 1), mean, np.nan)
+
+
+def rolling_std_matrix(values, window, min_periods=None, ddof=1):
+    """
+    rolling(window, min_periods).std(ddof) для каждого столбца матрицы.
+    Дисперсия считается в два прохода по окнам (sliding_window_view) блоками
+    строк не больше WINDOW_BLOCK элементов — без потери точности на уровнях цен.
+    """
+    x = _as_matrix(values)
+    min_periods = window if min_periods is None else min_periods
+    n, m = x.shape
+    padded = np.vstack([np.full((window - 1, m), np.nan), x])
+    out = np.full(x.shape, np.nan)
+    step = max(1, WINDOW_BLOCK // max(1, window * m))
+    for start in range(0, n, step):
+        win = sliding_window_view(padded[start:start + step + window - 1], window, axis=0)
+        counts = (~np.isnan(win)).sum(axis=-1)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            var = np.nanvar(win, axis=-1, ddof=ddof)
+        ok = (counts >= max(min_periods, 1)) & (counts > ddof)
+        out[start:start + len(win)] = np.where(ok, np.sqrt(np.maximum(var, 0.0)), np.nan)
+    return out
+
+
+def pct_change_matrix(values):
+    """close / close.shift(1) - 1 по столбцам (первая строка — NaN)."""
+    x = _as_matrix(values, inf_as_nan=False)
+    out = np.full(x.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[1:] = x[1:] / x[:-1] - 1
+    return out
+
+
+def rsi_matrix(close, period=14, min_periods=None):
+    """RSI (как у класса RSI) для всех столбцов матрицы цен закрытия."""
+    x = _as_matrix(close, inf_as_nan=False)
+    delta = np.full(x.shape, np.nan)
+    delta[1:] = x[1:] - x[:-1]
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = -np.where(delta < 0, delta, 0.0)
+    avg_gain = rolling_mean_matrix(gain, period, min_periods)
+    avg_loss = rolling_mean_matrix(loss, period, min_periods)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def volatility_matrix(close, window=20, periods=252):
+    """Годовая волатильность доходностей по скользящему окну для всех столбцов."""
+    return rolling_std_matrix(pct_change_matrix(close), window) * np.sqrt(periods)
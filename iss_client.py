@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""
+Общий клиент ISS MOEX: сессия, ограничитель частоты и дисковый кэш ответов.
+
+Ответы кэшируются в data/.iss_cache по полному URL запроса:
+- закрытые диапазоны (дата `till` раньше сегодняшней) не меняются и хранятся
+  бессрочно — повторный запрос не уходит в сеть;
+- открытые диапазоны (текущая сессия) живут ISS_CACHE_TTL секунд, после чего
+  перепроверяются условным запросом (If-None-Match / If-Modified-Since), если
+  ISS прислал ETag или Last-Modified; ответ 304 продлевает запись.
+В кэш попадает только разбираемый ответ без блока ошибки ISS (для .json —
+json.loads, для .xml — ElementTree), так что обрезанный ответ или HTML-
+страница с кодом 200 не закрепляются навсегда; если разбор всё же не
+удался у вызывающего, invalidate() удаляет запись перед повтором. Записи,
+к которым не обращались ISS_CACHE_MAX_AGE_DAYS дней, и самые старые сверх
+ISS_CACHE_MAX_MB удаляются при первом запросе процесса (prune_cache).
+Ограничитель частоты учитывает только реальные сетевые запросы.
+
+Сессия держит пул keep-alive соединений размером с число одновременных
+запросов, повторяет сбои соединения и ответы 429/5xx с паузой и джиттером и
+принимает gzip. Для каждого сетевого запроса замеряется задержка; summary()
+выводит долю переиспользованных соединений и перцентили задержек.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from datetime import date
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+from rate_limiter import RateLimiter
+
+# Базовый адрес ISS (можно подменить на локальный стаб-сервер через переменную окружения)
+ISS_BASE_URL = os.getenv("ISS_BASE_URL", "https://iss.moex.com/iss").rstrip("/")
+
+# Глобальный лимит запросов вместо фиксированных пауз между страницами и тикерами
+REQUESTS_PER_SECOND = float(os.getenv("ISS_REQUESTS_PER_SECOND", "4"))
+MAX_IN_FLIGHT = int(os.getenv("ISS_MAX_IN_FLIGHT", "4"))
+
+# Пул соединений и сетевые повторы
+POOL_SIZE = int(os.getenv("ISS_POOL_SIZE", str(MAX_IN_FLIGHT)))
+CONNECT_TIMEOUT = float(os.getenv("ISS_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.getenv("ISS_READ_TIMEOUT", "60"))
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+HTTP_RETRIES = int(os.getenv("ISS_HTTP_RETRIES", "3"))
+
+CACHE_ENABLED = os.getenv("ISS_CACHE", "1") != "0"
+CACHE_DIR = os.getenv("ISS_CACHE_DIR", os.path.join("data", ".iss_cache"))
+CACHE_TTL = float(os.getenv("ISS_CACHE_TTL", "600"))  # секунд для открытых диапазонов
+CACHE_MAX_AGE_DAYS = float(os.getenv("ISS_CACHE_MAX_AGE_DAYS", "30"))  # без обращений
+CACHE_MAX_MB = float(os.getenv("ISS_CACHE_MAX_MB", "200"))
+
+rate_limiter = RateLimiter(REQUESTS_PER_SECOND, MAX_IN_FLIGHT)
+
+# Счётчики кэша: hit, revalidated, miss; задержки сетевых запросов, сек
+cache_stats = Counter()
+latencies = []
+_stats_lock = threading.Lock()
+_pruned = False
+
+# ============================================
+# Настройка сессии для обхода защиты Мосбиржи
+# ============================================
+session = requests.Session()
+session.headers.update({
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Cache-Control': 'max-age=0',
+})
+def _retry(retry_cls=Retry):
+    """Повторы на уровне адаптера; backoff_jitter есть только в urllib3>=2."""
+    kwargs = dict(
+        total=HTTP_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    try:
+        return retry_cls(backoff_jitter=0.5, **kwargs)
+    except TypeError:  # urllib3 1.x
+        return retry_cls(**kwargs)
+
+
+_adapter = HTTPAdapter(
+    pool_connections=2,
+    pool_maxsize=max(1, POOL_SIZE),
+    max_retries=_retry(),
+)
+session.mount("https://", _adapter)
+session.mount("http://", _adapter)
+
+
+def _count(name):
+    with _stats_lock:
+        cache_stats[name] += 1
+
+
+def is_closed_range(url):
+    """Диапазон запроса закрыт, если дата `till` раньше сегодняшней."""
+    till = parse_qs(urlsplit(url).query).get("till")
+    if not till:
+        return False
+    try:
+        return date.fromisoformat(till[0][:10]) < date.today()
+    except ValueError:
+        return False
+
+
+def _entry_paths(url):
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    base = os.path.join(CACHE_DIR, key[:2], key)
+    return f"{base}.json", f"{base}.body"
+
+
+def _load_entry(url):
+    meta_path, body_path = _entry_paths(url)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None, None
+    return meta, body
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _store_entry(url, meta, body=None):
+    meta_path, body_path = _entry_paths(url)
+    os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+    if body is not None:
+        _write_atomic(body_path, body)
+    _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+
+def _touch(url):
+    """Отмечает обращение к записи (для вытеснения давно не использованных)."""
+    try:
+        os.utime(_entry_paths(url)[0])
+    except OSError:
+        pass
+
+
+def is_valid_payload(url, body):
+    """Ответ разбирается по расширению URL (.json/.xml) и не содержит блока ошибки ISS."""
+    path = urlsplit(url).path
+    try:
+        if path.endswith(".json"):
+            payload = json.loads(body)
+            return isinstance(payload, (dict, list)) and not (isinstance(payload, dict) and "error" in payload)
+        if path.endswith(".xml"):
+            root = ET.fromstring(body)
+            return root.tag != "error" and root.find(".//error") is None
+    except (ValueError, ET.ParseError):
+        return False
+    return True
+
+
+def invalidate(url, params=None):
+    """Удаляет запись кэша (вызывающий не смог разобрать ответ и повторит запрос)."""
+    for path in _entry_paths(_full_url(url, params)):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def prune_cache(max_age_days=CACHE_MAX_AGE_DAYS, max_mb=CACHE_MAX_MB):
+    """
+    Удаляет записи, к которым не обращались max_age_days дней, затем самые
+    давние, пока кэш больше max_mb. Возвращает число удалённых записей.
+    """
+    entries = []
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(root, name)
+            body_path = f"{meta_path[:-len('.json')]}.body"
+            try:
+                used_at = os.path.getmtime(meta_path)
+                size = os.path.getsize(meta_path) + (os.path.getsize(body_path) if os.path.exists(body_path) else 0)
+            except OSError:
+                continue
+            entries.append((used_at, size, meta_path, body_path))
+
+    entries.sort()
+    total = sum(size for _, size, _, _ in entries)
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for used_at, size, meta_path, body_path in entries:
+        if used_at >= cutoff and total <= max_mb * 1024 * 1024:
+            break
+        for path in (meta_path, body_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def _prune_once():
+    global _pruned
+    with _stats_lock:
+        if _pruned:
+            return
+        _pruned = True
+    removed = prune_cache()
+    with _stats_lock:
+        cache_stats["evicted"] += removed
+
+
+def _cached_response(url, meta, body):
+    """requests.Response из записи кэша — вызывающий код не отличает его от сетевого."""
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.reason = "OK"
+    resp.url = url
+    resp._content = body
+    resp.headers = CaseInsensitiveDict(meta.get("headers", {}))
+    resp.encoding = meta.get("encoding")
+    return resp
+
+
+def _timed_get(url, timeout, headers=None):
+    started = time.perf_counter()
+    try:
+        return session.get(url, timeout=timeout, headers=headers)
+    finally:
+        with _stats_lock:
+            latencies.append(time.perf_counter() - started)
+
+
+def _network_get(url, timeout, headers=None, rate_limit=True):
+    if not rate_limit:
+        return _timed_get(url, timeout, headers)
+    with rate_limiter:
+        return _timed_get(url, timeout, headers)
+
+
+def _full_url(url, params=None):
+    return requests.Request("GET", url, params=params).prepare().url
+
+
+def _is_fresh(meta):
+    return meta["immutable"] or time.time() - meta["stored_at"] < CACHE_TTL
+
+
+def cached(url, params=None):
+    """Ответ из кэша, если запись свежая, иначе None. В сеть не обращается."""
+    if not CACHE_ENABLED:
+        return None
+    url = _full_url(url, params)
+    _prune_once()
+    meta, body = _load_entry(url)
+    if meta is None or not _is_fresh(meta):
+        return None
+    _count("hit")
+    _touch(url)
+    return _cached_response(url, meta, body)
+
+
+def get(url, params=None, timeout=None, rate_limit=True):
+    """
+    GET к ISS через кэш. Возвращает requests.Response (из кэша или из сети).
+    rate_limit=False — частоту уже ограничивает вызывающий (асинхронный backend).
+    """
+    url = _full_url(url, params)
+    timeout = timeout or DEFAULT_TIMEOUT
+    if not CACHE_ENABLED:
+        return _network_get(url, timeout, rate_limit=rate_limit)
+
+    _prune_once()
+    meta, body = _load_entry(url)
+    conditional = {}
+    if meta is not None:
+        if _is_fresh(meta):
+            _count("hit")
+            _touch(url)
+            return _cached_response(url, meta, body)
+        if meta.get("etag"):
+            conditional["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            conditional["If-Modified-Since"] = meta["last_modified"]
+
+    resp = _network_get(url, timeout, conditional or None, rate_limit)
+    if resp.status_code == 304 and meta is not None:
+        _count("revalidated")
+        meta.update(stored_at=time.time(), immutable=is_closed_range(url))
+        _store_entry(url, meta)
+        return _cached_response(url, meta, body)
+
+    _count("miss")
+    if resp.status_code == 200 and resp.content.strip() and is_valid_payload(url, resp.content):
+        headers = {k: resp.headers[k] for k in ("Content-Type", "ETag", "Last-Modified") if k in resp.headers}
+        _store_entry(url, {
+            "url": url,
+            "stored_at": time.time(),
+            "immutable": is_closed_range(url),
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "headers": headers,
+            "encoding": resp.encoding,
+        }, resp.content)
+    return resp
+
+
+def cache_summary():
+    """Строка для логов: сколько ответов отдано из кэша и сколько ушло в сеть."""
+    with _stats_lock:
+        hits, revalidated, misses = cache_stats["hit"], cache_stats["revalidated"], cache_stats["miss"]
+        evicted = cache_stats["evicted"]
+    line = f"кэш ISS: из кэша {hits}, подтверждено 304: {revalidated}, из сети: {misses}"
+    return f"{line}, вытеснено: {evicted}" if evicted else line
+
+
+def pool_stats():
+    """(HTTP-запросов, открыто соединений) по всем пулам сессии."""
+    pools = _adapter.poolmanager.pools
+    requests_total = connections = 0
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is not None:
+            requests_total += pool.num_requests
+            connections += pool.num_connections
+    return requests_total, connections
+
+
+def latency_percentiles():
+    """Задержки сетевых запросов: {p50, p95, max} в секундах (пусто, если запросов не было)."""
+    with _stats_lock:
+        values = sorted(latencies)
+    if not values:
+        return {}
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {"p50": pick(0.5), "p95": pick(0.95), "max": values[-1]}
+
+
+def pool_summary():
+    """Строка для логов: переиспользование соединений и задержки."""
+    requests_total, connections = pool_stats()
+    if not requests_total:
+        return "сеть ISS: запросов не было"
+    reuse = 1 - connections / requests_total
+    lat = latency_percentiles()
+    return (f"сеть ISS: запросов {requests_total}, соединений {connections}, переиспользование {reuse:.0%}, "
+            f"задержка p50 {lat['p50'] * 1000:.0f} мс, p95 {lat['p95'] * 1000:.0f} мс, max {lat['max'] * 1000:.0f} мс")
+
+
+def summary():
+    return f"{cache_summary()}; {pool_summary()}"
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Локальный стаб ISS для тестов и бенчмарков (http.server в отдельном потоке).
+
+Отдаёт детерминированные синтетические данные в форматах, которые разбирают
+наши загрузчики:
+- history/.../securities/{ticker}.json|.xml — дневные бары по будням с
+  блоком history.cursor и страницами по HISTORY_PAGE_SIZE строк;
+- engines/.../securities/{ticker}/candles.json — свечи каждые `interval`
+  минут с 10:00 до 18:39 по будням, страницами по CANDLES_PAGE_SIZE.
+Ответы несут ETag и отвечают 304 на совпадающий If-None-Match. Можно
+задать задержку ответа (latency) и сбои: fail(path_part, start, times, body, date_from).
+
+Использование:
+    with StubISS() as stub:
+        os.environ["ISS_BASE_URL"] = stub.base_url  # до импорта iss_client
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import quoteattr
+
+HISTORY_COLUMNS = ["TRADEDATE", "OPEN", "HIGH", "LOW", "CLOSE", "VOLUME"]
+CANDLE_COLUMNS = ["open", "close", "high", "low", "value", "volume", "begin", "end"]
+HISTORY_PAGE_SIZE = 100
+CANDLES_PAGE_SIZE = 500
+SESSION_OPEN = timedelta(hours=10)
+SESSION_CLOSE = timedelta(hours=18, minutes=40)
+
+
+def _price(ticker, key):
+    """Детерминированная «цена» для тикера и метки."""
+    digest = hashlib.sha1(f"{ticker}|{key}".encode()).digest()
+    return round(100 + int.from_bytes(digest[:2], "big") / 655.36, 2)
+
+
+def _parse_time(value):
+    value = value.replace("T", " ")
+    return datetime.fromisoformat(value) if " " in value else datetime.fromisoformat(value + " 00:00:00")
+
+
+def history_rows(ticker, date_from, date_till):
+    """Дневные бары по будням в [date_from, date_till]."""
+    rows = []
+    day, till = date.fromisoformat(date_from[:10]), date.fromisoformat(date_till[:10])
+    while day <= till:
+        if day.weekday() < 5:
+            close = _price(ticker, day)
+            rows.append([day.isoformat(), close - 0.5, close + 1.0, close - 1.0, close, float(day.toordinal() % 1000 * 10)])
+        day += timedelta(days=1)
+    return rows
+
+
+@lru_cache(maxsize=256)
+def _candle_rows_cached(ticker, date_from, date_till, interval):
+    return candle_rows(ticker, date_from, date_till, interval)
+
+
+def candle_rows(ticker, date_from, date_till, interval=1):
+    """Свечи с begin в [date_from, date_till] (till-дата без времени включает весь день)."""
+    lo = _parse_time(date_from)
+    hi = _parse_time(date_till)
+    if len(date_till) <= 10:
+        hi += timedelta(days=1) - timedelta(seconds=1)
+    step = timedelta(minutes=interval)
+    rows = []
+    day = datetime.combine(lo.date(), datetime.min.time())
+    while day <= hi:
+        if day.weekday() < 5:
+            begin = day + SESSION_OPEN
+            while begin < day + SESSION_CLOSE:
+                if lo <= begin <= hi:
+                    close = _price(ticker, begin)
+                    end = begin + step - timedelta(seconds=1)
+                    rows.append([close - 0.1, close, close + 0.2, close - 0.2, close * 10, 10,
+                                 begin.strftime("%Y-%m-%d %H:%M:%S"), end.strftime("%Y-%m-%d %H:%M:%S")])
+                begin += step
+        day += timedelta(days=1)
+    return rows
+
+
+def _history_xml(rows, cursor):
+    out = ['<?xml version="1.0" encoding="UTF-8"?>', "<document>", '<data id="history">', "<rows>"]
+    for row in rows:
+        attrs = " ".join(f"{name}={quoteattr(str(value))}" for name, value in zip(HISTORY_COLUMNS, row))
+        out.append(f"<row {attrs} />")
+    out += ["</rows>", "</data>", '<data id="history.cursor">', "<rows>",
+            '<row INDEX="{}" TOTAL="{}" PAGESIZE="{}" />'.format(*cursor), "</rows>", "</data>", "</document>"]
+    return "\n".join(out)
+
+
+class StubISS:
+    """Стаб-сервер ISS; base_url — адрес для ISS_BASE_URL."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = Counter()  # путь -> число запросов
+        self.log = []  # (путь, query) в порядке прихода
+        self._failures = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                stub._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/iss"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def fail(self, path_part, start=None, times=1, status=500, body=b"error", date_from=None):
+        """Следующие times запросов с path_part в пути (и данными start, from) получат status/body."""
+        with self._lock:
+            self._failures.append({"path": path_part, "start": start, "from": date_from, "left": times,
+                                   "status": status, "body": body})
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.log.clear()
+            self._failures.clear()
+
+    def _failure(self, path, query):
+        start = int(query.get("start", ["0"])[0])
+        date_from = query.get("from", [""])[0]
+        with self._lock:
+            for failure in self._failures:
+                if (failure["left"] > 0 and failure["path"] in path and failure["start"] in (None, start)
+                        and (failure["from"] is None or date_from.startswith(failure["from"]))):
+                    failure["left"] -= 1
+                    return failure
+        return None
+
+    def _handle(self, handler):
+        parts = urlsplit(handler.path)
+        path, query = parts.path, parse_qs(parts.query)
+        with self._lock:
+            self.requests[path] += 1
+            self.log.append((path, parts.query))
+        if self.latency:
+            time.sleep(self.latency)
+
+        failure = self._failure(path, query)
+        if failure is not None:
+            return self._send(handler, failure["status"], failure["body"])
+
+        body = self._body(path, query)
+        if body is None:
+            return self._send(handler, 404, b"not found")
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if handler.headers.get("If-None-Match") == etag:
+            return self._send(handler, 304, b"", etag)
+        return self._send(handler, 200, body, etag)
+
+    def _body(self, path, query):
+        get = lambda name, default=None: query.get(name, [default])[0]
+        start = int(get("start", "0"))
+        ticker = path.rsplit("/securities/", 1)[-1].split("/")[0].split(".")[0].upper()
+        if path.startswith("/iss/history/"):
+            rows = history_rows(ticker, get("from"), get("till"))
+            page = rows[start:start + HISTORY_PAGE_SIZE]
+            cursor = (start, len(rows), HISTORY_PAGE_SIZE)
+            if path.endswith(".xml"):
+                return _history_xml(page, cursor).encode()
+            return json.dumps({
+                "history": {"columns": HISTORY_COLUMNS, "data": page},
+                "history.cursor": {"columns": ["INDEX", "TOTAL", "PAGESIZE"], "data": [list(cursor)]},
+            }).encode()
+        if path.endswith("/candles.json"):
+            rows = _candle_rows_cached(ticker, get("from"), get("till"), int(get("interval", "1")))
+            return json.dumps({"candles": {"columns": CANDLE_COLUMNS, "data": rows[start:start + CANDLES_PAGE_SIZE]}}).encode()
+        return None
+
+    @staticmethod
+    def _send(handler, status, body, etag=None):
+        handler.send_response(status)
+        if etag:
+            handler.send_header("ETag", etag)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        if body:
+            handler.wfile.write(body)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Уровни поддержки и сопротивления по дневным high/low.
+
+Экстремумы — те же, что у scipy.signal.argrelextrema(order): low строго ниже,
+high строго выше всех соседей в пределах order баров с каждой стороны. Бар
+фиксируется, когда справа от него набралось order баров, поэтому с каждым
+новым баром окончательно проверяется одна позиция, а последние order позиций
+(у argrelextrema они сравниваются с обрезанным краем ряда) пересчитываются
+при запросе. Детектор обновляется за O(order) и хранит состояние через
+indicators.stream_values.
+
+Экстремумы хранятся в отсортированных массивах и группируются с допуском,
+относительным к цене (LEVEL_TOLERANCE — одинаково для GOLD ~2, LQDT ~1.2 и
+OBLG ~200): кластер начинается с наименьшего экстремума и включает все
+следующие не дальше LEVEL_TOLERANCE от его начала. Сильный уровень — кластер
+не меньше чем из MIN_TOUCHES экстремумов, его цена — среднее кластера.
+Запросы «ближайшие поддержки/сопротивления» идут бинарным поиском
+(np.searchsorted) по отсортированным массивам уровней.
+"""
+import bisect
+import operator
+import os
+from collections import deque
+
+import numpy as np
+
+from indicators import stream_values
+
+LEVEL_TOLERANCE = float(os.getenv("LEVEL_TOLERANCE", "0.004"))  # 0.4% цены
+MIN_TOUCHES = 2
+ORDER = 5
+
+
+class Levels:
+    """Отсортированные по возрастанию уровни поддержки и сопротивления."""
+
+    def __init__(self, supports, resistances):
+        self.supports = np.sort(np.asarray(supports, dtype=float))
+        self.resistances = np.sort(np.asarray(resistances, dtype=float))
+
+    def supports_below(self, price, within=None, inclusive=False):
+        """
+        Поддержки строго ниже price по возрастанию (ближайшая — последняя).
+        within — только ближе этой доли цены (с inclusive=True — не дальше).
+        """
+        hi = np.searchsorted(self.supports, price, side="left")
+        lo = 0
+        if within is not None:
+            lo = np.searchsorted(self.supports, price * (1 - within), side="left" if inclusive else "right")
+        return self.supports[lo:hi].tolist()
+
+    def resistances_above(self, price, within=None):
+        """Сопротивления строго выше price по возрастанию (ближе within доли цены, если задано)."""
+        lo = np.searchsorted(self.resistances, price, side="right")
+        hi = len(self.resistances)
+        if within is not None:
+            hi = np.searchsorted(self.resistances, price * (1 + within), side="left")
+        return self.resistances[lo:hi].tolist()
+
+    @staticmethod
+    def _near(levels, price, pct):
+        lo = np.searchsorted(levels, price * (1 - pct), side="right")
+        hi = np.searchsorted(levels, price * (1 + pct), side="left")
+        return levels[lo:hi].tolist()
+
+    def supports_near(self, price, pct):
+        """Поддержки, отличающиеся от price меньше чем на pct (с обеих сторон)."""
+        return self._near(self.supports, price, pct)
+
+    def resistances_near(self, price, pct):
+        """Сопротивления, отличающиеся от price меньше чем на pct (с обеих сторон)."""
+        return self._near(self.resistances, price, pct)
+
+
+def cluster_levels(extrema, tolerance=LEVEL_TOLERANCE, min_touches=MIN_TOUCHES):
+    """
+    Сильные уровни по отсортированному массиву экстремумов: кластер — подряд
+    идущие экстремумы не дальше tolerance (доля цены) от первого в кластере.
+    """
+    extrema = np.asarray(extrema, dtype=float)
+    levels = []
+    start = 0
+    while start < len(extrema):
+        end = np.searchsorted(extrema, extrema[start] * (1 + tolerance), side="right")
+        if end - start >= min_touches:
+            levels.append(extrema[start:end].mean())
+        start = end
+    return levels
+
+
+class LevelDetector:
+    """
+    Потоковый детектор: update((high, low)) на каждый бар, value — текущие Levels.
+
+    Как и argrelextrema (mode="clip"), позиция i — экстремум, если 0 < i < n-1 и
+    она строго лучше всех баров в [i-order, i+order], обрезанном краями ряда.
+    Позиции, у которых справа уже order баров, больше не меняются и вставляются
+    в отсортированные списки экстремумов; последние order позиций
+    пересчитываются при каждом запросе value.
+    """
+
+    def __init__(self, order=ORDER, tolerance=LEVEL_TOLERANCE, min_touches=MIN_TOUCHES):
+        self.order = order
+        self.tolerance = tolerance
+        self.min_touches = min_touches
+        self.n = 0
+        self.highs = deque(maxlen=2 * order + 1)
+        self.lows = deque(maxlen=2 * order + 1)
+        self.support_extrema = []
+        self.resistance_extrema = []
+
+    @staticmethod
+    def _touch(extrema, price):
+        if price > 0:  # нулевые строки в данных — не уровни
+            bisect.insort(extrema, price)
+
+    def _is_extremum(self, values, k, better):
+        lo, hi = max(0, k - self.order), min(len(values), k + self.order + 1)
+        return all(better(values[k], values[j]) for j in range(lo, hi) if j != k)
+
+    def _check(self, position, support_extrema, resistance_extrema):
+        k = position - (self.n - len(self.lows))  # позиция в буфере
+        lows, highs = list(self.lows), list(self.highs)
+        if self._is_extremum(lows, k, operator.lt):
+            self._touch(support_extrema, lows[k])
+        if self._is_extremum(highs, k, operator.gt):
+            self._touch(resistance_extrema, highs[k])
+
+    def update(self, bar):
+        high, low = (float(v) for v in bar)
+        self.highs.append(high)
+        self.lows.append(low)
+        self.n += 1
+        settled = self.n - 1 - self.order  # у этой позиции справа набралось order баров
+        if settled >= 1:
+            self._check(settled, self.support_extrema, self.resistance_extrema)
+
+    @property
+    def value(self):
+        supports, resistances = list(self.support_extrema), list(self.resistance_extrema)
+        for position in range(max(1, self.n - self.order), self.n - 1):
+            self._check(position, supports, resistances)
+        return Levels(cluster_levels(supports, self.tolerance, self.min_touches),
+                      cluster_levels(resistances, self.tolerance, self.min_touches))
+
+    def get_state(self):
+        return {
+            "order": self.order,
+            "tolerance": self.tolerance,
+            "min_touches": self.min_touches,
+            "n": self.n,
+            "highs": list(self.highs),
+            "lows": list(self.lows),
+            "support_extrema": self.support_extrema,
+            "resistance_extrema": self.resistance_extrema,
+        }
+
+    def set_state(self, state):
+        if (state["order"], state["tolerance"], state["min_touches"]) != (self.order, self.tolerance, self.min_touches):
+            raise KeyError("параметры детектора изменились")
+        self.n = state["n"]
+        self.highs.extend(state["highs"])
+        self.lows.extend(state["lows"])
+        self.support_extrema = list(state["support_extrema"])
+        self.resistance_extrema = list(state["resistance_extrema"])
+
+
+def find_levels(data, order=ORDER, tolerance=LEVEL_TOLERANCE):
+    """Уровни по всему DataFrame с колонками high/low (без сохранения состояния)."""
+    if 'high' not in data.columns or 'low' not in data.columns:
+        return Levels([], [])
+    detector = LevelDetector(order, tolerance)
+    for bar in zip(data['high'].to_numpy(dtype=float), data['low'].to_numpy(dtype=float)):
+        detector.update(bar)
+    return detector.value
+
+
+def ticker_levels(ticker, data, order=ORDER, tolerance=LEVEL_TOLERANCE):
+    """
+    Уровни тикера с продолжением из сохранённого состояния: при новом баре
+    проверяется только одна позиция, а не вся история.
+    """
+    if 'high' not in data.columns or 'low' not in data.columns:
+        return Levels([], [])
+    key = f"levels_o{order}_t{tolerance:g}_{ticker}"
+    bars = np.column_stack((data['high'].to_numpy(dtype=float), data['low'].to_numpy(dtype=float)))
+    return stream_values(key, bars, data.index, lambda: LevelDetector(order, tolerance))
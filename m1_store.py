@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Инкрементальное хранилище минутных свечей окна 09:59–10:59.
+
+История не ограничена по глубине и разбита по месяцам, чтобы размер одного
+файла оставался небольшим:
+
+    data/M1_0959_1059/{TICKER}/{TICKER}_M1_0959_1059_{YYYY-MM}.CSV
+
+Последняя сохранённая свеча берётся из хвоста последней партиции, поэтому
+ночное обновление запрашивает только новые сессии и дописывает их.
+"""
+import glob
+import os
+
+import pandas as pd
+
+from data_store import DATA_DIR, append_table, read_table, read_tail
+
+STORE_NAME = "M1_0959_1059"
+STORE_DIR = os.path.join(DATA_DIR, STORE_NAME)
+
+
+def legacy_path(ticker, data_dir=DATA_DIR):
+    """Плоский файл последних 60 дней, который писался до появления хранилища."""
+    return os.path.join(data_dir, f"{ticker.upper()}_{STORE_NAME}.CSV")
+
+
+def partition_path(ticker, month, store_dir=STORE_DIR):
+    ticker = ticker.upper()
+    return os.path.join(store_dir, ticker, f"{ticker}_{STORE_NAME}_{month}.CSV")
+
+
+def partitions(ticker, store_dir=STORE_DIR):
+    """Пути партиций тикера в хронологическом порядке."""
+    ticker = ticker.upper()
+    return sorted(glob.glob(os.path.join(store_dir, ticker, f"{ticker}_{STORE_NAME}_????-??.CSV")))
+
+
+def last_stored_begin(ticker, store_dir=STORE_DIR):
+    """Время начала последней сохранённой свечи (или None, если хранилище пусто)."""
+    for path in reversed(partitions(ticker, store_dir)):
+        tail = read_tail(path, n_rows=1)
+        if not tail.empty and tail["begin"].notna().any():
+            return tail["begin"].max()
+    return None
+
+
+def append_bars(ticker, df, store_dir=STORE_DIR):
+    """
+    Раскладывает свечи по месячным партициям и дописывает их.
+    Возвращает число новых строк.
+    """
+    if df.empty:
+        return 0
+    df = df.copy()
+    df["begin"] = pd.to_datetime(df["begin"])
+    added = 0
+    for month, part in df.groupby(df["begin"].dt.strftime("%Y-%m"), sort=True):
+        path = partition_path(ticker, month, store_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        n_added, _ = append_table(part, path, key="begin")
+        added += n_added
+    return added
+
+
+def seed_from_legacy(ticker, data_dir=DATA_DIR, store_dir=STORE_DIR):
+    """Переносит плоский файл в пустое хранилище. Возвращает число строк."""
+    path = legacy_path(ticker, data_dir)
+    if partitions(ticker, store_dir) or not os.path.exists(path):
+        return 0
+    return append_bars(ticker, read_table(path), store_dir)
+
+
+def read_store(ticker, store_dir=STORE_DIR):
+    """Вся история тикера из хранилища (пустой DataFrame, если партиций нет)."""
+    parts = [read_table(path) for path in partitions(ticker, store_dir)]
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat(parts, ignore_index=True).sort_values("begin", kind="stable").reset_index(drop=True)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Запросы и разбор свечей MOEX ISS (engines/stock/markets/shares/.../candles.json).
+
+Сама загрузка — в candles_async (единственный backend): диапазон дат
+запрашивается целиком с пагинацией по `start` (ISS отдаёт до 500 свечей за
+запрос), поэтому число запросов пропорционально числу строк, а не числу
+календарных дней: выходные и праздники не стоят ни одного запроса. Колонки
+берутся из первой страницы ответа.
+
+Для внутридневных окон (например, 09:59–10:59) window_ranges даёт по каждой
+сессии только срез from/till с временем, так что объём ответа пропорционален
+ширине окна, а не всей сессии с вечёркой.
+"""
+import random
+
+import pandas as pd
+
+from data_store import DATA_DIR
+from iss_client import ISS_BASE_URL
+from trading_calendar import TradingCalendar
+
+CANDLES_URL = ISS_BASE_URL + "/engines/stock/markets/shares/securities/{ticker}/candles.json"
+
+# Порядок колонок в ответе ISS (на случай пустого ответа)
+CANDLE_COLUMNS = ["open", "close", "high", "low", "value", "volume", "begin", "end"]
+PAGE_SIZE = 500
+MAX_RETRIES = 5
+
+
+def _iss_date(value):
+    """Дата/время в формате параметров from/till ISS."""
+    if isinstance(value, str):
+        return value
+    ts = pd.Timestamp(value)
+    return ts.strftime("%Y-%m-%d") if ts == ts.normalize() else ts.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def page_request(ticker, date_from, date_till, interval=1, start=0):
+    """URL и параметры одной страницы candles.json."""
+    url = CANDLES_URL.format(ticker=ticker.lower())
+    params = {"from": _iss_date(date_from), "till": _iss_date(date_till), "interval": interval, "start": start}
+    return url, params
+
+
+def parse_page(raw, ticker, start=0):
+    """(колонки или None, строки) из JSON-ответа candles.json."""
+    if "candles" not in raw:
+        raise ValueError(f"Нет ключа 'candles' в ответе для {ticker} (start={start})")
+    candles = raw["candles"]
+    return candles.get("columns"), candles.get("data", [])
+
+
+def retry_delay(attempt):
+    """Пауза перед попыткой attempt (со второй): экспонента с джиттером, не больше 10 сек."""
+    return min(2 ** (attempt - 1) + random.uniform(0, 1), 10)
+
+
+def to_frame(rows, columns=None):
+    """DataFrame свечей из строк ISS; begin приведён к datetime."""
+    df = pd.DataFrame(rows, columns=columns or CANDLE_COLUMNS)
+    df['begin'] = pd.to_datetime(df['begin'])
+    return df
+
+
+def candidate_sessions(ticker, date_from, date_till, data_dir=DATA_DIR):
+    """
+    Дни, за которые имеет смысл запрашивать свечи: торговые дни из дневного
+    CSV тикера плюс ожидаемые по дням недели сессии после последнего
+    известного дня (редкая субботняя сессия подхватится, когда появится в CSV).
+    """
+    calendar = TradingCalendar.from_daily([ticker], data_dir)
+    return list(calendar.expected_sessions(date_from, date_till))
+
+
+def window_ranges(sessions, time_from, time_till, since=None):
+    """Пары (from, till) окна [time_from, time_till] для каждой сессии, обрезанные снизу по since."""
+    ranges = []
+    for day in sessions:
+        day = pd.Timestamp(day).normalize()
+        lo, hi = day + pd.Timedelta(time_from), day + pd.Timedelta(time_till)
+        if since is not None:
+            lo = max(lo, pd.Timestamp(since))
+        if lo <= hi:
+            ranges.append((lo, hi))
+    return ranges
@@ -1,46 +1,13 @@
 import pandas as pd
-import numpy as np
-from scipy.signal import argrelextrema
 import os
 import requests
 
-DAILY_PATHS = {
-    "OBLG": "data/OBLG.csv",
-    "EQMX": "data/EQMX.csv",
-    "GOLD": "data/GOLD.csv",
-}
-
-HOURLY_PATHS = {
-    "OBLG": "data/OBLG_H1_35.CSV",
-    "EQMX": "data/EQMX_H1_35.CSV",
-    "GOLD": "data/GOLD_H1_35.CSV",
-}
+from data_store import load_csv
+from feature_snapshot import features
+from levels import Levels
 
 RVI_PATH = "data/RVI.csv"
 
-def load_csv(filepath):
-    if not os.path.exists(filepath):
-        raise FileNotFoundError(f"Файл не найден: {filepath}")
-    df = pd.read_csv(filepath)
-    df.columns = df.columns.str.lower()
-    date_col = None
-    for col in ['tradedate', 'begin']:
-        if col in df.columns:
-            date_col = col
-            break
-    if date_col:
-        df[date_col] = pd.to_datetime(df[date_col])
-        df.set_index(date_col, inplace=True)
-    else:
-        df.index = pd.to_datetime(df.index)
-    # ————————————————————————————————————————————————————————————————————————————————————————————————
-    # ✅ УДАЛЯЕМ строки с NaT в индексе и NaN в данных
-    # ————————————————————————————————————————————————————————————————————————————————————————————————
-    df = df.dropna()  # удаляем строки с NaN в любых колонках
-    df = df[df.index.notna()]  # удаляем строки с NaT в индексе
-    # ————————————————————————————————————————————————————————————————————————————————————————————————
-    return df
-
 def get_latest_rvi():
     df = load_csv(RVI_PATH)
     return df['close'].iloc[-1]
@@ -53,80 +20,41 @@ def calculate_adaptive_ema_span(rvi_value):
     else:
         return 50
 
-def find_levels(data, order=5):
-    if 'high' not in data.columns or 'low' not in data.columns:
-        return np.array([]), np.array([])
-    highs = data['high'].values
-    lows = data['low'].values
-    min_idx = argrelextrema(lows, np.less, order=order)[0]
-    max_idx = argrelextrema(highs, np.greater, order=order)[0]
-    supports = lows[min_idx]
-    resistances = highs[max_idx]
-
-    def group_levels(levels):
-        if len(levels) == 0:
-            return np.array([])
-        rounded = np.round(levels / 0.5) * 0.5
-        counts = pd.Series(rounded).value_counts()
-        strong_levels = counts[counts >= 2].index
-        return strong_levels.values
-
-    return group_levels(supports), group_levels(resistances)
-
-def check_confirmation_h1(ticker):
-    filepath = HOURLY_PATHS[ticker]
-    if not os.path.exists(filepath):
-        return True
-    df_h1 = load_csv(filepath)
-    if 'close' not in df_h1.columns:
-        return True
-    df_h1.sort_index(inplace=True)
-    delta = df_h1['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    rsi_h1 = 100 - (100 / (1 + rs))
-    current_rsi = rsi_h1.iloc[-1]
-    return 30 < current_rsi < 70
-
 def generate_signal(ticker):
-    df_daily = load_csv(DAILY_PATHS[ticker])
-    df_daily.sort_index(inplace=True)
+    f = features(ticker)
 
-    if 'close' not in df_daily.columns or 'volume' not in df_daily.columns:
+    if f is None:
         return "HOLD", "Ошибка данных", float('nan'), 50, float('nan'), float('nan'), [], [], float('nan')
 
     # ————————————————————————————————————————————————————————————————————————————————————————————————
-    # ✅ Теперь `iloc[-1]` возвращает реальные данные, т.к. NaN и NaT удалены
+    # ✅ Признаки берутся из снимка data/features.json (или считаются на месте, если он устарел)
     # ————————————————————————————————————————————————————————————————————————————————————————————————
-    current_price = df_daily['close'].iloc[-1]
-    current_volume = df_daily['volume'].iloc[-1]
+    current_price = f["price"]
+    current_volume = f["volume"]
 
     try:
         rvi = get_latest_rvi()
     except Exception as e:
         rvi = float('nan')
     ema_span = calculate_adaptive_ema_span(rvi) if not pd.isna(rvi) else 50
-    df_daily['ema'] = df_daily['close'].ewm(span=ema_span, adjust=False).mean()
-    current_ema = df_daily['ema'].iloc[-1]
-
-    supports, resistances = find_levels(df_daily)
+    current_ema = f["ema"][ema_span]["value"]
 
-    nearby_supports = [level for level in supports if abs(current_price - level) / current_price < 0.02]
-    nearby_resistances = [level for level in resistances if abs(current_price - level) / current_price < 0.02]
+    levels = Levels(f["supports"], f["resistances"])
+    nearby_supports = levels.supports_near(current_price, 0.02)
+    nearby_resistances = levels.resistances_near(current_price, 0.02)
 
     signal = "HOLD"
     reason = ""
     for level in nearby_supports:
-        if current_price > current_ema and current_volume > df_daily['volume'].quantile(0.7):
-            if check_confirmation_h1(ticker):
+        if current_price > current_ema and current_volume > f["volume_q70"]:
+            if f["h1_confirmed"]:
                 signal = "BUY"
                 reason = f"Поддержка: {level:.2f}, EMA({ema_span}): {current_ema:.2f}, объём ↑"
                 break
 
     for level in nearby_resistances:
-        if current_price < current_ema and current_volume > df_daily['volume'].quantile(0.7):
-            if check_confirmation_h1(ticker):
+        if current_price < current_ema and current_volume > f["volume_q70"]:
+            if f["h1_confirmed"]:
                 signal = "SELL"
                 reason = f"Сопротивление: {level:.2f}, EMA({ema_span}): {current_ema:.2f}, объём ↑"
                 break
@@ -3,6 +3,10 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+import m1_store
+from data_store import read_table
+from trading_calendar import TradingCalendar
+
 DATA_DIR = "data"
 ASSETS = ["GOLD", "EQMX", "OBLG"]
 RISK_FREE = "LQDT"
@@ -10,14 +14,14 @@ RISK_FREE = "LQDT"
 
 def load_data():
     # Загрузка сигналов
-    signals = pd.read_csv(os.path.join(DATA_DIR, "signals.csv"), parse_dates=["date"])
+    signals = read_table(os.path.join(DATA_DIR, "signals.csv"))
     signals = signals.set_index("date")["signal"]
     print(f"✅ Загружено {len(signals)} сигналов")
 
     # Загрузка D1
     d1_parts = {}
     for asset in ASSETS + [RISK_FREE]:
-        df = pd.read_csv(os.path.join(DATA_DIR, f"{asset}.csv"), parse_dates=["TRADEDATE"])
+        df = read_table(os.path.join(DATA_DIR, f"{asset}.csv"))
         df = df.set_index("TRADEDATE")["CLOSE"].rename(asset)
         d1_parts[asset] = df
     d1_full = pd.concat(d1_parts.values(), axis=1).sort_index()
@@ -26,9 +30,10 @@ def load_data():
     # Загрузка M1
     m1 = {}
     for asset in ASSETS:
-        path = os.path.join(DATA_DIR, f"{asset}_M1_0959_1059.CSV")
-        df = pd.read_csv(path)
-        df["begin"] = pd.to_datetime(df["begin"])
+        # Полная история из хранилища; плоский файл — пока хранилище не заполнено
+        df = m1_store.read_store(asset)
+        if df.empty:
+            df = read_table(m1_store.legacy_path(asset, DATA_DIR))
         df = df.set_index("begin")
         m1[asset] = df
         print(f"✅ M1 для {asset}: {len(df)} строк")
@@ -36,99 +41,241 @@ def load_data():
     return signals, d1_full, m1
 
 
-def simulate_strategy(signals, d1_full, m1, min_return, window_minutes, fee=0.0004):
-    portfolio = 1.0
-    portfolio_values = []
-
+def index_m1_sessions(m1_df):
+    """
+    Один раз группирует M1-бары по дате сессии.
+    Возвращает (даты сессий, матрицы open и close [сессия × минута], число баров).
+    Порядок баров внутри дня — как в файле.
+    """
+    # Приводим индекс M1 к naive datetime (без таймзоны)
+    if m1_df.index.tz is not None:
+        m1_df = m1_df.tz_localize(None)
+
+    days = m1_df.index.normalize().to_numpy()
+    order = np.argsort(days, kind="stable")
+    days_sorted = days[order]
+    session_days, starts, counts = np.unique(days_sorted, return_index=True, return_counts=True)
+
+    max_len = int(counts.max()) if len(counts) else 0
+    session_of_bar = np.repeat(np.arange(len(session_days)), counts)
+    minute_of_bar = np.arange(len(days_sorted)) - np.repeat(starts, counts)
+    matrices = []
+    for col in ("open", "close"):
+        matrix = np.full((len(session_days), max_len), np.nan)
+        matrix[session_of_bar, minute_of_bar] = m1_df[col].to_numpy(dtype=float)[order]
+        matrices.append(matrix)
+    return session_days, matrices[0], matrices[1], counts
+
+
+def index_asset_sessions(d1_full, m1, assets=ASSETS):
+    """
+    Не зависящий от сигналов предрасчёт: для каждого рискового актива и каждого
+    дня D+1 — матрицы open/close по минутам сессии, число баров и закрытие D1.
+    Массивы имеют форму [актив × день (× минута)].
+    """
+    trading_days = d1_full.index
+    next_dates = trading_days[1:]
+    next_days = next_dates.normalize().to_numpy()
+    n_days = len(next_dates)
+
+    sessions = {asset: index_m1_sessions(m1[asset]) for asset in assets if asset in m1}
+    max_len = max([closes.shape[1] for _, _, closes, _ in sessions.values()], default=0)
+
+    opens = np.full((len(assets), n_days, max_len), np.nan)
+    closes = np.full((len(assets), n_days, max_len), np.nan)
+    counts = np.zeros((len(assets), n_days), dtype=np.int64)
+    asset_next = np.full((len(assets), n_days), np.nan)
+    for a, asset in enumerate(assets):
+        asset_next[a] = d1_full[asset].to_numpy(dtype=float)[1:]
+        if asset not in sessions:
+            continue
+        session_days, open_matrix, close_matrix, session_counts = sessions[asset]
+        if not len(session_days):
+            continue
+        # Позиции сессий M1 для каждого D+1 (-1 — в этот день M1 нет)
+        pos = TradingCalendar(session_days).locate(next_days)
+        rows = np.flatnonzero(pos >= 0)
+        width = close_matrix.shape[1]
+        opens[a, rows, :width] = open_matrix[pos[rows]]
+        closes[a, rows, :width] = close_matrix[pos[rows]]
+        counts[a, rows] = session_counts[pos[rows]]
+
+    rf = d1_full[RISK_FREE].to_numpy(dtype=float)
+    return {
+        "trading_days": trading_days,
+        "next_dates": next_dates,
+        "assets": list(assets),
+        "opens": opens,
+        "closes": closes,
+        "counts": counts,
+        "asset_next": asset_next,
+        "rf_prev": rf[:-1],
+        "rf_next": rf[1:],
+    }
+
+
+def select_signals(matrices, day_assets):
+    """Собирает предрасчёт бэктеста для конкретного ряда сигналов (актив на каждый день D)."""
+    day_assets = np.asarray(day_assets, dtype=object)
+    n_days = len(day_assets)
+    is_rf = day_assets == RISK_FREE
+    rows = np.flatnonzero(~is_rf)
+    codes = np.array([matrices["assets"].index(asset) for asset in day_assets[rows]], dtype=np.int64)
+
+    prep = {
+        "trading_days": matrices["trading_days"],
+        "next_dates": matrices["next_dates"],
+        "assets": day_assets,
+        "rf_prev": matrices["rf_prev"],
+        "rf_next": matrices["rf_next"],
+        "is_rf": is_rf,
+        "asset_next": np.full(n_days, np.nan),
+        "opens": np.full((n_days, matrices["closes"].shape[2]), np.nan),
+        "closes": np.full((n_days, matrices["closes"].shape[2]), np.nan),
+        "counts": np.zeros(n_days, dtype=np.int64),
+    }
+    prep["asset_next"][rows] = matrices["asset_next"][codes, rows]
+    prep["opens"][rows] = matrices["opens"][codes, rows]
+    prep["closes"][rows] = matrices["closes"][codes, rows]
+    prep["counts"][rows] = matrices["counts"][codes, rows]
+    prep["open"] = prep["opens"][:, 0] if prep["opens"].shape[1] else np.full(n_days, np.nan)
+    return prep
+
+
+def signal_assets(signals, d1_full):
+    """Актив на каждый день D (LQDT, если сигнала нет)."""
+    signal_at = signals.reindex(d1_full.index[:-1])
+    return np.where(signal_at.isna().to_numpy(), RISK_FREE, signal_at.to_numpy(dtype=object))
+
+
+def prepare_backtest(signals, d1_full, m1):
+    """
+    Предрасчёт для simulate_strategy, не зависящий от параметров фильтра:
+    пары дней (D, D+1), актив на день D, цены закрытия и сессии M1 на D+1.
+    """
+    return select_signals(index_asset_sessions(d1_full, m1), signal_assets(signals, d1_full))
+
+
+def simulate_strategy(signals, d1_full, m1, min_return, window_minutes, fee=0.0004, prepared=None):
+    """
+    Бэктест утреннего фильтра массивными операциями.
+    prepared — результат prepare_backtest (чтобы не пересчитывать его на каждую комбинацию).
+    """
     trading_days = d1_full.index.tolist()
     if len(trading_days) < 2:
         return pd.Series([1.0], index=[trading_days[0]] if trading_days else [pd.Timestamp("2023-01-01")])
 
-    for i in range(len(trading_days) - 1):
-        date = trading_days[i]        # день D — сигнал
-        next_date = trading_days[i + 1]  # день D+1 — вход/выход
-
-        # Определяем актив на день D
-        if date in signals.index:
-            asset = signals.loc[date]
-        else:
-            asset = RISK_FREE
-
-        if asset == RISK_FREE:
-            ret = d1_full.loc[next_date, RISK_FREE] / d1_full.loc[date, RISK_FREE] - 1 - fee
-            portfolio *= (1 + ret)
-            portfolio_values.append((next_date, portfolio))
-            continue
-
-        # --- Работа с M1 на next_date ---
-        target_date = next_date.date()
-        m1_df = m1[asset]
-
-        # Приводим индекс M1 к naive datetime (без таймзоны)
-        if m1_df.index.tz is not None:
-            m1_df = m1_df.tz_localize(None)
-
-        # Фильтрация по дате
-        m1_day = m1_df[m1_df.index.date == target_date]
-
-        if len(m1_day) < window_minutes:
-            # Нет данных → укрытие
-            ret = d1_full.loc[next_date, RISK_FREE] / d1_full.loc[date, RISK_FREE] - 1
-            portfolio *= (1 + ret)
-            portfolio_values.append((next_date, portfolio))
-            continue
-
-        open_price = m1_day.iloc[0]["open"]
-        close_at_window = m1_day.iloc[window_minutes - 1]["close"]
+    prep = prepared if prepared is not None else prepare_backtest(signals, d1_full, m1)
+    rets = strategy_returns(prep, min_return, window_minutes, fee)
+    return pd.Series(np.cumprod(1 + rets), index=prep["next_dates"])
+
+
+def strategy_returns(prep, min_return, window_minutes, fee=0.0004):
+    """Дневные доходности стратегии (день D+1) для одной пары параметров."""
+    counts = prep["counts"]
+
+    # Есть ли на D+1 хотя бы window_minutes баров; иначе укрытие в LQDT без комиссии
+    has_window = counts >= window_minutes
+    col = np.where(window_minutes >= 1, window_minutes - 1, counts + window_minutes - 1)
+    valid = has_window & (col >= 0) & (col < prep["closes"].shape[1])
+    close_at_window = np.full(len(counts), np.nan)
+    rows = np.flatnonzero(valid)
+    close_at_window[rows] = prep["closes"][rows, col[rows]]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gain = close_at_window / prep["open"] - 1
+        risky_ret = prep["asset_next"] / close_at_window - 1 - 2 * fee
+        rf_ret = prep["rf_next"] / prep["rf_prev"] - 1
+        rf_ret_fee = prep["rf_next"] / prep["rf_prev"] - 1 - fee
+    enter = has_window & (gain >= min_return)
+
+    rets = np.where(enter, risky_ret, rf_ret)
+    return np.where(prep["is_rf"], rf_ret_fee, rets)
+
+
+def simulate_grid(prep, min_returns, window_sizes, fee=0.0004, entry_minute=0, chunk_size=32):
+    """
+    Вся сетка (min_return × window) за один проход.
+    Прирост к минуте k для каждого дня считается один раз на окно, затем все
+    пороги применяются широковещательным сравнением. entry_minute — номер бара,
+    от open которого отсчитывается окно (0 — первый бар сессии). Возвращает
+    (таблица min_return/window_minutes/total_return, кривые [порог × окно × день]).
+    """
+    min_returns = np.asarray(min_returns, dtype=float)
+    window_sizes = np.asarray(window_sizes, dtype=np.int64)
+    counts = prep["counts"]
+    n_days = len(counts)
+
+    # [окно × день]: есть ли окно, цена закрытия к концу окна, прирост и доходность входа
+    has_window = counts[np.newaxis, :] >= window_sizes[:, np.newaxis] + entry_minute
+    col = window_sizes[:, np.newaxis] + entry_minute - 1
+    valid = has_window & (col >= 0) & (col < prep["closes"].shape[1])
+    close_at_window = np.full((len(window_sizes), n_days), np.nan)
+    w_idx, d_idx = np.nonzero(valid)
+    close_at_window[w_idx, d_idx] = prep["closes"][d_idx, col[w_idx, 0]]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        open_price = prep["opens"][:, entry_minute] if entry_minute < prep["opens"].shape[1] else np.nan
         gain = close_at_window / open_price - 1
-
-        if gain >= min_return:
-            entry_price = close_at_window
-            exit_price = d1_full.loc[next_date, asset]
-            ret = exit_price / entry_price - 1 - 2 * fee
-            portfolio *= (1 + ret)
-        else:
-            ret = d1_full.loc[next_date, RISK_FREE] / d1_full.loc[date, RISK_FREE] - 1
-            portfolio *= (1 + ret)
-
-        portfolio_values.append((next_date, portfolio))
-
-    if not portfolio_values:
-        return pd.Series([1.0], index=[trading_days[0]])
-    dates, values = zip(*portfolio_values)
-    return pd.Series(values, index=dates)
+        risky_ret = prep["asset_next"] / close_at_window - 1 - 2 * fee
+        rf_ret = prep["rf_next"] / prep["rf_prev"] - 1
+        rf_ret_fee = prep["rf_next"] / prep["rf_prev"] - 1 - fee
+
+    equity = np.empty((len(min_returns), len(window_sizes), n_days))
+    for start in range(0, len(min_returns), chunk_size):
+        r = min_returns[start:start + chunk_size, np.newaxis, np.newaxis]
+        enter = has_window & (gain >= r)
+        rets = np.where(enter, risky_ret, rf_ret)
+        rets = np.where(prep["is_rf"], rf_ret_fee, rets)
+        with np.errstate(invalid="ignore"):
+            equity[start:start + chunk_size] = np.cumprod(1 + rets, axis=-1)
+
+    total = equity[:, :, -1] - 1 if n_days > 0 else np.full((len(min_returns), len(window_sizes)), -1.0)
+    r_grid, w_grid = np.meshgrid(min_returns, window_sizes, indexing="ij")
+    results_df = pd.DataFrame({
+        "min_return": r_grid.ravel(),
+        "window_minutes": w_grid.ravel(),
+        "total_return": total.ravel(),
+    })
+    return results_df, equity
+
+
+# Сетка параметров: MORNING_FILTER_GRID=dense — шаг 0.01% и окна 1–60 минут
+if os.getenv("MORNING_FILTER_GRID") == "dense":
+    MIN_RETURNS = np.arange(0.0, 0.01505, 0.0001)
+    WINDOW_SIZES = list(range(1, 61))
+else:
+    MIN_RETURNS = np.arange(0.0, 0.016, 0.001)  # 0.0% → 1.5%
+    WINDOW_SIZES = [5, 10, 15, 20, 25, 30]
 
 
 def main():
     print("🔍 Загрузка данных...")
     signals, d1_full, m1 = load_data()
 
-    # Параметры
-    min_returns = np.arange(0.0, 0.016, 0.001)  # 0.0% → 1.5%
-    window_sizes = [5, 10, 15, 20, 25, 30]
+    # Группировка M1 по сессиям и выравнивание D/D+1 — один раз на все комбинации
+    prepared = prepare_backtest(signals, d1_full, m1)
 
-    results = []
+    print(f"\n⚙️ Тестирование {len(MIN_RETURNS) * len(WINDOW_SIZES)} комбинаций...")
+    results_df, equity = simulate_grid(prepared, MIN_RETURNS, WINDOW_SIZES)
+
+    # Лучшая комбинация: первая по порядку (порог, окно) с максимальной доходностью
     best_return = -np.inf
     best_params = None
     best_series = None
-
-    print(f"\n⚙️ Тестирование {len(min_returns) * len(window_sizes)} комбинаций...")
-    for r in min_returns:
-        for w in window_sizes:
-            cumret = simulate_strategy(signals, d1_full, m1, r, w)
-            total_ret = cumret.iloc[-1] - 1 if len(cumret) > 0 else -1.0
-            results.append((r, w, total_ret))
-            if total_ret > best_return:
-                best_return = total_ret
-                best_params = (r, w)
-                best_series = cumret
+    totals = results_df["total_return"].to_numpy()
+    if len(totals) and np.nanmax(np.where(np.isnan(totals), -np.inf, totals)) > -np.inf:
+        best = int(np.argmax(np.where(np.isnan(totals), -np.inf, totals)))
+        best_return = totals[best]
+        r_idx, w_idx = divmod(best, len(WINDOW_SIZES))
+        best_params = (MIN_RETURNS[r_idx], WINDOW_SIZES[w_idx])
+        best_series = pd.Series(equity[r_idx, w_idx], index=prepared["next_dates"])
 
     # Базовая стратегия (без фильтра)
-    base_cumret = simulate_strategy(signals, d1_full, m1, min_return=-1.0, window_minutes=1)
+    base_cumret = simulate_strategy(signals, d1_full, m1, min_return=-1.0, window_minutes=1, prepared=prepared)
     base_return = base_cumret.iloc[-1] - 1 if len(base_cumret) > 0 else 0.0
 
     # === ГАРАНТИРОВАННОЕ СОЗДАНИЕ ФАЙЛОВ ===
-    results_df = pd.DataFrame(results, columns=["min_return", "window_minutes", "total_return"])
     results_path = os.path.join(DATA_DIR, "morning_filter_results.csv")
     results_df.to_csv(results_path, index=False)
     print(f"✅ Сохранён: {results_path}")
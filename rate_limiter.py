@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Общий ограничитель частоты запросов к ISS MOEX.
+
+Один экземпляр разделяется всеми потоками загрузки: он выдаёт не более
+`rate` запросов в секунду и не более `max_in_flight` одновременных запросов.
+"""
+import threading
+import time
+
+
+class RateLimiter:
+    def __init__(self, rate=4.0, max_in_flight=4):
+        self.rate = rate
+        self.max_in_flight = max_in_flight
+        self._interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+
+    def acquire(self):
+        """Блокирует поток до получения свободного слота."""
+        self._in_flight.acquire()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def release(self):
+        self._in_flight.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
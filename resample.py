@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Построение N-минутных и часовых свечей из минутных (M1) локально.
+
+Семантика как у свечей ISS (open, close, high, low, value, volume, begin, end):
+begin — начало интервала, выровненного от полуночи (для H1 — начало часа),
+end — end последней минутной свечи интервала, open/close — первой и последней,
+high/low — экстремумы, value/volume — суммы. Пустые интервалы не создаются.
+"""
+import numpy as np
+import pandas as pd
+
+from moex_candles import CANDLE_COLUMNS
+from time_of_day import NS_PER_DAY, near_mask, to_ns
+
+
+def resample_candles(m1, minutes=60):
+    """Свечи по `minutes` минут из минутного DataFrame с колонками ISS."""
+    if m1.empty:
+        return pd.DataFrame(columns=CANDLE_COLUMNS)
+    df = m1.sort_values("begin", kind="stable")
+    begin = np.asarray(pd.to_datetime(df["begin"]), dtype="datetime64[ns]").view("int64")
+    end = np.asarray(pd.to_datetime(df["end"]), dtype="datetime64[ns]").view("int64")
+
+    step = to_ns(f"{minutes}min")
+    day = begin - begin % NS_PER_DAY
+    bucket = day + (begin - day) // step * step
+
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    last = np.r_[starts[1:], len(bucket)] - 1
+
+    def col(name):
+        return df[name].to_numpy(dtype=float)
+
+    out = pd.DataFrame({
+        "open": col("open")[starts],
+        "close": col("close")[last],
+        "high": np.maximum.reduceat(col("high"), starts),
+        "low": np.minimum.reduceat(col("low"), starts),
+        "value": np.add.reduceat(col("value"), starts),
+        "volume": np.add.reduceat(df["volume"].to_numpy(), starts),
+        "begin": bucket[starts].view("datetime64[ns]"),
+        "end": np.maximum.reduceat(end, starts).view("datetime64[ns]"),
+    })
+    return out[CANDLE_COLUMNS]
+
+
+def snapshot(m1, target="12:00:00", tolerance="1min", minutes=60):
+    """Свечи `minutes`, закрывшиеся около target (как *_H1_12-00.csv из часовых свечей ISS)."""
+    bars = resample_candles(m1, minutes)
+    return bars[near_mask(bars["end"], target, tolerance)].reset_index(drop=True)
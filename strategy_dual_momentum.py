@@ -3,6 +3,9 @@ import pandas as pd
 import numpy as np
 import requests
 
+from data_store import load_daily, read_table
+from indicators import rolling_mean_matrix, rsi_matrix, volatility_matrix
+
 # --------------- Параметры ---------------
 DATA_DIR = "data/"
 ASSETS = ["GOLD", "EQMX", "OBLG", "LQDT"]
@@ -27,29 +30,19 @@ CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 TELEGRAM_ENABLED = bool(BOT_TOKEN and CHAT_ID)
 
 
-def compute_rsi(series, window=14):
-    delta = series.diff()
-    gain = (delta.where(delta > 0, 0)).fillna(0)
-    loss = (-delta.where(delta < 0, 0)).fillna(0)
-    avg_gain = gain.rolling(window=window, min_periods=1).mean()
-    avg_loss = loss.rolling(window=window, min_periods=1).mean()
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
-
-
 def load_and_prepare_data():
     dfs = {}
     for asset in ASSETS:
         path = os.path.join(DATA_DIR, f"{asset}.csv")
         if not os.path.exists(path):
             raise FileNotFoundError(f"Файл не найден: {path}")
-        df = pd.read_csv(path)
+        df = load_daily(asset, DATA_DIR)
         df['Date'] = pd.to_datetime(df['TRADEDATE'], errors='coerce')
         df = df[['Date', 'OPEN', 'HIGH', 'LOW', 'CLOSE', 'VOLUME']].copy()
 
         for col in ['OPEN', 'HIGH', 'LOW', 'CLOSE', 'VOLUME']:
-            if col in df.columns:
+            # Типизированные колонки из хранилища чистить не нужно
+            if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
                 df[col] = (
                     df[col].astype(str)
                     .str.replace(' ', '', regex=False)
@@ -70,7 +63,7 @@ def load_and_prepare_data():
     rvi_path = os.path.join(DATA_DIR, "RVI.csv")
     if not os.path.exists(rvi_path):
         raise FileNotFoundError(f"Файл не найден: {rvi_path}")
-    df_rvi = pd.read_csv(rvi_path)
+    df_rvi = read_table(rvi_path)
     df_rvi['Date'] = pd.to_datetime(df_rvi['TRADEDATE'], errors='coerce')
     df_rvi = df_rvi[['Date', 'CLOSE']].rename(columns={'CLOSE': 'Close_RVI'})
     df_rvi['Close_RVI'] = pd.to_numeric(df_rvi['Close_RVI'], errors='coerce')
@@ -140,21 +133,24 @@ def get_and_send_signal():
         send_telegram_message(msg)
         return
 
-    # --- Моментум ---
-    mom = {}
-    for asset in RISK_ASSETS + [RISK_FREE]:
-        price_today = df[f'CLOSE_{asset}'].iloc[-1]
-        price_past = df[f'CLOSE_{asset}'].iloc[-(LOOKBACK + 1)]
-        mom[asset] = price_today / price_past - 1
+    # --- Матрицы «даты × активы» ---
+    mom_assets = RISK_ASSETS + [RISK_FREE]
+    closes_all = df[[f'CLOSE_{a}' for a in mom_assets]].to_numpy(dtype=float)
+    closes = closes_all[:, :len(RISK_ASSETS)]
+    volumes = df[[f'VOLUME_{a}' for a in RISK_ASSETS]].to_numpy(dtype=float)
 
-    # --- Индикаторы ---
-    for asset in RISK_ASSETS:
-        df[f'MA_{asset}'] = df[f'CLOSE_{asset}'].rolling(MA_PERIOD).mean()
-        df[f'RSI_{asset}'] = compute_rsi(df[f'CLOSE_{asset}'], RSI_PERIOD)
-        df[f'VOL_MA10_{asset}'] = df[f'VOLUME_{asset}'].rolling(10).mean()
-        # Расчёт годовой волатильности (20-дневное окно)
-        returns = df[f'CLOSE_{asset}'].pct_change()
-        df[f'VOLATILITY_{asset}'] = returns.rolling(20).std() * np.sqrt(252)
+    # --- Моментум ---
+    mom = dict(zip(mom_assets, closes_all[-1] / closes_all[-(LOOKBACK + 1)] - 1))
+
+    # --- Индикаторы: один векторный расчёт на все активы (без состояния в data/.indicators) ---
+    indicators = {
+        "MA": rolling_mean_matrix(closes, MA_PERIOD)[-1],
+        "RSI": rsi_matrix(closes, RSI_PERIOD, min_periods=1)[-1],
+        "VOL_MA10": rolling_mean_matrix(volumes, 10)[-1],
+        # Годовая волатильность (20-дневное окно)
+        "VOLATILITY": volatility_matrix(closes, 20)[-1],
+    }
+    indicators = {name: dict(zip(RISK_ASSETS, values)) for name, values in indicators.items()}
 
     # --- Фильтры ---
     filters = {asset: {"MA": False, "RSI": False, "VOLUME": False, "VOLATILITY": False} for asset in RISK_ASSETS}
@@ -162,11 +158,11 @@ def get_and_send_signal():
 
     for asset in RISK_ASSETS:
         price = df[f'CLOSE_{asset}'].iloc[-1]
-        ma_val = df[f'MA_{asset}'].iloc[-1]
-        rsi_val = df[f'RSI_{asset}'].iloc[-1]
+        ma_val = indicators["MA"][asset]
+        rsi_val = indicators["RSI"][asset]
         vol_today = df[f'VOLUME_{asset}'].iloc[-1]
-        vol_ma10 = df[f'VOL_MA10_{asset}'].iloc[-1]
-        volatility = df[f'VOLATILITY_{asset}'].iloc[-1]
+        vol_ma10 = indicators["VOL_MA10"][asset]
+        volatility = indicators["VOLATILITY"][asset]
 
         ma_ok = price > ma_val
         rsi_ok = rsi_val < RSI_OVERBOUGHT
@@ -217,7 +213,7 @@ def get_and_send_signal():
         rsi_status = "✅" if filters[asset]["RSI"] else "⚠️"
         vol_status = "✅" if filters[asset]["VOLUME"] else "⚠️"
         vola_status = "✅" if filters[asset]["VOLATILITY"] else "⚠️"
-        current_vol = df[f'VOLATILITY_{asset}'].iloc[-1] * 100  # в %
+        current_vol = indicators["VOLATILITY"][asset] * 100  # в %
         msg_lines.append(
             f"{asset}: MA={ma_status}, RSI={rsi_status}, VOL={vol_status}, "
             f"σ={vola_status} ({current_vol:.1f}%)"
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Параллельный перебор параметров утреннего фильтра с кэшем результатов.
+
+Помимо сетки (min_return × window) перебираются комиссия, lookback сигналов
+Dual Momentum и минута входа. Комбинации (fee, lookback, entry_minute)
+распределяются по ProcessPoolExecutor; данные M1/D1 не передаются каждому
+процессу, а читаются из memory-mapped .npy. Результат каждой комбинации
+сохраняется в data/.sweep_cache с ключом из её параметров, хэша массивов M1
+и хэша ряда активов её lookback — от чего она и зависит. Новый день данных
+или изменение сигналов одного lookback пересчитывает только затронутые
+комбинации; записи с ключами, которых текущий запуск не порождает, удаляются.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import generate_signals
+from optimize_morning_filter import (
+    DATA_DIR, MIN_RETURNS, WINDOW_SIZES,
+    index_asset_sessions, load_data, select_signals, signal_assets, simulate_grid,
+)
+
+# --- Параметры перебора ---
+FEES = [0.0002, 0.0004, 0.0008]
+LOOKBACKS = [2, 5, 10, 20]
+ENTRY_MINUTES = [0, 1, 2, 5]
+MAX_WORKERS = int(os.getenv("SWEEP_MAX_WORKERS", str(os.cpu_count() or 1)))
+
+CACHE_DIR = os.path.join(DATA_DIR, ".sweep_cache")
+OUTPUT_PATH = os.path.join(DATA_DIR, "morning_filter_sweep.csv")
+
+_SHARED_ARRAYS = ("opens", "closes", "counts", "asset_next", "rf_prev", "rf_next")
+
+# Данные воркера (заполняются в _init_worker)
+_worker = {}
+
+
+def _m1_hash(matrices):
+    """Хэш массивов M1/D1, общих для всех комбинаций."""
+    h = hashlib.sha1()
+    for name in _SHARED_ARRAYS:
+        h.update(np.ascontiguousarray(matrices[name]).tobytes())
+    h.update(matrices["trading_days"].to_numpy().tobytes())
+    h.update(matrices["next_dates"].to_numpy().tobytes())
+    h.update(",".join(matrices["assets"]).encode())
+    return h.hexdigest()
+
+
+def _assets_hash(day_assets):
+    """Хэш ряда активов по дням для одного lookback."""
+    return hashlib.sha1(",".join(map(str, day_assets)).encode()).hexdigest()
+
+
+def _cache_key(fee, lookback, entry_minute, m1_hash, assets_hash):
+    params = {
+        "fee": fee,
+        "lookback": lookback,
+        "entry_minute": entry_minute,
+        "min_returns": [float(r) for r in MIN_RETURNS],
+        "window_sizes": [int(w) for w in WINDOW_SIZES],
+    }
+    return hashlib.sha1((json.dumps(params, sort_keys=True) + m1_hash + assets_hash).encode()).hexdigest()
+
+
+def _prune_cache(keep):
+    """Удаляет из CACHE_DIR результаты с ключами не из keep."""
+    removed = 0
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".npy") and name[:-4] not in keep:
+            os.remove(os.path.join(CACHE_DIR, name))
+            removed += 1
+    return removed
+
+
+def _init_worker(mmap_dir, meta):
+    matrices = {name: np.load(os.path.join(mmap_dir, f"{name}.npy"), mmap_mode="r") for name in _SHARED_ARRAYS}
+    matrices.update(meta)
+    _worker["matrices"] = matrices
+
+
+def _run_combination(task):
+    fee, lookback, entry_minute, day_assets = task
+    prep = select_signals(_worker["matrices"], day_assets)
+    results_df, _ = simulate_grid(prep, MIN_RETURNS, WINDOW_SIZES, fee=fee, entry_minute=entry_minute)
+    return results_df["total_return"].to_numpy()
+
+
+def run_sweep(fees=FEES, lookbacks=LOOKBACKS, entry_minutes=ENTRY_MINUTES, max_workers=MAX_WORKERS):
+    """Возвращает таблицу min_return, window_minutes, total_return, fee, lookback, entry_minute."""
+    _, d1_full, m1 = load_data()
+    matrices = index_asset_sessions(d1_full, m1)
+
+    # Сигналы для всех lookback — одним векторным проходом
+    d1_signals = generate_signals.load_d1_data()
+    signal_sets = generate_signals.generate_signals_grid(d1_signals, lookbacks)
+    day_assets = {
+        lb: signal_assets(sig.set_index("date")["signal"], d1_full)
+        for lb, sig in signal_sets.items()
+    }
+
+    m1_hash = _m1_hash(matrices)
+    assets_hashes = {lb: _assets_hash(assets) for lb, assets in day_assets.items()}
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    combos = [(fee, lb, entry) for fee in fees for lb in lookbacks for entry in entry_minutes]
+    keys = {combo: _cache_key(*combo, m1_hash, assets_hashes[combo[1]]) for combo in combos}
+    removed = _prune_cache(set(keys.values()))
+    totals = {}
+    pending = []
+    for combo in combos:
+        path = os.path.join(CACHE_DIR, f"{keys[combo]}.npy")
+        if os.path.exists(path):
+            totals[combo] = np.load(path)
+        else:
+            pending.append(combo)
+    print(f"⚙️ Комбинаций: {len(combos)}, из кэша: {len(combos) - len(pending)}, к расчёту: {len(pending)}, "
+          f"удалено устаревших: {removed}")
+
+    if pending:
+        mmap_dir = tempfile.mkdtemp(prefix="sweep_")
+        try:
+            for name in _SHARED_ARRAYS:
+                np.save(os.path.join(mmap_dir, f"{name}.npy"), matrices[name])
+            meta = {key: matrices[key] for key in ("trading_days", "next_dates", "assets")}
+            tasks = [(fee, lb, entry, day_assets[lb]) for fee, lb, entry in pending]
+            with ProcessPoolExecutor(max_workers=max(1, max_workers), initializer=_init_worker,
+                                     initargs=(mmap_dir, meta)) as executor:
+                for combo, result in zip(pending, executor.map(_run_combination, tasks)):
+                    totals[combo] = result
+                    np.save(os.path.join(CACHE_DIR, f"{keys[combo]}.npy"), result)
+        finally:
+            shutil.rmtree(mmap_dir, ignore_errors=True)
+
+    r_grid, w_grid = np.meshgrid(np.asarray(MIN_RETURNS, dtype=float), np.asarray(WINDOW_SIZES), indexing="ij")
+    frames = []
+    for fee, lb, entry in combos:
+        frames.append(pd.DataFrame({
+            "min_return": r_grid.ravel(),
+            "window_minutes": w_grid.ravel(),
+            "total_return": totals[(fee, lb, entry)],
+            "fee": fee,
+            "lookback": lb,
+            "entry_minute": entry,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    sweep_df = run_sweep()
+    # Первые три колонки совпадают с data/morning_filter_results.csv
+    sweep_df.to_csv(OUTPUT_PATH, index=False)
+    print(f"✅ Сохранён: {OUTPUT_PATH} ({len(sweep_df)} строк)")
+    best = sweep_df.loc[sweep_df["total_return"].idxmax()] if sweep_df["total_return"].notna().any() else None
+    if best is not None:
+        print(f"🏆 Лучшее: +{best['min_return']*100:.2f}% за {int(best['window_minutes'])} мин, "
+              f"fee={best['fee']}, lookback={int(best['lookback'])}, вход с {int(best['entry_minute'])}-й минуты "
+              f"→ {best['total_return']:.2%}")
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Правила ТА-сигнала moex_signals_tech_analisys_5-6 и 7-8 и их прогон по истории.
+
+evaluate() — правила на одну дату: тренд EMA, изменение цены за 5 дней,
+отношения объёма, ближайшие поддержки/сопротивления, подтверждение по H1,
+ограничение стопа и тейка. generate_signal (5-6) и generate_ta_signal (7-8)
+вызывают её с признаками из feature_snapshot.
+
+replay() применяет те же правила к каждой дате истории за один проход:
+изменения цены и отношения объёма считаются векторно по всему ряду, EMA,
+RSI и уровни — теми же потоковыми индикаторами, что и в снимке, бар за
+баром, RVI и RSI по H1 берутся на дату бинарным поиском. Строка на дату совпадает с тем, что
+выдала бы живая функция на файлах, обрезанных по эту дату (RVI — последнее
+значение не позже даты, H1 — бары, начавшиеся не позже конца даты; если
+H1-баров ещё нет, подтверждение есть, как при отсутствии файла).
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_DIR, load_csv
+from feature_snapshot import DAILY_PATHS, EMA_SPANS, EMA_TREND_WINDOW, HOURLY_PATHS, PRICE_DYNAMICS
+from indicators import EMA, RSI, run, volume_ratios
+from levels import LevelDetector, Levels
+
+RVI_PATH = os.path.join(DATA_DIR, "RVI.csv")
+
+MAX_STOP_DISTANCE = 0.03
+SUPPORT_ZONE = 0.015  # «вблизи» — ближе 1.5% от цены
+RECENT_SUPPORT_ZONE = 0.05  # поддержки для стопа в тренде (не дальше 5%, включительно)
+
+
+def calculate_adaptive_ema_span(rvi_value):
+    if rvi_value > 25:
+        return 20
+    elif rvi_value > 15:
+        return 35
+    else:
+        return 50
+
+
+def rsi_comment(rsi):
+    if rsi < 30:
+        return "RSI: зона перепроданности → возможен отскок"
+    elif rsi > 70:
+        return "RSI: зона перекупленности → возможен откат"
+    return ""
+
+
+def evaluate(price, ema, ema_prev, price_changes, volume_ratios, levels, h1_confirmed, rvi, rsi, rows):
+    """
+    Сигнал на одну дату. ema_prev — EMA EMA_TREND_WINDOW баров назад (None, если
+    ряд короче), price_changes/volume_ratios — словари по PRICE_DYNAMICS,
+    levels — Levels, rows — длина дневного ряда.
+    """
+    if ema_prev is not None:
+        ema_trend = "растёт" if ema > ema_prev else "падает"
+    else:
+        ema_trend = "недостаточно данных"
+
+    # Уровни отсортированы по возрастанию: ближайшая поддержка — последняя, сопротивление — первое
+    supports_below = levels.supports_below(price)
+    resistances_above = levels.resistances_above(price)
+
+    supports_near = levels.supports_below(price, within=SUPPORT_ZONE)
+    resistances_near = levels.resistances_above(price, within=SUPPORT_ZONE)
+
+    if not supports_near and supports_below:
+        supports_near = [supports_below[-1]]
+
+    if not resistances_near and resistances_above:
+        resistances_near = [resistances_above[0]]
+
+    signal = "HOLD"
+    interpretation = "Нет чёткого сигнала"
+    comment = rsi_comment(rsi)
+    stop_loss = None
+    take_profit = None
+
+    if (ema_trend == "растёт" and price > ema and
+        price_changes[5] and price_changes[5] > 3 and volume_ratios[10] > 1.5 and h1_confirmed):
+        signal = "BUY"
+        interpretation = "Сильный восходящий тренд + высокий объём → продолжение роста"
+        take_profit = resistances_above[0] if resistances_above else price * 1.02
+        recent_supports = levels.supports_below(price, within=RECENT_SUPPORT_ZONE, inclusive=True)
+        if recent_supports:
+            stop_loss = max(recent_supports) * 0.995
+        else:
+            stop_loss = ema * 0.99
+
+    elif (ema_trend == "растёт" and price > ema and
+          price_changes[1] and price_changes[1] < 0 and
+          price_changes[5] and price_changes[5] > 2 and h1_confirmed):
+        signal = "HOLD"
+        interpretation = "Коррекция в восходящем тренде. Ждём подтверждения отскока"
+
+    elif (supports_near and price > supports_near[-1] * 0.995 and
+          volume_ratios[5] > 1.3 and h1_confirmed and
+          price > ema):
+        signal = "BUY"
+        base_msg = "Цена у поддержки, объём высокий → возможен отскок вверх"
+        interpretation = f"{base_msg}. {comment}" if comment else base_msg
+        take_profit = resistances_above[0] if resistances_above else price * 1.015
+        stop_loss = supports_near[-1] * 0.99
+
+    elif (resistances_near and price > resistances_near[0] and
+          volume_ratios[1] > 1.5 and h1_confirmed and
+          price > ema):
+        signal = "BUY"
+        interpretation = "Пробой сопротивления на высоком объёме → вход после подтверждения"
+        take_profit = price * 1.02
+        stop_loss = resistances_near[0] * 0.995
+
+    elif (rows > 10 and
+          price > ema_prev and
+          supports_near and price < supports_near[0] * 1.005 and
+          volume_ratios[1] > 0.8 and h1_confirmed and
+          price > ema):
+        signal = "BUY"
+        base_msg = "Тест бывшего сопротивления (теперь поддержка) → идеальная точка входа"
+        interpretation = f"{base_msg}. {comment}" if comment else base_msg
+        take_profit = resistances_above[0] if resistances_above else price * 1.02
+        stop_loss = supports_near[0] * 0.99
+
+    elif rvi > 25 and not h1_confirmed:
+        signal = "HOLD"
+        interpretation = f"Высокая волатильность (RVI={rvi:.1f}). Требуется подтверждение по H1"
+
+    elif (ema_trend == "падает" and price < ema and
+          price_changes[5] and price_changes[5] < -3 and volume_ratios[10] > 1.5 and h1_confirmed):
+        signal = "HOLD"
+        interpretation = "Сильный нисходящий тренд. Избегать лонгов."
+
+    # Стоп не дальше MAX_STOP_DISTANCE и ниже цены, тейк выше цены
+    if signal == "BUY":
+        max_stop = price * (1 - MAX_STOP_DISTANCE)
+        if stop_loss is None or stop_loss >= price:
+            stop_loss = max_stop
+        elif stop_loss < max_stop:
+            stop_loss = max_stop
+        if take_profit is None or take_profit <= price:
+            take_profit = price * 1.015
+
+    if stop_loss:
+        stop_loss = round(stop_loss, 2)
+    if take_profit:
+        take_profit = round(take_profit, 2)
+
+    return {
+        "ema_trend": ema_trend,
+        "supports": sorted(supports_near),
+        "resistances": sorted(resistances_near),
+        "signal": signal,
+        "interpretation": interpretation,
+        "rsi_comment": comment,
+        "stop_loss": stop_loss,
+        "take_profit": take_profit,
+    }
+
+
+# ——— Прогон по истории ———
+
+def _changes(close, days):
+    """(close[i] - close[i-days]) / close[i-days] * 100 для каждого i (NaN в начале)."""
+    changes = np.full(len(close), np.nan)
+    if len(close) > days:
+        past = close[:-days]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            changes[days:] = (close[days:] - past) / past * 100
+    return changes
+
+
+def _rvi_asof(rvi, dates):
+    """Последнее значение RVI не позже каждой даты (NaN, если его ещё нет)."""
+    if rvi is None or 'close' not in rvi.columns or rvi.empty:
+        return np.full(len(dates), np.nan)
+    k = rvi.index.searchsorted(dates, side="right")
+    values = np.append(np.nan, rvi['close'].to_numpy(dtype=float))
+    return values[k]
+
+
+def _h1_confirmation(h1, dates):
+    """RSI(14) по H1-барам, начавшимся до конца каждой даты, в коридоре 30–70."""
+    if h1 is None or 'close' not in h1.columns or h1.empty:
+        return np.ones(len(dates), dtype=bool)
+    rsi = run(RSI(14), h1['close'].to_numpy(dtype=float))
+    k = h1.index.searchsorted(dates + pd.Timedelta(days=1), side="left")
+    confirmed = np.append(True, (30 < rsi) & (rsi < 70))
+    return confirmed[k]
+
+
+def replay(daily, h1=None, rvi=None):
+    """
+    Сигналы на каждую дату дневного ряда daily (как из load_csv: индекс — дата,
+    колонки close/volume/high/low). h1 — часовой ряд тикера, rvi — ряд RVI.
+    Возвращает DataFrame с индексом-датой и колонками price, rvi, ema_span, ema,
+    ema_trend, rsi, h1_confirmed, supports, resistances, signal, interpretation,
+    rsi_comment, stop_loss, take_profit.
+    """
+    dates = daily.index
+    close = daily['close'].to_numpy(dtype=float)
+    volume = daily['volume'].to_numpy(dtype=float)
+    has_levels = 'high' in daily.columns and 'low' in daily.columns
+    if has_levels:
+        bars = np.column_stack((daily['high'].to_numpy(dtype=float), daily['low'].to_numpy(dtype=float)))
+
+    emas = {span: run(EMA(span), close) for span in EMA_SPANS}
+    changes = {days: _changes(close, days) for days in PRICE_DYNAMICS}
+    ratios = {days: volume_ratios(volume, days) for days in PRICE_DYNAMICS}
+    rsi = run(RSI(), close)
+    rvi_values = _rvi_asof(rvi, dates)
+    h1_confirmed = _h1_confirmation(h1, dates)
+
+    detector = LevelDetector()
+    no_levels = Levels([], [])
+    records = []
+    for i in range(len(dates)):
+        if has_levels:
+            detector.update(bars[i])
+        rvi_value = rvi_values[i]
+        ema_span = calculate_adaptive_ema_span(rvi_value) if not pd.isna(rvi_value) else 50
+        ema = emas[ema_span]
+        ema_prev = ema[i + 1 - EMA_TREND_WINDOW] if i >= EMA_TREND_WINDOW else None
+        result = evaluate(
+            close[i], ema[i], ema_prev,
+            {days: changes[days][i] if i >= days else None for days in PRICE_DYNAMICS},
+            {days: ratios[days][i] for days in PRICE_DYNAMICS},
+            detector.value if has_levels else no_levels,
+            bool(h1_confirmed[i]), rvi_value, rsi[i], i + 1,
+        )
+        records.append({
+            "price": close[i],
+            "rvi": rvi_value,
+            "ema_span": ema_span,
+            "ema": ema[i],
+            "rsi": rsi[i],
+            "h1_confirmed": bool(h1_confirmed[i]),
+            **result,
+        })
+
+    columns = ["price", "rvi", "ema_span", "ema", "ema_trend", "rsi", "h1_confirmed", "supports",
+               "resistances", "signal", "interpretation", "rsi_comment", "stop_loss", "take_profit"]
+    return pd.DataFrame.from_records(records, index=dates, columns=columns)
+
+
+def _load_optional(path):
+    if not path or not os.path.exists(path):
+        return None
+    return load_csv(path)
+
+
+def replay_ticker(ticker):
+    """replay() по файлам тикера из data/ (дневной ряд, H1 и RVI)."""
+    return replay(
+        load_csv(DAILY_PATHS[ticker]),
+        h1=_load_optional(HOURLY_PATHS.get(ticker)),
+        rvi=_load_optional(RVI_PATH),
+    )
+
+
+def main(tickers=("OBLG", "EQMX", "GOLD")):
+    for ticker in tickers:
+        signals = replay_ticker(ticker)
+        buys = signals[signals['signal'] == "BUY"]
+        print(f"✅ {ticker}: {len(signals)} дат ({signals.index[0].date()} — {signals.index[-1].date()}), BUY: {len(buys)}")
+        for date, row in buys.tail(5).iterrows():
+            print(f"   {date.date()} {row['price']:.2f} → Стоп: {row['stop_loss']:.2f} Тейк: {row['take_profit']:.2f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ("OBLG", "EQMX", "GOLD"))
@@ -1,46 +1,25 @@
-import requests
-import pandas as pd
 import os
-from datetime import datetime
 
-os.makedirs("data", exist_ok=True)
-
-url = "https://iss.moex.com/iss/engines/stock/markets/shares/securities/eqmx/candles.json?from=2025-11-01&till=2025-11-01&interval=1"
+from candles_async import fetch_windows
+from time_of_day import window_mask
 
-print(f"📥 Запрашиваю данные: {url}")
+os.makedirs("data", exist_ok=True)
 
-try:
-    response = requests.get(url, timeout=20)
-    response.raise_for_status()
-    raw = response.json()
-except Exception as e:
-    print(f"❌ Ошибка запроса: {e}")
-    exit(1)
+SESSION = "2025-11-01"
 
-# Извлекаем данные из вложенного объекта "candles"
-if "candles" not in raw:
-    print("⚠️ В ответе отсутствует ключ 'candles'")
-    exit(1)
+print(f"📥 Запрашиваю свечи EQMX за {SESSION}, окно 09:59–10:59")
 
-candles = raw["candles"]
-columns = candles.get("columns")
-data_rows = candles.get("data", [])
+# Только окно 09:59–10:59, а не вся сессия
+df = fetch_windows({"eqmx": [SESSION]}, "09:59:00", "10:59:00", interval=1)["eqmx"]
 
-if not columns or not data_rows:
+if df.empty:
     print("⚠️ Нет данных или структура ответа неожиданная")
     exit(1)
 
-# Создаём DataFrame
-df = pd.DataFrame(data_rows, columns=columns)
-df['begin'] = pd.to_datetime(df['begin'])
-
-# Фильтруем 09:59–10:59
-df_filtered = df[
-    (df['begin'].dt.time >= pd.Timestamp("09:59").time()) &
-    (df['begin'].dt.time <= pd.Timestamp("10:59").time())
-].copy()
+# Фильтруем 09:59–10:59 (страховка на границах окна)
+df_filtered = df[window_mask(df['begin'], "09:59:00", "10:59:00")].copy()
 
-print(f"✅ Получено {len(data_rows)} свечей, после фильтра: {len(df_filtered)}")
+print(f"✅ Получено {len(df)} свечей, после фильтра: {len(df_filtered)}")
 
 # Сохраняем
 output_file = "data/EQMX_M1_0959_1059_20251101.CSV"
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Общий стаб ISS для тестов. iss_client читает адрес и настройки кэша из
+окружения при импорте, поэтому стаб запускается и окружение задаётся до
+импорта модулей проекта в тестах.
+"""
+import os
+import tempfile
+
+import pytest
+
+from iss_stub import StubISS
+
+_stub = StubISS().__enter__()
+os.environ.update(
+    ISS_BASE_URL=_stub.base_url,
+    ISS_CACHE_DIR=tempfile.mkdtemp(prefix="iss_cache_"),
+    ISS_REQUESTS_PER_SECOND="0",
+    ISS_ASYNC_RATE="0",
+    ISS_HTTP_RETRIES="0",
+)
+
+
+def pytest_unconfigure(config):
+    _stub.__exit__(None, None, None)
+
+
+@pytest.fixture
+def stub():
+    """Стаб со сброшенными счётчиками и сбоями."""
+    _stub.reset()
+    yield _stub
+    _stub.reset()
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Пустой кэш ответов iss_client на время теста."""
+    import iss_client
+    monkeypatch.setattr(iss_client, "CACHE_DIR", str(tmp_path / "iss_cache"))
+    return tmp_path / "iss_cache"
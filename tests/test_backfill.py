@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Возобновляемая догрузка backfill на стабе ISS: сбой страницы и продолжение с чекпойнта."""
+import json
+import os
+from urllib.parse import parse_qs
+
+import pytest
+
+import backfill
+import candles_async
+from iss_stub import CANDLES_PAGE_SIZE, candle_rows
+from moex_candles import MAX_RETRIES
+
+DATE_FROM, DATE_TILL = "2025-09-01", "2025-10-31 23:59:59"
+INTERVAL = 10
+SEGMENT_DAYS = 30
+
+
+@pytest.fixture(autouse=True)
+def no_retry_pause(monkeypatch, cache_dir):
+    monkeypatch.setattr(candles_async, "retry_delay", lambda attempt: 0)
+
+
+def _run(tmp_path, name):
+    out_path = str(tmp_path / name)
+    backfill.backfill("gold", DATE_FROM, DATE_TILL, out_path, select=lambda df: df, interval=INTERVAL,
+                      segment_days=SEGMENT_DAYS, state_dir=str(tmp_path / "state"))
+    return out_path
+
+
+def _froms(stub):
+    return [parse_qs(q)["from"][0] for _, q in stub.log]
+
+
+def test_failed_page_resumes_from_checkpoint(stub, tmp_path):
+    seg_from, seg_till = backfill.split_range(DATE_FROM, DATE_TILL, SEGMENT_DAYS)[0]
+    # Вторая страница первого сегмента начинается с end последней свечи первой
+    cursor = candle_rows("GOLD", seg_from, seg_till, INTERVAL)[CANDLES_PAGE_SIZE - 1][7]
+    stub.fail("candles.json", times=MAX_RETRIES, date_from=cursor)
+
+    with pytest.raises(RuntimeError):
+        _run(tmp_path, "resumed.csv")
+
+    state_path = tmp_path / "state" / f"GOLD_{INTERVAL}_resumed.csv.json"
+    with open(state_path, encoding="utf-8") as f:
+        first = json.load(f)["segments"][0]
+    assert (first["last_end"], first["done"]) == (cursor, False)
+
+    stub.reset()
+    resumed = _run(tmp_path, "resumed.csv")
+
+    # Повтор идёт только по недогруженному сегменту и с last_end, а не с начала
+    assert _froms(stub)[0] == cursor
+    assert seg_from not in _froms(stub)
+    assert not os.path.exists(state_path)
+
+    uninterrupted = _run(tmp_path, "uninterrupted.csv")
+    with open(resumed, "rb") as a, open(uninterrupted, "rb") as b:
+        assert a.read() == b.read()
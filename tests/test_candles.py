@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Загрузка свечей через candles_async на стабе ISS."""
+import pandas as pd
+import pytest
+
+import candles_async
+from iss_stub import CANDLE_COLUMNS, CANDLES_PAGE_SIZE, candle_rows
+from moex_candles import MAX_RETRIES, to_frame, window_ranges
+
+CANDLES_PATH = "/iss/engines/stock/markets/shares/securities/gold/candles.json"
+SESSIONS = [pd.Timestamp("2025-10-01").date(), pd.Timestamp("2025-10-02").date()]
+
+
+@pytest.fixture(autouse=True)
+def no_retry_pause(monkeypatch, cache_dir):
+    monkeypatch.setattr(candles_async, "retry_delay", lambda attempt: 0)
+
+
+def _starts(stub):
+    return [int(q.split("start=")[1].split("&")[0]) for _, q in stub.log]
+
+
+def _expected(date_from, date_till):
+    return to_frame(candle_rows("GOLD", date_from, date_till), CANDLE_COLUMNS)
+
+
+def test_window_ranges_are_clipped_by_since():
+    ranges = window_ranges(SESSIONS, "09:59:00", "10:59:00", since="2025-10-01 10:30:00")
+
+    assert ranges == [
+        (pd.Timestamp("2025-10-01 10:30:00"), pd.Timestamp("2025-10-01 10:59:00")),
+        (pd.Timestamp("2025-10-02 09:59:00"), pd.Timestamp("2025-10-02 10:59:00")),
+    ]
+    assert window_ranges(SESSIONS, "09:59:00", "10:59:00", since="2025-10-02 11:00:00") == []
+
+
+def test_fetch_windows_requests_only_session_windows(stub):
+    frames = candles_async.fetch_windows({"gold": SESSIONS, "eqmx": []}, "09:59:00", "10:59:00", concurrency=2)
+
+    expected = pd.concat([_expected("2025-10-01 09:59:00", "2025-10-01 10:59:00"),
+                          _expected("2025-10-02 09:59:00", "2025-10-02 10:59:00")], ignore_index=True)
+    pd.testing.assert_frame_equal(frames["gold"], expected)
+    assert frames["eqmx"].empty
+    assert stub.requests[CANDLES_PATH] == len(SESSIONS)
+
+
+def test_fetch_range_joins_pages_in_order(stub):
+    df = candles_async.fetch_range("gold", "2025-10-01", "2025-10-03", concurrency=4)
+
+    expected = _expected("2025-10-01", "2025-10-03")
+    pd.testing.assert_frame_equal(df, expected)
+    assert _starts(stub) == list(range(0, len(expected) + 1, CANDLES_PAGE_SIZE))
+
+
+def test_malformed_page_is_retried_not_cached(stub):
+    stub.fail("candles.json", start=CANDLES_PAGE_SIZE, status=200, body=b'{"oops": []}')
+
+    df = candles_async.fetch_range("gold", "2025-10-01", "2025-10-03")
+
+    pd.testing.assert_frame_equal(df, _expected("2025-10-01", "2025-10-03"))
+    assert _starts(stub).count(CANDLES_PAGE_SIZE) == 2
+
+
+def test_windows_of_several_tickers(stub):
+    sessions = {ticker: SESSIONS for ticker in ("gold", "eqmx", "oblg")}
+    frames = candles_async.fetch_windows(sessions, "09:59:00", "10:59:00", concurrency=8)
+
+    assert {ticker: len(df) for ticker, df in frames.items()} == {ticker: 2 * 60 for ticker in sessions}
+    assert sum(stub.requests.values()) == 3 * len(SESSIONS)
+
+
+def test_failed_window_cuts_ticker_before_the_gap(stub):
+    sessions = SESSIONS + [pd.Timestamp("2025-10-03").date()]
+    stub.fail("securities/gold/", times=MAX_RETRIES, date_from="2025-10-02")
+    errors = {}
+
+    frames = candles_async.fetch_windows({"gold": sessions, "eqmx": sessions}, "09:59:00", "10:59:00",
+                                         concurrency=4, errors=errors)
+
+    # Сессия после сбоя не выдаётся: иначе последняя сохранённая свеча перескочила бы дыру
+    pd.testing.assert_frame_equal(frames["gold"], _expected("2025-10-01 09:59:00", "2025-10-01 10:59:00"))
+    assert len(frames["eqmx"]) == 3 * 60
+    assert list(errors) == ["gold"]
+
+
+def test_fetch_range_raises_instead_of_returning_partial_history(stub):
+    stub.fail("candles.json", start=CANDLES_PAGE_SIZE, times=MAX_RETRIES)
+
+    with pytest.raises(RuntimeError):
+        candles_async.fetch_range("gold", "2025-10-01", "2025-10-03")
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Дописывание рядов data_store: перекрытие с хвостом, исправления и цепочка колоночных частей."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_store
+
+pytest.importorskip("pyarrow")
+
+
+def _daily(periods=45, seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.round(100 + rng.normal(0, 1, periods).cumsum(), 2)
+    return pd.DataFrame({
+        "TRADEDATE": pd.bdate_range("2024-01-01", periods=periods),
+        "OPEN": close - 0.5, "HIGH": close + 1.0, "LOW": close - 1.0, "CLOSE": close,
+        "VOLUME": rng.integers(1, 1000, periods).astype(float),
+    })
+
+
+FULL = _daily()
+
+
+def _csv(path):
+    return data_store._parse_dates(pd.read_csv(path))
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / "GOLD.csv")
+    data_store.write_table(FULL.iloc[:40], path)
+    return path
+
+
+def test_append_overlapping_tail_adds_columnar_part(csv_path):
+    added, rewritten = data_store.append_table(FULL.iloc[37:], csv_path)
+
+    assert (added, rewritten) == (5, False)
+    pd.testing.assert_frame_equal(_csv(csv_path), FULL)
+    files = data_store._columnar_files(csv_path)
+    assert files == [data_store.columnar_path(csv_path), data_store._part_path(csv_path, 1)]
+    pd.testing.assert_frame_equal(data_store.read_table(csv_path), FULL, check_dtype=False)
+
+
+def test_changed_overlapping_row_rewrites_file(csv_path):
+    data_store.append_table(FULL.iloc[40:42], csv_path)  # цепочка уже с частью
+    corrected = FULL.copy()
+    corrected.loc[39, "CLOSE"] += 0.5
+
+    added, rewritten = data_store.append_table(corrected.iloc[38:], csv_path)
+
+    assert (added, rewritten) == (3, True)
+    pd.testing.assert_frame_equal(_csv(csv_path), corrected)
+    # Копия собрана заново одним файлом, части удалены
+    assert data_store._columnar_files(csv_path) == [data_store.columnar_path(csv_path)]
+    assert not os.path.exists(data_store._part_path(csv_path, 1))
+    pd.testing.assert_frame_equal(data_store.read_table(csv_path), corrected, check_dtype=False)
+
+
+def test_stale_columnar_stamp_falls_back_to_csv(csv_path):
+    edited = _csv(csv_path)
+    edited.loc[5, "CLOSE"] = 1.0
+    edited.to_csv(csv_path, index=False)  # правка мимо data_store: отметка копии устарела
+
+    assert data_store._columnar_files(csv_path) is None
+    pd.testing.assert_frame_equal(data_store.read_table(csv_path), edited)
+
+    # Дописывание к устаревшей копии не продолжает её цепочку
+    data_store.append_table(FULL.iloc[40:42], csv_path)
+    assert data_store._columnar_files(csv_path) is None
+    assert data_store.read_table(csv_path)["CLOSE"].iloc[5] == 1.0
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Снимок признаков: сверка по размеру/mtime без чтения файлов, хэш содержимого — запасной путь."""
+import os
+import shutil
+
+import pytest
+
+import data_store
+import feature_snapshot
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TICKER = "GOLD"
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+    for path in (feature_snapshot.DAILY_PATHS[TICKER], feature_snapshot.HOURLY_PATHS[TICKER]):
+        shutil.copy(os.path.join(ROOT, path), path)
+    data_store.invalidate()
+    feature_snapshot._digest_cache.clear()
+    path = str(tmp_path / "features.json")
+    expected = feature_snapshot.build_snapshot([TICKER], path)["tickers"][TICKER]["features"]
+    yield path, expected
+    data_store.invalidate()
+
+
+def _fail(*args):
+    raise AssertionError("не должно вызываться")
+
+
+def test_unchanged_files_are_not_hashed(snapshot, monkeypatch):
+    path, expected = snapshot
+    monkeypatch.setattr(feature_snapshot, "data_version", _fail)
+    monkeypatch.setattr(feature_snapshot, "compute_features", _fail)
+
+    assert feature_snapshot._to_json(feature_snapshot.features(TICKER, path)) == expected
+
+
+def test_touched_files_fall_back_to_content_hash(snapshot, monkeypatch):
+    path, expected = snapshot
+    daily = feature_snapshot.DAILY_PATHS[TICKER]
+    os.utime(daily, ns=(0, os.stat(daily).st_mtime_ns + 10**9))  # как после checkout: mtime другой
+    monkeypatch.setattr(feature_snapshot, "compute_features", _fail)
+
+    assert feature_snapshot._to_json(feature_snapshot.features(TICKER, path)) == expected
+
+
+def test_changed_content_is_recomputed(snapshot):
+    path, expected = snapshot
+    daily = feature_snapshot.DAILY_PATHS[TICKER]
+    with open(daily) as f:
+        lines = f.readlines()
+    with open(daily, "w") as f:
+        f.writelines(line for line in lines if not line.startswith(expected["date"]))
+
+    features = feature_snapshot._to_json(feature_snapshot.features(TICKER, path))
+    assert features["date"] < expected["date"]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Постраничная загрузка дневной истории (fetch_and_update) на стабе ISS."""
+import pandas as pd
+import pytest
+
+import fetch_and_update
+from iss_stub import HISTORY_COLUMNS, HISTORY_PAGE_SIZE, history_rows
+
+DATE_FROM, DATE_TILL = "2024-01-01", "2024-12-31"
+HISTORY_PATH = "/iss/history/engines/stock/markets/shares/boards/TQTF/securities/GOLD"
+
+
+def _expected():
+    df = pd.DataFrame(history_rows("GOLD", DATE_FROM, DATE_TILL), columns=HISTORY_COLUMNS)
+    df["TRADEDATE"] = pd.to_datetime(df["TRADEDATE"])
+    return df
+
+
+@pytest.fixture(autouse=True)
+def no_retry_pause(monkeypatch):
+    monkeypatch.setattr(fetch_and_update, "MAX_RETRIES", 2)
+    monkeypatch.setattr(fetch_and_update.time, "sleep", lambda seconds: None)
+
+
+def test_cursor_pages_are_fetched_once_and_joined_in_order(stub, cache_dir):
+    df = fetch_and_update.fetch_moex_history_paginated("GOLD", DATE_FROM, DATE_TILL)
+
+    expected = _expected()
+    pd.testing.assert_frame_equal(df, expected)
+    starts = sorted(int(q.split("start=")[1].split("&")[0]) for path, q in stub.log)
+    assert starts == list(range(0, len(expected), HISTORY_PAGE_SIZE))
+
+
+def test_failed_page_gives_empty_frame(stub, cache_dir):
+    stub.fail("GOLD.json", start=HISTORY_PAGE_SIZE, times=10, status=200, body=b"not json")
+
+    df = fetch_and_update.fetch_moex_history_paginated("GOLD", DATE_FROM, DATE_TILL)
+
+    assert df.empty
+    assert stub.requests[HISTORY_PATH + ".json"] == len(range(0, len(_expected()), HISTORY_PAGE_SIZE)) + 1
+
+
+def test_json_and_xml_give_the_same_frame(stub, cache_dir, monkeypatch):
+    from_json = fetch_and_update.fetch_moex_history_paginated("GOLD", DATE_FROM, DATE_TILL)
+    monkeypatch.setattr(fetch_and_update, "HISTORY_FORMAT", "xml")
+    from_xml = fetch_and_update.fetch_moex_history_paginated("GOLD", DATE_FROM, DATE_TILL)
+
+    assert stub.requests[HISTORY_PATH + ".xml"] > 0
+    pd.testing.assert_frame_equal(from_xml, from_json)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Дисковый кэш iss_client: попадания, ревалидация по ETag, проверка и вытеснение записей."""
+import os
+import time
+from datetime import date, timedelta
+
+import pytest
+
+import iss_client
+
+URL = iss_client.ISS_BASE_URL + "/history/engines/stock/markets/shares/boards/TQTF/securities/GOLD.json"
+PATH = "/iss/history/engines/stock/markets/shares/boards/TQTF/securities/GOLD.json"
+CLOSED = {"from": "2024-01-01", "till": "2024-01-31"}
+OPEN = {"from": "2024-01-01", "till": (date.today() + timedelta(days=7)).isoformat()}
+
+
+@pytest.fixture(autouse=True)
+def cache_enabled(monkeypatch, cache_dir):
+    monkeypatch.setattr(iss_client, "CACHE_ENABLED", True)
+    monkeypatch.setattr(iss_client, "_pruned", True)
+
+
+def test_closed_range_is_served_from_cache(stub):
+    first = iss_client.get(URL, params=CLOSED)
+    hits = iss_client.cache_stats["hit"]
+    second = iss_client.get(URL, params=CLOSED)
+
+    assert second.content == first.content
+    assert iss_client.cache_stats["hit"] == hits + 1
+    assert stub.requests[PATH] == 1
+    assert iss_client.cached(URL, params=CLOSED).content == first.content
+
+
+def test_stale_open_range_is_revalidated_with_304(stub, monkeypatch):
+    first = iss_client.get(URL, params=OPEN)
+    monkeypatch.setattr(iss_client, "CACHE_TTL", 0)
+    assert iss_client.cached(URL, params=OPEN) is None
+
+    revalidated = iss_client.cache_stats["revalidated"]
+    second = iss_client.get(URL, params=OPEN)
+
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert iss_client.cache_stats["revalidated"] == revalidated + 1
+    assert stub.requests[PATH] == 2
+
+
+def test_invalid_payload_is_not_cached(stub):
+    stub.fail("GOLD.json", status=200, body=b'{"error": "internal"}')
+
+    bad = iss_client.get(URL, params=CLOSED)
+    good = iss_client.get(URL, params=CLOSED)
+    again = iss_client.get(URL, params=CLOSED)
+
+    assert b"error" in bad.content
+    assert b"history" in good.content and again.content == good.content
+    assert stub.requests[PATH] == 2
+
+
+def test_invalidate_forces_a_network_request(stub):
+    iss_client.get(URL, params=CLOSED)
+    iss_client.invalidate(URL, params=CLOSED)
+
+    assert iss_client.cached(URL, params=CLOSED) is None
+    iss_client.get(URL, params=CLOSED)
+    assert stub.requests[PATH] == 2
+
+
+def test_prune_removes_old_then_least_recently_used_entries(stub):
+    months = [{"from": f"2024-{m:02d}-01", "till": f"2024-{m:02d}-28"} for m in (1, 2, 3)]
+    for params in months:
+        iss_client.get(URL, params=params)
+    meta_paths = [iss_client._entry_paths(iss_client._full_url(URL, p))[0] for p in months]
+    now = time.time()
+    os.utime(meta_paths[0], (now - 40 * 86400,) * 2)
+    os.utime(meta_paths[1], (now - 60,) * 2)
+
+    assert iss_client.prune_cache(max_age_days=30, max_mb=1) == 1
+    assert iss_client.cached(URL, params=months[0]) is None
+
+    assert iss_client.prune_cache(max_age_days=30, max_mb=0) == 2
+    assert all(iss_client.cached(URL, params=p) is None for p in months)
+
+
+def test_retry_without_backoff_jitter_on_urllib3_1x():
+    class Retry1x(iss_client.Retry):
+        def __init__(self, total=10, backoff_factor=0, status_forcelist=None, allowed_methods=None,
+                     respect_retry_after_header=True, raise_on_status=True):
+            super().__init__(total=total, backoff_factor=backoff_factor, status_forcelist=status_forcelist,
+                             allowed_methods=allowed_methods,
+                             respect_retry_after_header=respect_retry_after_header, raise_on_status=raise_on_status)
+
+    retry = iss_client._retry(Retry1x)
+
+    assert isinstance(retry, Retry1x)
+    assert retry.total == iss_client.HTTP_RETRIES and retry.status_forcelist == (429, 500, 502, 503, 504)
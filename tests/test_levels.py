@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Потоковый детектор уровней: экстремумы argrelextrema, кластеры с относительным допуском, бинарный поиск."""
+import numpy as np
+import pytest
+
+from levels import LEVEL_TOLERANCE, LevelDetector, Levels, cluster_levels
+
+argrelextrema = pytest.importorskip("scipy.signal").argrelextrema
+
+
+def _clusters(extrema, tolerance=LEVEL_TOLERANCE):
+    """Эталон группировки простым проходом по отсортированным экстремумам."""
+    levels, cluster = [], []
+    for price in sorted(p for p in extrema if p > 0):
+        if cluster and price > cluster[0] * (1 + tolerance):
+            if len(cluster) >= 2:
+                levels.append(np.mean(cluster))
+            cluster = []
+        cluster.append(price)
+    if len(cluster) >= 2:
+        levels.append(np.mean(cluster))
+    return levels
+
+
+def _reference(highs, lows, order=5):
+    return (_clusters(lows[argrelextrema(lows, np.less, order=order)[0]]),
+            _clusters(highs[argrelextrema(highs, np.greater, order=order)[0]]))
+
+
+@pytest.mark.parametrize("scale", [2.0, 200.0])
+def test_detector_matches_reference_on_every_prefix(scale):
+    rng = np.random.default_rng(0)
+    lows = np.round(rng.normal(1, 0.02, 400), 3) * scale
+    highs = lows + np.round(rng.uniform(0, 0.02, 400), 3) * scale
+    detector = LevelDetector()
+    for i in range(len(highs)):
+        detector.update((highs[i], lows[i]))
+        levels = detector.value
+        supports, resistances = _reference(highs[:i + 1], lows[:i + 1])
+        np.testing.assert_allclose(levels.supports, supports, rtol=1e-12)
+        np.testing.assert_allclose(levels.resistances, resistances, rtol=1e-12)
+
+
+def test_tolerance_is_relative_to_price():
+    # Одни и те же относительные расстояния дают одни и те же кластеры при цене ~2 и ~200
+    extrema = np.array([1.000, 1.003, 1.010, 1.012, 1.030])
+    for scale in (2.0, 200.0):
+        levels = cluster_levels(extrema * scale, tolerance=0.004)
+        np.testing.assert_allclose(levels, [1.0015 * scale, 1.011 * scale])
+    # Фиксированная сетка 0.5 не создаёт уровней у GOLD: 2.49 и 2.51 — разные кластеры
+    assert cluster_levels([2.0, 2.1, 2.49, 2.51], tolerance=0.004) == []
+
+
+def test_state_round_trip():
+    rng = np.random.default_rng(1)
+    bars = np.column_stack((rng.normal(12, 0.2, 200), rng.normal(10, 0.2, 200)))
+    full = LevelDetector()
+    for bar in bars:
+        full.update(bar)
+    resumed = LevelDetector()
+    for bar in bars[:150]:
+        resumed.update(bar)
+    restored = LevelDetector()
+    restored.set_state(resumed.get_state())
+    for bar in bars[150:]:
+        restored.update(bar)
+    assert restored.value.supports.tolist() == full.value.supports.tolist()
+    assert restored.value.resistances.tolist() == full.value.resistances.tolist()
+
+
+def test_queries_are_sorted_and_bounded():
+    levels = Levels([95.0, 99.0, 100.0, 98.5], [103.0, 100.5, 101.0])
+
+    assert levels.supports_below(100.0) == [95.0, 98.5, 99.0]
+    assert levels.supports_below(100.0, within=0.015) == [99.0]
+    assert levels.supports_below(100.0, within=0.05, inclusive=True) == [95.0, 98.5, 99.0]
+    assert levels.supports_below(100.0, within=0.05) == [98.5, 99.0]
+    assert levels.resistances_above(100.0) == [100.5, 101.0, 103.0]
+    assert levels.resistances_above(100.0, within=0.015) == [100.5, 101.0]
+    assert levels.supports_near(100.0, 0.02) == [98.5, 99.0, 100.0]
+    assert levels.resistances_near(101.0, 0.01) == [100.5, 101.0]
+    assert Levels([], []).supports_below(100.0) == []
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Локальные N-минутные свечи совпадают с pandas resample по минутным свечам."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from iss_stub import CANDLE_COLUMNS, candle_rows
+from moex_candles import to_frame
+from resample import resample_candles, snapshot
+
+
+def _m1():
+    df = to_frame(candle_rows("GOLD", "2025-10-01", "2025-10-06"), CANDLE_COLUMNS)
+    df["end"] = pd.to_datetime(df["end"])
+    rng = np.random.default_rng(0)
+    # Пропуски минут, как в реальных данных, и целый пропущенный час
+    keep = (rng.random(len(df)) > 0.2) & ~df["begin"].between("2025-10-02 13:00", "2025-10-02 13:59")
+    return df[keep].sample(frac=1, random_state=0)  # порядок строк не важен
+
+
+def _reference(m1, minutes):
+    grouped = m1.set_index("begin").sort_index().resample(f"{minutes}min")
+    out = grouped.agg({"open": "first", "close": "last", "high": "max", "low": "min",
+                       "value": "sum", "volume": "sum", "end": "max"})
+    out = out[grouped.size() > 0].reset_index()
+    return out[CANDLE_COLUMNS]
+
+
+@pytest.mark.parametrize("minutes", [5, 15, 60])
+def test_matches_pandas_resample(minutes):
+    m1 = _m1()
+
+    bars = resample_candles(m1, minutes)
+
+    pd.testing.assert_frame_equal(bars, _reference(m1, minutes), check_dtype=False)
+    assert not bars["begin"].between("2025-10-02 13:00", "2025-10-02 13:59").any()  # пустые интервалы не создаются
+
+
+def test_snapshot_keeps_bars_closing_near_noon():
+    m1 = _m1()
+
+    bars = snapshot(m1)
+
+    reference = _reference(m1, 60)
+    noon = reference["end"].dt.normalize() + pd.Timedelta(hours=12)
+    expected = reference[(reference["end"] - noon).abs() <= pd.Timedelta("1min")].reset_index(drop=True)
+    pd.testing.assert_frame_equal(bars, expected, check_dtype=False)
+    assert len(bars) > 0
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Сигнальные скрипты читают каждый файл данных с диска один раз за запуск."""
+import importlib
+import os
+import shutil
+from collections import Counter
+
+import pytest
+
+import data_store
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = ["moex_signals_tech_analisys_3-4", "moex_signals_tech_analisys_5-6", "moex_signals_tech_analisys_7-8"]
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    # Копия рядов без снимка признаков и состояния индикаторов: всё считается заново
+    shutil.copytree(os.path.join(ROOT, "data"), tmp_path / "data",
+                    ignore=shutil.ignore_patterns("columnar", ".indicators", "features.json"))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("TELEGRAM_BOT_TOKEN", raising=False)
+    monkeypatch.delenv("TELEGRAM_CHAT_ID", raising=False)
+    data_store.invalidate()
+    yield tmp_path
+    data_store.invalidate()
+
+
+@pytest.mark.parametrize("name", SCRIPTS)
+def test_each_file_is_read_once(data_dir, name):
+    script = importlib.import_module(name)
+    reads = Counter()
+    hook = lambda path: reads.update([os.path.normpath(path)])
+    data_store.add_read_hook(hook)
+    try:
+        script.main()
+    finally:
+        data_store.remove_read_hook(hook)
+
+    expected = {os.path.join("data", f"{ticker}.csv") for ticker in ("RVI", "OBLG", "EQMX", "GOLD")}
+    assert expected <= set(reads)
+    assert {path: count for path, count in reads.items() if count > 1} == {}
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""replay() по истории совпадает с evaluate() на признаках compute_features по файлам, обрезанным по дате."""
+import math
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import data_store
+import ta_rules
+from feature_snapshot import DAILY_PATHS, HOURLY_PATHS, compute_features
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIELDS = ["ema_trend", "supports", "resistances", "signal", "interpretation", "rsi_comment", "stop_loss", "take_profit"]
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+    data_store.invalidate()
+    yield tmp_path
+    data_store.invalidate()
+
+
+def _source(path, date_col):
+    df = pd.read_csv(os.path.join(ROOT, path))
+    return df, pd.to_datetime(df[date_col])
+
+
+def _truncate(date, sources):
+    """Файлы в том виде, в каком они были бы на конец даты."""
+    for path, (df, stamps) in sources.items():
+        cut = df[stamps < date + pd.Timedelta(days=1)]
+        if len(cut):
+            cut.to_csv(path, index=False)
+        elif os.path.exists(path):
+            os.remove(path)
+    data_store.invalidate()
+
+
+def _live(ticker, date):
+    """Сигнал, как его считает generate_signal (5-6) по признакам снимка."""
+    f = compute_features(ticker)
+    rvi = data_store.load_csv(ta_rules.RVI_PATH)['close'].iloc[-1]
+    ema_span = ta_rules.calculate_adaptive_ema_span(rvi) if not pd.isna(rvi) else 50
+    ema = f["ema"][ema_span]
+    result = ta_rules.evaluate(f["price"], ema["value"], ema["prev"], f["price_changes"], f["volume_ratios"],
+                               ta_rules.Levels(f["supports"], f["resistances"]), f["h1_confirmed"], rvi,
+                               f["rsi"], f["rows"])
+    return {"ema_span": ema_span, "ema": ema["value"], "rsi": f["rsi"], "h1_confirmed": f["h1_confirmed"], **result}
+
+
+def _same(a, b):
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b or (a is None and isinstance(b, float) and math.isnan(b))
+
+
+@pytest.mark.parametrize("ticker", ["OBLG", "GOLD"])
+def test_replay_matches_live_on_truncated_files(data_dir, ticker):
+    sources = {
+        DAILY_PATHS[ticker]: _source(DAILY_PATHS[ticker], "TRADEDATE"),
+        HOURLY_PATHS[ticker]: _source(HOURLY_PATHS[ticker], "begin"),
+        ta_rules.RVI_PATH: _source(ta_rules.RVI_PATH, "TRADEDATE"),
+    }
+    for path in sources:
+        shutil.copy(os.path.join(ROOT, path), path)
+    replayed = ta_rules.replay_ticker(ticker)
+
+    dates = replayed.index
+    h1_first = sources[HOURLY_PATHS[ticker]][1].min().normalize()
+    # Ранняя история, середина, день до H1-баров, дни с H1 и последняя дата
+    picks = [dates[30], dates[len(dates) // 2], dates[dates < h1_first][-1], dates[-3], dates[-1]]
+    for date in picks:
+        _truncate(date, sources)
+        live = _live(ticker, date)
+        row = replayed.loc[date]
+        mismatched = {key: (live[key], row[key]) for key in ["ema_span", "ema", "rsi", "h1_confirmed"] + FIELDS
+                      if not _same(live[key], row[key])}
+        assert mismatched == {}, f"{ticker} {date.date()}"
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Маски времени суток совпадают с отбором по строкам времени."""
+import numpy as np
+import pandas as pd
+
+from time_of_day import near_mask, nearest_per_day, to_ns, window_mask
+
+STAMPS = pd.Series(pd.date_range("2025-10-01 09:00", "2025-10-03 13:00", freq="30s"))
+
+
+def test_to_ns():
+    assert to_ns("12:00") == to_ns("12:00:00") == pd.Timedelta(hours=12).value
+    assert to_ns("1min") == 60_000_000_000
+
+
+def test_window_mask_matches_string_compare():
+    times = STAMPS.dt.strftime("%H:%M:%S")
+    expected = ((times >= "09:59:00") & (times <= "10:59:00")).to_numpy()
+
+    np.testing.assert_array_equal(window_mask(STAMPS, "09:59:00", "10:59:00"), expected)
+
+
+def test_window_mask_across_midnight():
+    times = STAMPS.dt.strftime("%H:%M:%S")
+    expected = ((times >= "23:00:00") | (times <= "01:00:00")).to_numpy()
+
+    np.testing.assert_array_equal(window_mask(STAMPS, "23:00", "01:00"), expected)
+
+
+def test_near_mask_is_inclusive():
+    times = STAMPS.dt.strftime("%H:%M:%S")
+    expected = ((times >= "11:59:00") & (times <= "12:01:00")).to_numpy()
+
+    np.testing.assert_array_equal(near_mask(STAMPS, "12:00:00", "1min"), expected)
+
+
+def test_nearest_per_day_matches_groupby():
+    stamps = pd.Series(pd.date_range("2025-10-01 09:00", "2025-10-05 18:00", freq="7min"))
+    stamps = stamps[~stamps.dt.date.astype(str).eq("2025-10-04") | (stamps.dt.hour < 11)].reset_index(drop=True)
+    dist = (stamps - stamps.dt.normalize() - pd.Timedelta(hours=12)).abs()
+    nearest = dist.groupby(stamps.dt.date).idxmin()
+    expected = np.sort(nearest[dist[nearest].to_numpy() <= pd.Timedelta("5min")].to_numpy())
+
+    np.testing.assert_array_equal(nearest_per_day(stamps, "12:00", "5min"), expected)
+    assert len(nearest_per_day(stamps, "12:00")) == stamps.dt.date.nunique()
+
+
+def test_nearest_per_day_prefers_earlier_on_tie():
+    stamps = pd.to_datetime(["2025-10-01 11:59", "2025-10-01 12:01", "2025-10-02 12:01", "2025-10-02 11:59"])
+
+    np.testing.assert_array_equal(nearest_per_day(stamps, "12:00"), [0, 2])
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Календарь сессий: выходные, праздничный разрыв, субботняя сессия и границы searchsorted."""
+import numpy as np
+import pandas as pd
+
+from trading_calendar import TradingCalendar
+
+HOLIDAYS = ["2025-11-03", "2025-11-04"]
+SATURDAY = "2025-11-01"  # перенесённый рабочий день
+SESSIONS = pd.bdate_range("2025-09-01", "2025-11-14").drop(pd.DatetimeIndex(HOLIDAYS)).append(
+    pd.DatetimeIndex([SATURDAY])).sort_values()
+
+
+def _days(*days):
+    return pd.DatetimeIndex(list(days))
+
+
+def test_sessions_in_range_is_inclusive():
+    calendar = TradingCalendar(SESSIONS)
+
+    assert calendar.sessions_in_range("2025-10-30", "2025-11-05").equals(
+        _days("2025-10-30", "2025-10-31", SATURDAY, "2025-11-05"))
+    # Границы на выходных и праздниках: в диапазон попадают только сессии
+    assert calendar.sessions_in_range("2025-11-02", "2025-11-04").empty
+    assert calendar.sessions_in_range("2025-08-01", "2025-09-02").equals(_days("2025-09-01", "2025-09-02"))
+    assert calendar.sessions_in_range("2025-11-14", "2025-12-31").equals(_days("2025-11-14"))
+    assert calendar.sessions_in_range("2025-11-10", "2025-11-07").empty
+
+
+def test_neighbours_across_weekend_and_holiday_gap():
+    calendar = TradingCalendar(SESSIONS)
+
+    assert calendar.next_session("2025-10-31") == pd.Timestamp(SATURDAY)
+    assert calendar.next_session(SATURDAY) == pd.Timestamp("2025-11-05")
+    assert calendar.next_session("2025-11-03") == pd.Timestamp("2025-11-05")
+    assert calendar.previous_session("2025-11-05") == pd.Timestamp(SATURDAY)
+    assert calendar.previous_session("2025-09-01") is None
+    assert not calendar.is_session("2025-11-04") and calendar.is_session(SATURDAY)
+
+
+def test_after_last_known_session_uses_weekdays():
+    calendar = TradingCalendar(SESSIONS)
+
+    # Одна суббота за полгода — не обычный торговый день
+    assert calendar.weekdays == frozenset(range(5))
+    assert calendar.next_session("2025-11-14") == pd.Timestamp("2025-11-17")
+    assert calendar.next_session("2025-11-15 12:00") == pd.Timestamp("2025-11-17")
+    expected = calendar.expected_sessions("2025-11-12", "2025-11-25")
+    assert expected.equals(_days("2025-11-12", "2025-11-13", "2025-11-14", *pd.bdate_range("2025-11-17", "2025-11-25")))
+    assert calendar.expected_sessions("2025-11-29", "2025-11-30").empty
+
+
+def test_locate_boundaries():
+    calendar = TradingCalendar(SESSIONS)
+    days = _days("2025-08-29", "2025-09-01", "2025-11-01", "2025-11-04", "2025-11-14", "2025-11-17")
+
+    np.testing.assert_array_equal(calendar.locate(days), [-1, 0, SESSIONS.get_loc(SATURDAY), -1, len(SESSIONS) - 1, -1])
+    np.testing.assert_array_equal(TradingCalendar([]).locate(days), [-1] * len(days))
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Отбор свечей по времени суток без строковых преобразований.
+
+Время свечи переводится в целое число наносекунд от полуночи (int64), после
+чего окна, допуски и «ближайшая к целевому времени свеча за день» считаются
+обычными сравнениями массивов numpy.
+"""
+import numpy as np
+import pandas as pd
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+
+
+def to_ns(value):
+    """Время суток ("12:00", "09:59:00", Timedelta) или длительность ("1min") в наносекундах."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str) and value.count(":") == 1:
+        value += ":00"  # "HH:MM"
+    return pd.Timedelta(value).value
+
+
+def time_of_day_ns(values):
+    """Наносекунды от полуночи для серии/массива naive datetime."""
+    ns = np.asarray(values, dtype="datetime64[ns]").view("int64")
+    return ns % NS_PER_DAY
+
+
+def day_ns(values):
+    """Номер дня (наносекунды полуночи) для каждой метки — ключ группировки по дням."""
+    ns = np.asarray(values, dtype="datetime64[ns]").view("int64")
+    return ns - ns % NS_PER_DAY
+
+
+def window_mask(values, start, end):
+    """Маска меток, у которых время суток в [start, end] включительно (окно может переходить через полночь)."""
+    t = time_of_day_ns(values)
+    lo, hi = to_ns(start), to_ns(end)
+    if lo <= hi:
+        return (t >= lo) & (t <= hi)
+    return (t >= lo) | (t <= hi)
+
+
+def near_mask(values, target, tolerance):
+    """Маска меток, у которых время суток отличается от target не больше чем на tolerance."""
+    return np.abs(time_of_day_ns(values) - to_ns(target)) <= to_ns(tolerance)
+
+
+def nearest_per_day(values, target, tolerance=None):
+    """
+    Позиции меток, ближайших по времени суток к target, — по одной на день
+    (при равенстве берётся более ранняя по порядку). Дни, где ближайшая метка
+    дальше tolerance, пропускаются. Позиции возвращаются по возрастанию.
+    """
+    dist = np.abs(time_of_day_ns(values) - to_ns(target))
+    days = day_ns(values)
+    order = np.lexsort((np.arange(len(dist)), dist, days))
+    _, first = np.unique(days[order], return_index=True)
+    picked = order[first]
+    if tolerance is not None:
+        picked = picked[dist[picked] <= to_ns(tolerance)]
+    return np.sort(picked)
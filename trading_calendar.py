@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Календарь торговых сессий по сохранённым дневным рядам.
+
+Сессии — отсортированный массив datetime64[D]; «следующая/предыдущая сессия»,
+«сессии в диапазоне» и поиск позиций дат считаются через np.searchsorted
+за O(log n). Для дней после последней известной сессии календарь опирается
+на дни недели, по которым биржа торговала в последние RECENT_WEEKS недель:
+редкие субботние сессии туда не попадают и подхватываются уже из данных.
+"""
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_DIR, load_daily
+
+RECENT_WEEKS = 26
+
+
+def _day(value):
+    return np.datetime64(pd.Timestamp(value).normalize().date(), "D")
+
+
+def _weekday(days):
+    """Понедельник = 0 (1970-01-01 — четверг)."""
+    return (days.astype("int64") + 3) % 7
+
+
+class TradingCalendar:
+    def __init__(self, sessions, recent_weeks=RECENT_WEEKS):
+        days = pd.to_datetime(pd.Index(sessions)).dropna().normalize()
+        self.sessions = np.unique(np.asarray(days, dtype="datetime64[D]"))
+        self.weekdays = self._recent_weekdays(recent_weeks)
+
+    @classmethod
+    def from_daily(cls, tickers, data_dir=DATA_DIR, recent_weeks=RECENT_WEEKS):
+        """Объединение дат TRADEDATE дневных файлов тикеров (отсутствующие файлы пропускаются)."""
+        parts = []
+        for ticker in tickers:
+            try:
+                parts.append(load_daily(ticker.upper(), data_dir)["TRADEDATE"])
+            except FileNotFoundError:
+                continue
+        return cls(pd.concat(parts) if parts else [], recent_weeks)
+
+    def _recent_weekdays(self, weeks):
+        if not len(self.sessions):
+            return frozenset(range(5))
+        recent = self.sessions[self.sessions > self.sessions[-1] - np.timedelta64(7 * weeks, "D")]
+        n_weeks = len(np.unique((recent.astype("int64") + 3) // 7))
+        counts = np.bincount(_weekday(recent), minlength=7)
+        return frozenset(int(d) for d in np.flatnonzero(counts * 2 >= n_weeks))
+
+    @property
+    def last_known(self):
+        return pd.Timestamp(self.sessions[-1]) if len(self.sessions) else None
+
+    def is_session(self, day):
+        d = _day(day)
+        i = np.searchsorted(self.sessions, d)
+        return bool(i < len(self.sessions) and self.sessions[i] == d)
+
+    def locate(self, days):
+        """Позиции дат в календаре (-1 для дней, которые не являются сессиями)."""
+        days = np.asarray(pd.to_datetime(pd.Index(days)).normalize(), dtype="datetime64[D]")
+        pos = np.searchsorted(self.sessions, days)
+        clipped = np.minimum(pos, max(len(self.sessions) - 1, 0))
+        found = (pos < len(self.sessions)) & (self.sessions[clipped] == days) if len(self.sessions) else np.zeros(len(days), bool)
+        return np.where(found, pos, -1)
+
+    def previous_session(self, day):
+        """Последняя известная сессия строго раньше day (или None)."""
+        i = np.searchsorted(self.sessions, _day(day)) - 1
+        return pd.Timestamp(self.sessions[i]) if i >= 0 else None
+
+    def next_session(self, day):
+        """Первая сессия строго позже day: известная или ожидаемая по дням недели."""
+        d = _day(day)
+        i = np.searchsorted(self.sessions, d, side="right")
+        if i < len(self.sessions):
+            return pd.Timestamp(self.sessions[i])
+        if not self.weekdays:
+            return None
+        d += np.timedelta64(1, "D")
+        while int(_weekday(np.array([d]))[0]) not in self.weekdays:
+            d += np.timedelta64(1, "D")
+        return pd.Timestamp(d)
+
+    def sessions_in_range(self, start, end):
+        """Известные сессии в [start, end] включительно."""
+        lo = np.searchsorted(self.sessions, _day(start), side="left")
+        hi = np.searchsorted(self.sessions, _day(end), side="right")
+        return pd.DatetimeIndex(self.sessions[lo:hi])
+
+    def expected_sessions(self, start, end):
+        """
+        Известные сессии в [start, end] плюс дни после последней известной сессии,
+        выпадающие на обычные торговые дни недели.
+        """
+        known = self.sessions_in_range(start, end)
+        tail_start = max(_day(start), self.sessions[-1] + np.timedelta64(1, "D")) if len(self.sessions) else _day(start)
+        tail = np.arange(tail_start, _day(end) + np.timedelta64(1, "D"), dtype="datetime64[D]")
+        tail = tail[np.isin(_weekday(tail), list(self.weekdays))]
+        return known.append(pd.DatetimeIndex(tail))